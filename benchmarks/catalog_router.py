@@ -0,0 +1,84 @@
+import re
+import sys
+import time
+import argparse
+from common.policy_catalog import PolicyCatalog, answer_catalog_question
+
+# =============================
+# Catalog intent router check
+# =============================
+# Runs questions through answer_catalog_question against the catalog of the
+# files/ tree and fails if a catalog question falls through to retrieval, or
+# a content question ("how many days of leave ...") is answered from the
+# catalog instead of the documents. Counts must be for the category the
+# question names ("how many IT policies"), else for the current one.
+#
+#   python -m benchmarks.catalog_router
+
+# (category, question, expected answer kind); None means "goes to retrieval".
+CASES = [
+    ("HR Policy", "How many policies are there?", "count:HR Policy"),
+    ("HR Policy", "how many policy is there", "count:HR Policy"),
+    ("IT Policy", "How many IT policies do we have?", "count:IT Policy"),
+    ("HR Policy", "how many it policies are there", "count:IT Policy"),
+    ("SOPP_Sales", "How many HR policies are there?", "count:HR Policy"),
+    ("All Policies", "number of procurement documents", "count:SOPP_Procurement"),
+    ("HR Policy", "How many available policies are there?", "count:HR Policy"),
+    ("HR Policy", "Total number of documents", "count:HR Policy"),
+    ("HR Policy", "How many policies are there in all categories?", "summary"),
+    ("HR Policy", "List all policies", "names"),
+    ("HR Policy", "What are the policy names?", "names"),
+    ("All Policies", "list all policies", "all_names"),
+    ("HR Policy", "Which category has the POSH policy?", "location"),
+    ("IT Policy", "Where is the password policy?", "location"),
+    ("HR Policy", "How many days of leave are allowed under the leave policy?", None),
+    ("HR Policy", "how many casual leaves can I take as per HR policy", None),
+    ("HR Policy", "How many days notice does the separation policy require?", None),
+    ("HR Policy", "How many leave policies are there?", None),
+    ("SOPP_Sales", "How many SOP documents are there?", None),
+    ("HR Policy", "Where can I find the gratuity rules?", None),
+    ("IT Policy", "Where is the security policy?", None),
+    ("HR Policy", "What is the gratuity policy?", None),
+]
+
+
+def answer_kind(answer):
+    if answer is None:
+        return None
+    match = re.match(r"There are \d+ policies in the (.+) category\.$", answer)
+    if match:
+        return f"count:{match.group(1)}"
+    if answer.startswith("Policy Summary"):
+        return "summary"
+    if "policies across all categories" in answer:
+        return "all_names"
+    if answer.startswith("Here are the "):
+        return "names"
+    if " category." in answer:
+        return "location"
+    return "other"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check which questions the catalog router answers.")
+    parser.add_argument("--repeat", type=int, default=1000, help="router calls per question for timing")
+    args = parser.parse_args()
+
+    catalog = PolicyCatalog()
+    failures = 0
+    for category, question, expected in CASES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            answer = answer_catalog_question(category, question, catalog)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        kind = answer_kind(answer)
+        ok = kind == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {kind or 'retrieval':<22} {elapsed * 1e6:>6.1f} us  [{category}] {question}")
+
+    print(f"\n{len(CASES) - failures}/{len(CASES)} questions routed as expected")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dbutils.pooled_db import PooledDB
+from benchmarks import fake_db_driver
+from common.database import Database
+
+# =============================
+# Connection pool reuse check
+# =============================
+# Runs the same MIS-style queries through the shared Database pool and
+# through a fresh PooledDB per query (the old behaviour) against the
+# stand-in driver, and fails if the shared pool opens more connections than
+# its maximum size or skips the SELECT 1 health check on checkout. It then
+# drops every pooled connection from the "server" side and checks that the
+# next queries still succeed on reopened connections.
+#
+#   python -m benchmarks.db_pool --queries 200 --threads 8 --connect-latency 0.05
+
+
+def run_shared_pool(args):
+    fake_db_driver.reset_stats()
+    Database.create_pool(creator=fake_db_driver, connect_latency=args.connect_latency, query_latency=args.query_latency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda _: Database().execute("SELECT * FROM [MIS].[PERIODIC_REPORT]"), range(args.queries)))
+    elapsed = time.perf_counter() - start
+    stats = Database.stats()
+    driver_stats = dict(fake_db_driver.stats)
+
+    dropped = fake_db_driver.drop_connections()
+    after_drop = [Database().execute("SELECT * FROM [MIS].[PERIODIC_REPORT]") for _ in range(dropped + 2)]
+    drop_stats = Database.stats()
+    Database.close_pool()
+    return elapsed, driver_stats, stats, results, (dropped, after_drop, drop_stats)
+
+
+def run_pool_per_query(args):
+    fake_db_driver.reset_stats()
+
+    def query(_):
+        pool = PooledDB(creator=fake_db_driver, maxconnections=5,
+                        connect_latency=args.connect_latency, query_latency=args.query_latency)
+        connection = pool.connection()
+        try:
+            with connection.cursor(as_dict=True) as cursor:
+                cursor.execute("SELECT * FROM [MIS].[PERIODIC_REPORT]")
+                return cursor.fetchall()
+        finally:
+            connection.close()
+            pool.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(query, range(args.queries)))
+    return time.perf_counter() - start, dict(fake_db_driver.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that MIS queries reuse pooled connections.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--connect-latency", type=float, default=0.05, help="seconds per connection login")
+    parser.add_argument("--query-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    shared_seconds, shared_driver, shared_stats, results, (dropped, after_drop, drop_stats) = run_shared_pool(args)
+    per_query_seconds, per_query_driver = run_pool_per_query(args)
+
+    print(f"shared pool:    {args.queries} queries in {shared_seconds:.2f}s, "
+          f"{shared_driver['connects']} connects, {shared_driver['pings']} pings")
+    print(f"  pool stats:   {shared_stats}")
+    print(f"pool per query: {args.queries} queries in {per_query_seconds:.2f}s, {per_query_driver['connects']} connects")
+    print(f"dropped {dropped} connection(s): {sum(bool(rows) for rows in after_drop)}/{len(after_drop)} queries answered, "
+          f"{drop_stats['ping_failures']} failed health checks")
+
+    max_connections = int(os.getenv("DB_POOL_MAX", "5"))
+    ok = (
+        shared_driver["queries"] == args.queries
+        and all(rows for rows in results)
+        and shared_driver["connects"] <= max_connections
+        and shared_stats["connections_created"] == shared_driver["connects"]
+        and shared_stats["active"] == 0
+        and shared_driver["pings"] == shared_stats["pings"] == args.queries
+    )
+    recovered = all(after_drop) and drop_stats["ping_failures"] >= 1 and drop_stats["query_errors"] == 0
+    print("OK: connections are reused" if ok else "FAIL: connections were not reused or not health-checked")
+    print("OK: dead connections are reopened" if recovered else "FAIL: dead connections were not reopened")
+    ok = ok and recovered
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
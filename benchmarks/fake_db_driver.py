@@ -0,0 +1,111 @@
+import time
+import weakref
+import threading
+
+# =============================
+# Stand-in DB-API 2 driver
+# =============================
+# Mimics the parts of pymssql that common.database uses, with configurable
+# connect and query latency, and counts connections so pool reuse can be
+# checked without a SQL Server.
+
+apilevel = "2.0"
+threadsafety = 1
+paramstyle = "pyformat"
+
+
+class Error(Exception):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class OperationalError(Error):
+    pass
+
+
+class InternalError(Error):
+    pass
+
+
+ROWS = [{"MonthFormatted": "Jan-2025", "total_mtd": 1185}, {"MonthFormatted": "Feb-2025", "total_mtd": 1210}]
+
+_lock = threading.Lock()
+stats = {"connects": 0, "queries": 0, "pings": 0}
+_open_connections = weakref.WeakSet()
+
+
+def reset_stats():
+    with _lock:
+        for key in stats:
+            stats[key] = 0
+
+
+def drop_connections():
+    """Close every open connection from the server side, like a SQL Server restart or idle timeout."""
+    with _lock:
+        connections = list(_open_connections)
+    for connection in connections:
+        connection.closed = True
+    return len(connections)
+
+
+class Cursor:
+    def __init__(self, connection, as_dict=False):
+        self.connection = connection
+        self.as_dict = as_dict
+        self._rows = []
+
+    def execute(self, query, args=None):
+        if self.connection.closed:
+            raise OperationalError("connection is closed")
+        if query.strip().upper() == "SELECT 1":
+            with _lock:
+                stats["pings"] += 1
+            self._rows = [{"": 1}]
+            return
+        time.sleep(self.connection.query_latency)
+        with _lock:
+            stats["queries"] += 1
+        self._rows = [dict(row) for row in ROWS] if self.as_dict else [tuple(row.values()) for row in ROWS]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    def __init__(self, connect_latency=0.0, query_latency=0.0):
+        time.sleep(connect_latency)
+        self.query_latency = query_latency
+        self.closed = False
+        with _lock:
+            stats["connects"] += 1
+            _open_connections.add(self)
+
+    def cursor(self, as_dict=False):
+        return Cursor(self, as_dict=as_dict)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def connect(connect_latency=0.0, query_latency=0.0, **kwargs):
+    return Connection(connect_latency=connect_latency, query_latency=query_latency)
@@ -0,0 +1,138 @@
+import os
+import ssl
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================
+# LLM client setup cost
+# =============================
+# Serves a stub of the Gemini generateContent endpoint over local HTTPS and
+# calls it the old way (a new ChatGoogleGenerativeAI, or genai.configure +
+# a new GenerativeModel, per request) and through the shared clients of
+# common/llm_clients.py, reporting the time per call and how many TLS
+# connections the stub accepted. Needs the openssl command for the
+# throwaway certificate.
+#
+#   python -m benchmarks.llm_clients --requests 50
+
+MODEL = "gemini-2.0-flash"
+connections = {"count": 0}
+_count_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with _count_lock:
+            connections["count"] += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "candidates": [{
+                "content": {"parts": [{"text": "Total portcalls created in January 2025 is 1185."}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 10, "totalTokenCount": 20}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(directory):
+    """Start the HTTPS stub on a free port with a self-signed certificate for 127.0.0.1."""
+    cert = os.path.join(directory, "stub.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", cert, "-out", cert],
+        check=True, capture_output=True
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cert
+
+
+def measure(name, call, requests):
+    connections["count"] = 0
+    call()  # first call pays imports and the first connection either way
+    connections["count"] = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        call()
+    elapsed = time.perf_counter() - start
+    result = {"per_call_ms": round(elapsed / requests * 1000, 2), "connections": connections["count"]}
+    print(f"{name:<34} {result['per_call_ms']:>8.2f} ms/call  {result['connections']:>4} TLS connections")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-request vs shared LLM client setup cost against a local stub.")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        server, cert = start_stub(directory)
+        endpoint = f"https://127.0.0.1:{server.server_address[1]}"
+        os.environ.update({
+            "REQUESTS_CA_BUNDLE": cert,
+            "GOOGLE_API_KEYS": "stub-key",
+            "LLM_PROVIDER": "google",
+            "LLM_MODEL": MODEL,
+            "LLM_TRANSPORT": "rest",
+            "LLM_API_ENDPOINT": endpoint,
+        })
+        import google.generativeai as genai
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from common.llm_clients import get_chat_model, get_phrasing_model, PHRASING_CONFIG
+
+        def per_request_chat():
+            llm = ChatGoogleGenerativeAI(model=MODEL, temperature=0.1, google_api_key="stub-key",
+                                         transport="rest", client_options={"api_endpoint": endpoint})
+            return llm.invoke("How many portcalls in Jan 2025?").content
+
+        def per_request_phrasing():
+            genai.configure(api_key="stub-key", transport="rest", client_options={"api_endpoint": endpoint})
+            model = genai.GenerativeModel(model_name=MODEL, generation_config=PHRASING_CONFIG)
+            return model.start_chat().send_message("How many portcalls in Jan 2025?").text
+
+        def shared_chat():
+            return get_chat_model("answer").invoke("How many portcalls in Jan 2025?").content
+
+        def shared_phrasing():
+            return get_phrasing_model().start_chat().send_message("How many portcalls in Jan 2025?").text
+
+        results = {
+            "chat_per_request": measure("chat model, new per request", per_request_chat, args.requests),
+            "chat_shared": measure("chat model, shared", shared_chat, args.requests),
+            "phrasing_per_request": measure("genai model, configured per request", per_request_phrasing, args.requests),
+            "phrasing_shared": measure("genai model, shared", shared_phrasing, args.requests),
+        }
+        server.shutdown()
+
+    for kind in ("chat", "phrasing"):
+        saved = results[f"{kind}_per_request"]["per_call_ms"] - results[f"{kind}_shared"]["per_call_ms"]
+        print(f"{kind}: {saved:.2f} ms setup saved per request")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from concurrent.futures import ThreadPoolExecutor
+
+# =============================
+# Sync vs async load test
+# =============================
+# Serves main1.py (Flask on a fixed pool of worker threads, like a threaded
+# WSGI server) and main_async.py (Quart on hypercorn) with a fake LLM and the
+# stand-in SQL Server driver, each with a configurable latency, then drives both with
+# the same number of concurrent chats and reports throughput and latency.
+#
+#   python -m benchmarks.load_test --concurrency 100 --requests 400 --llm-latency 1 --db-latency 0.2
+#
+# Policy questions use an offline Chroma store built with hash embeddings in
+# a scratch directory; the answer, SQL and result caches are disabled so every
+# request reaches the (fake) LLM and database.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(mode, port, threads, db_latency):
+    """Run one app in this process until killed."""
+    from benchmarks import fake_db_driver
+    from common.database import Database
+    Database.create_pool(creator=fake_db_driver, query_latency=db_latency)
+
+    if mode == "sync":
+        from concurrent.futures import ThreadPoolExecutor as Pool
+        from werkzeug.serving import BaseWSGIServer
+        from main1 import app
+
+        class PooledWSGIServer(BaseWSGIServer):
+            """Werkzeug server handling requests on a fixed number of threads."""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.pool = Pool(max_workers=threads)
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self._handle, request, client_address)
+
+            def _handle(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        server = PooledWSGIServer("127.0.0.1", port, app)
+        server.request_queue_size = 1024
+        server.serve_forever()
+    else:
+        import asyncio
+        from hypercorn.config import Config
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from main_async import app
+
+        config = Config()
+        config.bind = [f"127.0.0.1:{port}"]
+        config.backlog = 1024
+        config.accesslog = None
+        asyncio.run(hypercorn_serve(app, config))
+
+
+def build_store(category):
+    """Index one category offline into the scratch directory."""
+    from common.embeddings import HashEmbeddings
+    from common.ingestion import sync_category
+    sync_category(category, HashEmbeddings())
+
+
+def server_env(workdir, args):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT,
+        "GOOGLE_API_KEYS": env.get("GOOGLE_API_KEYS", "offline"),
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKEN_DELAY": "0",
+        "EMBEDDING_PROVIDER": "hash",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "cache", "embeddings.sqlite3"),
+        "FILES_ROOT": os.path.join(REPO_ROOT, "files"),
+        "CHROMA_ROOT": os.path.join(workdir, "chroma"),
+        "ANSWER_CACHE_SIMILARITY": "2",
+        "ANSWER_CACHE_MAX_ENTRIES": "0",
+        "SQL_CACHE": "false",
+        "RESULT_CACHE": "false",
+        "CATALOG_WATCH_INTERVAL": "0",
+        "PRELOAD_VECTORSTORES": "true",
+        # Finish warm-up before the server answers, so the load is measured warm.
+        "WARM_UP": "eager",
+    })
+    return env
+
+
+def wait_until_up(port, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/get-categories", timeout=2).read()
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def run_load(port, category, concurrency, total_requests):
+    """Drive `concurrency` chats, each with its own session, until `total_requests` answers came back."""
+    base = f"http://127.0.0.1:{port}"
+    latencies, errors = [], []
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def post(opener, path, data):
+        body = urllib.parse.urlencode(data).encode()
+        return opener.open(base + path, data=body, timeout=600).read()
+
+    def chat(user):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        opener.open(base + "/").read()
+        post(opener, "/set-category", {"category": category})
+        n = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            n += 1
+            question = f"what does the policy say about leave for user {user} question {n}"
+            if category == "MIS":
+                question = f"show monthly volume trend for user {user} question {n}"
+            start = time.perf_counter()
+            try:
+                data = json.loads(post(opener, "/get-response", {"message": question}))
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(chat, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_s": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_s": round(latencies[int(len(latencies) * 0.95) - 1], 3) if latencies else None,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync (Flask) and async (Quart) apps under concurrent chats.")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--categories", nargs="+", default=["HR Policy", "MIS"])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds per fake LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.2, help="seconds per fake SQL query")
+    parser.add_argument("--sync-threads", type=int, default=8, help="request threads of the sync server")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--serve", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.sync_threads, args.db_latency)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="jia-load-")
+    env = server_env(workdir, args)
+    results = []
+    try:
+        policy_categories = [c for c in args.categories if c != "MIS"]
+        if policy_categories:
+            subprocess.run(
+                [sys.executable, "-c", "import sys; from benchmarks.load_test import build_store; "
+                 "[build_store(c) for c in sys.argv[1:]]", *policy_categories],
+                cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL
+            )
+
+        for mode in args.modes:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.load_test", "--serve", mode, "--port", str(args.port),
+                 "--sync-threads", str(args.sync_threads), "--db-latency", str(args.db_latency)],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_until_up(args.port)
+                for category in args.categories:
+                    result = run_load(args.port, category, args.concurrency, args.requests)
+                    result.update({"mode": mode, "category": category})
+                    results.append(result)
+                    print(json.dumps(result))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nconcurrency={args.concurrency} llm_latency={args.llm_latency}s "
+          f"db_latency={args.db_latency}s sync_threads={args.sync_threads}")
+    print(f"{'mode':<6} {'category':<12} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['category']:<12} {r['throughput_rps']:>8} {r['p50_s']!s:>8} {r['p95_s']!s:>8} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# =============================
+# Vector vs hybrid retrieval
+# =============================
+# Indexes one category with the offline HashEmbeddings into a throwaway
+# CHROMA_ROOT, then runs the same questions through plain vector search and
+# the hybrid BM25 + vector retriever. Query embeddings sleep --embed-latency
+# seconds to stand in for the embedding API round trip, which the lexical
+# fast path skips. Prints latency, embedding calls and the top sources, and
+# the estimated prompt tokens of the hybrid context before and after packing
+# (common/context_packing.py) into --budget tokens.
+#
+# --multi indexes every category and runs the questions through the
+# multi-category retriever with one search thread (categories one after the
+# other) and with one thread per category, each store search delayed by
+# --store-latency seconds.
+#
+#   python -m benchmarks.retrieval --category "HR Policy" --embed-latency 0.15
+#   python -m benchmarks.retrieval --multi --store-latency 0.05
+
+QUESTIONS = [
+    "Section 11 Gratuity",
+    "ESIC",
+    "dress code",
+    "what is the gratuity policy",
+    "How many days of leave can I carry forward?",
+    "Who approves travel advances?",
+    "What happens to my provident fund when I resign?",
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare vector-only and hybrid retrieval on one category.")
+    parser.add_argument("--category", default="HR Policy")
+    parser.add_argument("--embed-latency", type=float, default=0.15, help="seconds per query embedding")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--k", type=int, default=4, help="chunks retrieved per question")
+    parser.add_argument("--budget", type=int, default=1500, help="context token budget for packing")
+    parser.add_argument("--multi", action="store_true", help="benchmark the multi-category retriever instead")
+    parser.add_argument("--store-latency", type=float, default=0.05, help="seconds per store search with --multi")
+    parser.add_argument("questions", nargs="*", default=QUESTIONS)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="jia-retrieval-") as workdir:
+        os.environ["CHROMA_ROOT"] = workdir
+        os.environ.setdefault("LOG_CONSOLE", "false")
+        from langchain_community.vectorstores import Chroma
+        from common.categories import get_vectordb_path
+        from common.embeddings import HashEmbeddings
+        from common.ingestion import sync_category, get_index_version
+        from common.lexical_index import load_lexical_index
+        from common.hybrid_retriever import HybridRetriever
+        from common.context_packing import pack_documents, estimate_tokens
+
+        class TimedEmbeddings(HashEmbeddings):
+            calls = 0
+
+            def embed_query(self, text):
+                TimedEmbeddings.calls += 1
+                time.sleep(args.embed_latency)
+                return super().embed_query(text)
+
+        embedding = TimedEmbeddings()
+        if args.multi:
+            return run_multi(args, embedding)
+        sync_category(args.category, HashEmbeddings())
+        store = Chroma(persist_directory=get_vectordb_path(args.category), embedding_function=embedding)
+        retrievers = {
+            "vector": store.as_retriever(search_kwargs={"k": args.k}),
+            "hybrid": HybridRetriever(vectorstore=store, index=load_lexical_index(args.category, get_index_version(args.category)),
+                                      k=args.k),
+        }
+
+        totals = {}
+        context_tokens = {"retrieved": 0, "packed": 0}
+        for question in args.questions:
+            print(f"\n{question}")
+            for name, retriever in retrievers.items():
+                TimedEmbeddings.calls = 0
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    docs = retriever.invoke(question)
+                elapsed = (time.perf_counter() - start) / args.repeat
+                calls = TimedEmbeddings.calls / args.repeat
+                totals[name] = totals.get(name, 0.0) + elapsed
+                sources = ", ".join(f"{os.path.splitext(os.path.basename(d.metadata.get('source', '')))[0][:28]} p{d.metadata.get('page')}"
+                                    for d in docs)
+                print(f"  {name:<7} {elapsed * 1000:>8.1f} ms  {calls:.0f} embedding call(s)  {sources}")
+            retrieved = sum(estimate_tokens(d.page_content) for d in docs)
+            packed = pack_documents(docs, args.budget)
+            packed_tokens = sum(estimate_tokens(d.page_content) for d in packed)
+            context_tokens["retrieved"] += retrieved
+            context_tokens["packed"] += packed_tokens
+            print(f"  context {retrieved} tokens in {len(docs)} chunks -> {packed_tokens} tokens in {len(packed)} passages")
+
+    print()
+    for name, total in totals.items():
+        print(f"{name:<7} mean {total / len(args.questions) * 1000:.1f} ms per question")
+    print(f"hybrid context: {context_tokens['retrieved']} tokens retrieved, {context_tokens['packed']} after packing "
+          f"into {args.budget}-token budgets")
+    return 0
+
+
+def run_multi(args, embedding):
+    from concurrent.futures import ThreadPoolExecutor
+    from langchain_community.vectorstores import Chroma
+    from common.categories import get_document_categories, get_vectordb_path
+    from common.embeddings import HashEmbeddings
+    from common.ingestion import sync_all, get_index_version
+    from common.lexical_index import load_lexical_index
+    from common.hybrid_retriever import HybridRetriever, MultiCategoryRetriever
+
+    class SlowStore(Chroma):
+        def similarity_search_by_vector_with_relevance_scores(self, *a, **kw):
+            time.sleep(args.store_latency)
+            return super().similarity_search_by_vector_with_relevance_scores(*a, **kw)
+
+    categories = get_document_categories()
+    sync_all(categories, HashEmbeddings())
+    retrievers = {
+        c: HybridRetriever(vectorstore=SlowStore(persist_directory=get_vectordb_path(c), embedding_function=embedding),
+                           index=load_lexical_index(c, get_index_version(c)), fast_path=False)
+        for c in categories
+    }
+    print(f"{len(categories)} categories, {args.store_latency * 1000:.0f} ms per store search, "
+          f"{args.embed_latency * 1000:.0f} ms per query embedding")
+    for workers in (1, len(categories)):
+        retriever = MultiCategoryRetriever(categories=categories, get_retriever=retrievers.get, embedding=embedding,
+                                           executor=ThreadPoolExecutor(max_workers=workers))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for question in args.questions:
+                docs = retriever.invoke(question)
+        elapsed = (time.perf_counter() - start) / (args.repeat * len(args.questions))
+        print(f"  {workers} search thread(s): {elapsed * 1000:>8.1f} ms per question, "
+              f"last answer from {sorted({d.metadata['category'] for d in docs})}")
+        retriever.executor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
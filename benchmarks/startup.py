@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import subprocess
+
+# =============================
+# Cold-start time per module
+# =============================
+# Imports each module in a fresh interpreter under `python -X importtime`,
+# reports the wall time, the time to the first /get-categories response for
+# the apps, and the heaviest imports underneath. --record appends the
+# numbers to a JSONL file so cold start can be tracked across changes.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup main1 common.document1 --top 15 --record cache/startup.jsonl
+
+DEFAULT_MODULES = ["main1", "main_async", "common.document1"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter() - start
+first_response = None
+app = getattr(target, "app", None)
+if app is not None:
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.get("/get-categories")
+    if hasattr(response, "__await__"):  # Quart's test client is async
+        import asyncio
+        asyncio.run(response)
+    first_response = time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "first_response_s": first_response}}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return [(cumulative_us, self_us, depth, module)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(cumulative_us), int(self_us), (len(name) - len(name.lstrip())) // 2, name.strip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(module, env):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        env=env, capture_output=True, text=True, timeout=600
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    return timing, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time per module.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list per module")
+    parser.add_argument("--record", default=None, help="Append the results to this JSONL file")
+    args = parser.parse_args(argv)
+
+    # Measure the import itself: no background warm-up, no SQL Server, no network clients.
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEYS", "benchmark")
+    env.setdefault("WARM_UP", "lazy")
+    env.setdefault("CATALOG_WATCH_INTERVAL", "0")
+    env.setdefault("LOG_CONSOLE", "false")
+
+    results = {}
+    for module in args.modules:
+        timing, rows = measure(module, env)
+        first = timing["first_response_s"]
+        print(f"\n{module}: import {timing['import_s'] * 1000:.0f} ms"
+              + (f", first /get-categories {first * 1000:.0f} ms" if first is not None else ""))
+        # Direct dependencies of the measured module, heaviest first.
+        heaviest = sorted((row for row in rows if row[3] != module and row[2] <= 1), reverse=True)[:args.top]
+        for cumulative_us, self_us, _, name in heaviest:
+            print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+        results[module] = {
+            "import_ms": round(timing["import_s"] * 1000, 1),
+            "first_response_ms": round(first * 1000, 1) if first is not None else None,
+            "heaviest": {name: round(cumulative_us / 1000, 1) for cumulative_us, _, _, name in heaviest}
+        }
+
+    if args.record:
+        directory = os.path.dirname(args.record)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "results": results}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
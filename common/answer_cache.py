@@ -0,0 +1,157 @@
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from common.logs import log
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    question = " ".join(question.lower().split())
+    return re.sub(r"[\s?.!]+$", "", question)
+
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """In-process cache of policy answers, per category.
+
+    A question hits when its normalized text matches a cached one exactly, or
+    when its embedding is at least `similarity_threshold` cosine-similar to a
+    cached question of the same category. Entries remember the index version
+    they were answered from and are dropped once the category is re-indexed.
+    Entries expire after `ttl_seconds`; beyond `max_entries` per category the
+    least recently used one is evicted.
+    """
+
+    def __init__(self, embedding=None, similarity_threshold=0.95, ttl_seconds=3600, max_entries=1000):
+        self.embedding = embedding
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0,
+                       "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _category_entries(self, category):
+        entries = self._entries.get(category)
+        if entries is None:
+            entries = self._entries[category] = OrderedDict()
+        return entries
+
+    def _is_live(self, entry, index_version, now):
+        return entry["index_version"] == index_version and now - entry["created"] <= self.ttl_seconds
+
+    def _prune(self, entries, index_version, now):
+        """Drop expired entries and entries answered from an older index."""
+        for key in list(entries.keys()):
+            entry = entries[key]
+            if entry["index_version"] != index_version:
+                del entries[key]
+                self._stats["invalidations"] += 1
+            elif now - entry["created"] > self.ttl_seconds:
+                del entries[key]
+                self._stats["expirations"] += 1
+
+    def _embed(self, question):
+        if self.embedding is None:
+            return None
+        try:
+            return self.embedding.embed_query(question)
+        except Exception as e:
+            log(f"Error embedding question for answer cache: {e}")
+            return None
+
+    def _closest(self, question, candidates):
+        """(key, similarity) of the candidate question closest to `question`, or (None, 0.0)."""
+        # Embed the raw question so the retriever reuses the same embedding-cache entry on a miss.
+        vector = self._embed(question) if candidates else None
+        best_key, best_score = None, 0.0
+        if vector is not None:
+            for candidate_key, candidate_vector in candidates:
+                score = cosine_similarity(vector, candidate_vector)
+                if score > best_score:
+                    best_key, best_score = candidate_key, score
+        return best_key, best_score
+
+    def contains(self, category, question, index_version):
+        """Whether lookup() would hit, without counting a lookup or refreshing the entry's recency."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entries = self._entries.get(category) or {}
+            entry = entries.get(key)
+            if entry is not None and self._is_live(entry, index_version, now):
+                return True
+            candidates = [(k, e["vector"]) for k, e in entries.items()
+                          if e["vector"] is not None and self._is_live(e, index_version, now)]
+        return self._closest(question, candidates)[1] >= self.similarity_threshold
+
+    def lookup(self, category, question, index_version):
+        """Return the cached {"answer", "sources", "match"} for a question, or None."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            entries = self._category_entries(category)
+            entry = entries.get(key)
+            if entry is not None and self._is_live(entry, index_version, now):
+                entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return {"answer": entry["answer"], "sources": entry["sources"], "match": "exact"}
+            self._prune(entries, index_version, now)
+            candidates = [(k, e["vector"]) for k, e in entries.items() if e["vector"] is not None]
+
+        best_key, best_score = self._closest(question, candidates)
+
+        with self._lock:
+            entry = entries.get(best_key) if best_key is not None else None
+            if entry is not None and best_score >= self.similarity_threshold and self._is_live(entry, index_version, now):
+                entries.move_to_end(best_key)
+                self._stats["near_hits"] += 1
+                log(f"Answer cache near hit for '{question}' ~ '{best_key}' ({best_score:.3f})")
+                return {"answer": entry["answer"], "sources": entry["sources"], "match": "similar"}
+            self._stats["misses"] += 1
+        return None
+
+    def store(self, category, question, index_version, answer, sources):
+        """Cache an answer and its sources for a question."""
+        key = normalize_question(question)
+        vector = self._embed(question)
+        with self._lock:
+            entries = self._category_entries(category)
+            entries[key] = {
+                "answer": answer,
+                "sources": sources,
+                "index_version": index_version,
+                "created": time.time(),
+                "vector": vector
+            }
+            entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, category=None):
+        """Drop every cached answer, or those of one category."""
+        with self._lock:
+            if category is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(category, None)
+
+    def stats(self):
+        """Return hit/miss counters and the overall hit rate."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = sum(len(entries) for entries in self._entries.values())
+        hits = snapshot["exact_hits"] + snapshot["near_hits"]
+        snapshot["hit_rate"] = round(hits / snapshot["lookups"], 4) if snapshot["lookups"] else 0.0
+        return snapshot
@@ -0,0 +1,54 @@
+import os
+
+# =============================
+# Category -> on-disk locations
+# =============================
+
+FILES_ROOT = os.getenv("FILES_ROOT", "files")
+CHROMA_ROOT = os.getenv("CHROMA_ROOT", "chroma")
+
+# Document categories backed by a PDF folder and a Chroma store.
+# "MIS" is answered from SQL Server and has no entry here.
+FOLDER_MAP = {
+    "IT Policy": "IT Policy",
+    "HR Policy": "HR Policy",
+    "SOPP_Operation": "SOP/Operation",
+    "SOPP_Procurement": "SOP/Procurement",
+    "SOPP_Revenue": "SOP/Revenue",
+    "SOPP_Sales": "SOP/Sales"
+}
+
+# Pseudo-category whose questions are searched in every document category at once.
+ALL_CATEGORIES = "All Policies"
+
+
+def get_folder_structure():
+    """Returns a user-friendly representation of the folder structure."""
+    return {
+        "IT Policy": "IT Policy",
+        "HR Policy": "HR Policy",
+        "SOPP_Operation": "SOPP_Operation",
+        "SOPP_Procurement": "SOPP_Procurement",
+        "SOPP_Revenue": "SOPP_Revenue",
+        "SOPP_Sales": "SOPP_Sales",
+        "MIS": "MIS",
+        ALL_CATEGORIES: ALL_CATEGORIES
+    }
+
+
+def get_document_categories():
+    """Return the categories that have a PDF folder and a vectorstore."""
+    return list(FOLDER_MAP.keys())
+
+
+def get_source_folder(policy_type):
+    """Return the PDF folder for a category, or None if it has none."""
+    folder_name = FOLDER_MAP.get(policy_type)
+    if not folder_name:
+        return None
+    return f"{FILES_ROOT}/{folder_name}"
+
+
+def get_vectordb_path(policy_type):
+    """Return the Chroma persist directory for a category."""
+    return os.path.join(CHROMA_ROOT, policy_type.lower().replace(' ', '_').replace('-', '_'))
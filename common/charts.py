@@ -1,4 +1,4 @@
-from common.logs import log 
+from common.logs import log, debug
 
 def charts(message):
     chart = False
@@ -20,7 +20,7 @@ def charts(message):
                 chart_type = c_type
               
                 return chart, chart_type  # Return as soon as a chart type is found
-    log(f"Generate chart is :{chart} and chartType is:{chart_type}") 
+    debug(f"Generate chart is :{chart} and chartType is:{chart_type}")
     return chart, chart_type         
 
    
@@ -1,40 +1,296 @@
 import os
+import sys
 import json
+import sqlite3
+import threading
 from datetime import datetime
 
+
+def default_serializer(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)  # fallback for other non-serializable types
+
+
+class JsonChatHistoryStore:
+    """One JSON file per conversation, rewritten on every turn."""
+
+    def __init__(self, chat_history_dir):
+        self.chat_history_dir = chat_history_dir
+
+    def _path(self, conversation_id):
+        return os.path.join(self.chat_history_dir, f"{conversation_id}.json")
+
+    def save(self, conversation_id, chat_history):
+        with open(self._path(conversation_id), 'w') as f:
+            json.dump(chat_history, f, indent=2, default=default_serializer)
+
+    def load(self, conversation_id, last_n=None):
+        file_path = self._path(conversation_id)
+        if not os.path.exists(file_path):
+            return []
+        with open(file_path, 'r') as f:
+            chat_history = json.load(f)
+        return chat_history[-last_n:] if last_n else chat_history
+
+    def append(self, conversation_id, entry):
+        chat_history = self.load(conversation_id)
+        chat_history.append(entry)
+        self.save(conversation_id, chat_history)
+
+    def delete(self, conversation_id):
+        summary_path = os.path.join(self.chat_history_dir, f"{conversation_id}.summary.json")
+        if os.path.exists(summary_path):
+            os.remove(summary_path)
+        file_path = self._path(conversation_id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            return True
+        return False
+
+    def list(self, limit=None, offset=0):
+        conversations = sorted(file[:-5] for file in os.listdir(self.chat_history_dir)
+                               if file.endswith('.json') and not file.endswith('.summary.json'))
+        return conversations[offset:offset + limit] if limit else conversations[offset:]
+
+    def count(self, conversation_id):
+        return len(self.load(conversation_id))
+
+    def get_summary(self, conversation_id):
+        file_path = os.path.join(self.chat_history_dir, f"{conversation_id}.summary.json")
+        if not os.path.exists(file_path):
+            return None, 0
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+        return data.get("summary"), data.get("summarized_turns", 0)
+
+    def save_summary(self, conversation_id, summary, summarized_turns):
+        file_path = os.path.join(self.chat_history_dir, f"{conversation_id}.summary.json")
+        with open(file_path, 'w') as f:
+            json.dump({"summary": summary, "summarized_turns": summarized_turns}, f, indent=2)
+
+
+class SQLiteChatHistoryStore:
+    """Append-only turn log in SQLite (WAL mode).
+
+    Appending a turn is a single INSERT, reading the last N turns uses the
+    (conversation_id, id) index, and conversations are listed from their own
+    table, so no operation scales with the conversation length or with the
+    number of conversations on disk.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                turn_count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at);
+            CREATE TABLE IF NOT EXISTS turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                message TEXT,
+                response TEXT,
+                sources TEXT,
+                timestamp TEXT,
+                category TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_turns_conversation ON turns(conversation_id, id);
+            CREATE TABLE IF NOT EXISTS summaries (
+                conversation_id TEXT PRIMARY KEY,
+                summary TEXT,
+                summarized_turns INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread; SQLite serialises writers across threads and processes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(entry, conversation_id):
+        return (
+            conversation_id,
+            entry.get("message"),
+            json.dumps(entry.get("response"), default=default_serializer),
+            json.dumps(entry.get("sources"), default=default_serializer),
+            entry.get("timestamp"),
+            entry.get("category")
+        )
+
+    @staticmethod
+    def _entry(row):
+        message, response, sources, timestamp, category = row
+        return {
+            "message": message,
+            "response": json.loads(response) if response is not None else None,
+            "sources": json.loads(sources) if sources is not None else None,
+            "timestamp": timestamp,
+            "category": category
+        }
+
+    def _insert(self, conn, conversation_id, entries):
+        now = datetime.now().isoformat()
+        conn.executemany(
+            "INSERT INTO turns (conversation_id, message, response, sources, timestamp, category) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [self._row(entry, conversation_id) for entry in entries]
+        )
+        conn.execute(
+            "INSERT INTO conversations (id, created_at, updated_at, turn_count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at, "
+            "turn_count = conversations.turn_count + excluded.turn_count",
+            (conversation_id, now, now, len(entries))
+        )
+
+    def append(self, conversation_id, entry):
+        conn = self._conn()
+        with conn:
+            self._insert(conn, conversation_id, [entry])
+
+    def save(self, conversation_id, chat_history):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            conn.execute("DELETE FROM summaries WHERE conversation_id = ?", (conversation_id,))
+            if chat_history:
+                self._insert(conn, conversation_id, chat_history)
+
+    def load(self, conversation_id, last_n=None):
+        conn = self._conn()
+        columns = "message, response, sources, timestamp, category"
+        if last_n:
+            rows = conn.execute(
+                f"SELECT {columns} FROM turns WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, last_n)
+            ).fetchall()
+            rows.reverse()
+        else:
+            rows = conn.execute(
+                f"SELECT {columns} FROM turns WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def delete(self, conversation_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM summaries WHERE conversation_id = ?", (conversation_id,))
+            deleted = conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount
+        return deleted > 0
+
+    def list(self, limit=None, offset=0):
+        rows = self._conn().execute(
+            "SELECT id FROM conversations ORDER BY updated_at DESC, id LIMIT ? OFFSET ?",
+            (limit if limit else -1, offset)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, conversation_id):
+        row = self._conn().execute("SELECT turn_count FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_summary(self, conversation_id):
+        row = self._conn().execute(
+            "SELECT summary, summarized_turns FROM summaries WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def save_summary(self, conversation_id, summary, summarized_turns):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (conversation_id, summary, summarized_turns, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (conversation_id, summary, summarized_turns, datetime.now().isoformat())
+            )
+
+    def get_meta(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def import_json_histories(self, chat_history_dir):
+        """Copy every <conversation_id>.json not yet in the database. Returns the number imported."""
+        json_store = JsonChatHistoryStore(chat_history_dir)
+        conn = self._conn()
+        imported = 0
+        for conversation_id in json_store.list():
+            exists = conn.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if exists:
+                continue
+            chat_history = json_store.load(conversation_id)
+            if not chat_history:
+                continue
+            with conn:
+                self._insert(conn, conversation_id, chat_history)
+            imported += 1
+        return imported
+
+
 class ChatHistoryManager:
     """Class to handle chat history operations."""
-    
-    def __init__(self, chat_history_dir='./chat_histories'):
-        """Initialize the chat history manager with directory configuration."""
+
+    def __init__(self, chat_history_dir='./chat_histories', backend=None):
+        """Initialize the chat history manager with directory configuration.
+
+        `backend` (or CHAT_HISTORY_BACKEND) is "sqlite" (default) or "json".
+        The first time the SQLite backend starts it imports the existing
+        per-conversation JSON files once.
+        """
         self.chat_history_dir = chat_history_dir
         os.makedirs(self.chat_history_dir, exist_ok=True)
-    
+        self.backend = (backend or os.getenv("CHAT_HISTORY_BACKEND", "sqlite")).lower()
+        if self.backend == "json":
+            self.store = JsonChatHistoryStore(self.chat_history_dir)
+        elif self.backend == "sqlite":
+            self.store = SQLiteChatHistoryStore(os.path.join(self.chat_history_dir, "chat_history.sqlite3"))
+            if not self.store.get_meta("json_migrated_at"):
+                self.migrate_json_histories()
+        else:
+            raise ValueError(f"Unknown chat history backend: {self.backend}")
+
+    def migrate_json_histories(self):
+        """One-shot import of the legacy JSON histories into the SQLite store."""
+        if self.backend != "sqlite":
+            return 0
+        imported = self.store.import_json_histories(self.chat_history_dir)
+        self.store.set_meta("json_migrated_at", datetime.now().isoformat())
+        return imported
+
     def save_chat_history(self, conversation_id, chat_history):
-        """Save chat history to a JSON file."""
-        def default_serializer(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            return str(obj)  # fallback for other non-serializable types
+        """Replace the whole chat history of a conversation."""
+        self.store.save(conversation_id, chat_history)
+
+    def load_chat_history(self, conversation_id, last_n=None):
+        """Load chat history, optionally only the last `last_n` exchanges."""
+        return self.store.load(conversation_id, last_n=last_n)
 
-        file_path = os.path.join(self.chat_history_dir, f"{conversation_id}.json")
-        with open(file_path, 'w') as f:
-            json.dump(chat_history, f, indent=2, default=default_serializer)
-    
-    def load_chat_history(self, conversation_id):
-        """Load chat history from a JSON file."""
-        file_path = os.path.join(self.chat_history_dir, f"{conversation_id}.json")
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return []
-    
     def add_to_history(self, conversation_id, message, response, sources, category=None):
         """Add a new exchange to the chat history."""
-        # Load existing history
-        chat_history = self.load_chat_history(conversation_id)
-        
-        # Create the new entry
         timestamp = datetime.now().strftime("%d %b, %I:%M %p")
         new_entry = {
             "message": message,
@@ -43,29 +299,35 @@ class ChatHistoryManager:
             "timestamp": timestamp,
             "category": category if category else "multiple"
         }
-        
-        # Add to history and save
-        chat_history.append(new_entry)
-        self.save_chat_history(conversation_id, chat_history)
-        
+        self.store.append(conversation_id, new_entry)
         return timestamp
-    
-    def get_chat_history(self, conversation_id):
+
+    def get_chat_history(self, conversation_id, last_n=None):
         """Return the chat history for a specific conversation."""
-        return self.load_chat_history(conversation_id)
-    
+        return self.load_chat_history(conversation_id, last_n=last_n)
+
     def delete_chat_history(self, conversation_id):
         """Delete chat history for a specific conversation."""
-        file_path = os.path.join(self.chat_history_dir, f"{conversation_id}.json")
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-        return False
-    
-    def list_conversations(self):
-        """List all available conversation IDs."""
-        conversations = []
-        for file in os.listdir(self.chat_history_dir):
-            if file.endswith('.json'):
-                conversations.append(file[:-5])  # Remove .json extension
-        return conversations
+        return self.store.delete(conversation_id)
+
+    def count_turns(self, conversation_id):
+        """Return the number of exchanges in a conversation."""
+        return self.store.count(conversation_id)
+
+    def get_summary(self, conversation_id):
+        """Return (running summary, number of leading exchanges it covers)."""
+        return self.store.get_summary(conversation_id)
+
+    def save_summary(self, conversation_id, summary, summarized_turns):
+        """Store the running summary of the first `summarized_turns` exchanges."""
+        self.store.save_summary(conversation_id, summary, summarized_turns)
+
+    def list_conversations(self, limit=None, offset=0):
+        """List conversation IDs, most recently updated first for SQLite, one page at a time."""
+        return self.store.list(limit=limit, offset=offset)
+
+
+if __name__ == "__main__":
+    # python -m common.chat_history_manager [chat_history_dir]
+    manager = ChatHistoryManager(sys.argv[1] if len(sys.argv) > 1 else './chat_histories', backend="sqlite")
+    print(f"Imported {manager.migrate_json_histories()} new conversations into {manager.store.db_path}")
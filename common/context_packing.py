@@ -0,0 +1,132 @@
+import threading
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# =============================
+# Context packing
+# =============================
+# Chunks are split with a 200-character overlap, so the top-k chunks of one
+# PDF page often repeat each other's text in the prompt. Between retrieval
+# and the answer prompt, chunks of the same source and page are merged with
+# the overlap removed, the merged passages are kept in relevance order, and
+# passages stop once the token budget is spent. Tokens are estimated at four
+# characters each, close enough for Gemini on English text without a
+# tokenizer call.
+
+CHARS_PER_TOKEN = 4
+# Shorter shared text is not treated as overlap (it could be a common phrase).
+MIN_OVERLAP = 20
+# A passage cut shorter than this at the end of the budget is left out instead.
+MIN_TAIL_CHARS = 200
+
+_stats = {"packed": 0, "chunks_in": 0, "passages_out": 0, "chars_in": 0, "chars_out": 0, "truncated": 0}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def merge_overlapping(first, second):
+    """Return `first` and `second` joined without the text they share, or None if they don't overlap.
+
+    Handles either order and one chunk containing the other.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for head, tail in ((first, second), (second, first)):
+        prefix = tail[:MIN_OVERLAP]
+        start = head.find(prefix)
+        while start != -1:
+            if tail.startswith(head[start:]):
+                return head + tail[len(head) - start:]
+            start = head.find(prefix, start + 1)
+    return None
+
+
+def merge_page_chunks(chunks):
+    """Merge the overlapping chunks of one page; chunks that don't touch stay separate.
+
+    Takes and returns [(rank, text)]; a merged passage keeps its best rank.
+    """
+    passages = []
+    for rank, text in chunks:
+        text = text.strip()
+        merged = True
+        while merged:
+            merged = False
+            for i, (passage_rank, passage) in enumerate(passages):
+                joined = merge_overlapping(passage, text)
+                if joined is not None:
+                    # The merged passage may now bridge to another one, so try again.
+                    rank, text = min(rank, passage_rank), joined
+                    del passages[i]
+                    merged = True
+                    break
+        passages.append((rank, text))
+    return passages
+
+
+def pack_documents(docs, token_budget):
+    """Merge adjacent chunks per (source, page), keep relevance order and stop at `token_budget` tokens.
+
+    `docs` come best first. The passage that crosses the budget is cut to
+    fit, and the first passage is always kept (cut if needed).
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("category"), doc.metadata.get("source"), doc.metadata.get("page"))
+        group = groups.setdefault(key, {"metadata": doc.metadata, "chunks": []})
+        group["chunks"].append((rank, doc.page_content))
+
+    passages = []
+    for group in groups.values():
+        for rank, text in merge_page_chunks(group["chunks"]):
+            passages.append((rank, text, group["metadata"]))
+    passages.sort(key=lambda passage: passage[0])
+
+    packed, used, truncated = [], 0, False
+    for _, text, metadata in passages:
+        tokens = estimate_tokens(text)
+        if used + tokens > token_budget:
+            remaining_chars = (token_budget - used) * CHARS_PER_TOKEN
+            if not packed or remaining_chars >= MIN_TAIL_CHARS:
+                packed.append(Document(page_content=text[:remaining_chars], metadata=dict(metadata)))
+            truncated = True
+            break
+        packed.append(Document(page_content=text, metadata=dict(metadata)))
+        used += tokens
+
+    with _stats_lock:
+        _stats["packed"] += 1
+        _stats["chunks_in"] += len(docs)
+        _stats["passages_out"] += len(packed)
+        _stats["chars_in"] += sum(len(doc.page_content) for doc in docs)
+        _stats["chars_out"] += sum(len(doc.page_content) for doc in packed)
+        _stats["truncated"] += int(truncated)
+    return packed
+
+
+def packing_stats():
+    """Chunks and characters before and after packing, summed over all retrievals."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    if snapshot["chars_in"]:
+        snapshot["chars_saved_ratio"] = round(1 - snapshot["chars_out"] / snapshot["chars_in"], 3)
+    return snapshot
+
+
+class PackedRetriever(BaseRetriever):
+    """Wraps a retriever and packs its documents into at most `token_budget` tokens of context."""
+
+    retriever: Any
+    token_budget: int = 1500
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return pack_documents(self.retriever.invoke(query), self.token_budget)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return pack_documents(await self.retriever.ainvoke(query), self.token_budget)
@@ -0,0 +1,121 @@
+import os
+from common.logs import log
+
+# =============================
+# Bounded conversation memory
+# =============================
+# The recent exchanges are replayed verbatim while they fit in the token
+# budget. Once they overflow, the oldest ones are folded into a running
+# summary stored next to the chat history, so every exchange is summarized
+# once and the prompt size stays flat however long the conversation gets.
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a user and a company policy assistant, adding onto the previous summary and returning a new summary.
+Keep policy names, categories, numbers and any facts the user may refer back to. Be concise.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) that needs no tokenizer."""
+    return len(text) // 4 + 1
+
+
+def _exchange_text(exchange):
+    response = exchange.get("response")
+    if not isinstance(response, str):
+        response = str(response)
+    return exchange.get("message") or "", response
+
+
+def exchange_tokens(exchange):
+    message, response = _exchange_text(exchange)
+    return estimate_tokens(message) + estimate_tokens(response)
+
+
+def summarize_exchanges(llm, summary, exchanges):
+    """Fold `exchanges` into `summary` with one LLM call."""
+    new_lines = ""
+    for exchange in exchanges:
+        message, response = _exchange_text(exchange)
+        new_lines += f"Human: {message}\nAssistant: {response}\n"
+    result = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(none)", new_lines=new_lines))
+    return getattr(result, "content", result).strip()
+
+
+def new_memory():
+    # Imported here so the apps can import this module without loading LangChain.
+    from langchain.memory import ConversationBufferMemory
+    return ConversationBufferMemory(
+        memory_key="chat_history",
+        return_messages=True,
+        output_key="answer"  # This is the fix - specify which output key to store in memory
+    )
+
+
+def buffer_memory(chat_history):
+    """Unbounded memory replaying every previous exchange (the original behaviour)."""
+    memory = new_memory()
+    for exchange in chat_history or []:
+        if exchange.get("message") and exchange.get("response"):
+            message, response = _exchange_text(exchange)
+            memory.chat_memory.add_user_message(message)
+            memory.chat_memory.add_ai_message(response)
+    return memory
+
+
+def bounded_memory(chat_history_manager, conversation_id, llm, token_budget=None):
+    """Memory holding a running summary plus the most recent exchanges within `token_budget`."""
+    token_budget = token_budget or int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+    total = chat_history_manager.count_turns(conversation_id)
+    summary, summarized = chat_history_manager.get_summary(conversation_id)
+    summarized = min(summarized, total)
+
+    # Only the exchanges not yet covered by the summary are read.
+    window = chat_history_manager.get_chat_history(conversation_id, last_n=total - summarized) if total > summarized else []
+    window_tokens = sum(exchange_tokens(e) for e in window)
+
+    if len(window) > 1 and window_tokens + estimate_tokens(summary or "") > token_budget:
+        # Summarize down to half the budget so we don't summarize again on the next turn.
+        keep_tokens, keep = 0, 0
+        for exchange in reversed(window):
+            tokens = exchange_tokens(exchange)
+            # Always keep the last exchange verbatim so follow-up questions can resolve against it.
+            if keep and keep_tokens + tokens > token_budget // 2:
+                break
+            keep_tokens += tokens
+            keep += 1
+        overflow = window[:len(window) - keep]
+        try:
+            summary = summarize_exchanges(llm, summary, overflow)
+            summarized += len(overflow)
+            chat_history_manager.save_summary(conversation_id, summary, summarized)
+            window = window[len(overflow):]
+            log(f"Summarized {len(overflow)} exchanges of {conversation_id}; {len(window)} kept verbatim")
+        except Exception as e:
+            # Fall back to truncating; the summary is retried on the next turn.
+            log(f"Error summarizing conversation {conversation_id}: {e}")
+            window = window[len(overflow):]
+
+    memory = new_memory()
+    if summary:
+        from langchain.schema.messages import SystemMessage
+        memory.chat_memory.add_message(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+    for exchange in window:
+        if exchange.get("message") and exchange.get("response"):
+            message, response = _exchange_text(exchange)
+            memory.chat_memory.add_user_message(message)
+            memory.chat_memory.add_ai_message(response)
+    return memory
+
+
+def build_memory(chat_history_manager, conversation_id, llm):
+    """Build the chain memory for a conversation according to MEMORY_MODE ("bounded" or "buffer")."""
+    if os.getenv("MEMORY_MODE", "bounded").lower() == "buffer":
+        return buffer_memory(chat_history_manager.get_chat_history(conversation_id))
+    return bounded_memory(chat_history_manager, conversation_id, llm)
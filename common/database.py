@@ -1,4 +1,6 @@
 import os
+import time
+import threading
 import pymssql
 from dbutils.pooled_db import PooledDB
 from dotenv import load_dotenv
@@ -10,50 +12,192 @@ import sys
 load_dotenv()
 
 class Database:
+    """Access to the MIS SQL Server through one process-wide connection pool.
+
+    The pool is created on first use (or by warm_up() at startup) and shared by
+    every Database() instance, so connections and their TDS logins are reused
+    across queries. Sizing and health checks come from the environment:
+
+        DB_POOL_MIN   idle connections opened up front (default 1)
+        DB_POOL_MAX   connections open at once; callers wait beyond it (default 5)
+        DB_POOL_IDLE  idle connections kept open (default DB_POOL_MAX)
+        DB_POOL_PING  check a connection with "SELECT 1" when it is checked out,
+                      reopening it if it is dead (default true)
+    """
+
     __raw_connection = None
+    _ping_on_checkout = True
+    _pool_lock = threading.Lock()
+    _create_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _stats = {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "active": 0,
+              "connections_created": 0, "pings": 0, "ping_failures": 0, "query_errors": 0}
 
     def __init__(self):
         try:
-            self.host = os.getenv("HOST")
-            self.username = os.getenv("USERNAME")
-            self.password = os.getenv("PASSWORD")
-            self.port = int(os.getenv("PORT"))
-            self.db_name = os.getenv("DB_NAME")
-
-            # Initialize connection pool
-            Database.__raw_connection = PooledDB(
-                creator=pymssql,
-                server=self.host,
-                user=self.username,
-                password=self.password,
-                database=self.db_name,
-                port=self.port,
-                autocommit=True,
-                maxconnections=5
-            )
-
-            # Print connection details (for debugging)
-           
-        
+            Database.get_pool()
         except Exception as e:
             log(f"Error initializing database connection: {e}")
             sys.exit(1)  # Exit if the database connection fails
 
+    @classmethod
+    def create_pool(cls, creator=None, **connect_kwargs):
+        """(Re)build the shared pool.
+
+        `creator` is a DB-API 2 module or connection function (pymssql by
+        default, in which case the connection settings come from the
+        environment); `connect_kwargs` are passed to it.
+        """
+        if creator is None:
+            creator = pymssql
+            connect_kwargs = {
+                "server": os.getenv("HOST"),
+                "user": os.getenv("USERNAME"),
+                "password": os.getenv("PASSWORD"),
+                "database": os.getenv("DB_NAME"),
+                "port": int(os.getenv("PORT")),
+                "autocommit": True,
+            }
+        dbapi = creator if hasattr(creator, "connect") else getattr(creator, "dbapi", None)
+        connect = creator.connect if hasattr(creator, "connect") else creator
+
+        def create_connection(*args, **kwargs):
+            con = connect(*args, **kwargs)
+            with cls._stats_lock:
+                cls._stats["connections_created"] += 1
+            return con
+
+        create_connection.dbapi = dbapi
+        create_connection.threadsafety = getattr(dbapi, "threadsafety", 1)
+
+        failures = tuple(getattr(dbapi, name) for name in ("OperationalError", "InterfaceError", "InternalError")
+                         if hasattr(dbapi, name)) or None
+        max_connections = int(os.getenv("DB_POOL_MAX", "5"))
+        pool = PooledDB(
+            creator=create_connection,
+            mincached=int(os.getenv("DB_POOL_MIN", "1")),
+            maxcached=int(os.getenv("DB_POOL_IDLE", str(max_connections))),
+            maxconnections=max_connections,
+            blocking=True,  # wait for a free connection instead of failing
+            failures=failures,
+            ping=0,  # pymssql connections have no ping(); _checkout runs SELECT 1 instead
+            **connect_kwargs
+        )
+        cls._ping_on_checkout = os.getenv("DB_POOL_PING", "true").lower() == "true"
+        with cls._pool_lock:
+            old_pool, Database.__raw_connection = Database.__raw_connection, pool
+        if old_pool is not None:
+            old_pool.close()
+        log(f"Database pool created (min={os.getenv('DB_POOL_MIN', '1')}, max={max_connections})")
+        return pool
+
+    @classmethod
+    def get_pool(cls):
+        """Return the shared pool, creating it on first use."""
+        if Database.__raw_connection is None:
+            with cls._create_lock:
+                if Database.__raw_connection is None:
+                    cls.create_pool()
+        return Database.__raw_connection
+
+    @classmethod
+    def warm_up(cls):
+        """Open the pool and its minimum connections now instead of on the first MIS question."""
+        try:
+            cls.get_pool()
+            return True
+        except Exception as e:
+            log(f"Database warm-up failed: {e}")
+            return False
+
+    @classmethod
+    def close_pool(cls):
+        with cls._pool_lock:
+            pool, Database.__raw_connection = Database.__raw_connection, None
+        if pool is not None:
+            pool.close()
+
+    @classmethod
+    def stats(cls):
+        """Checkout wait times, active/idle connections and connection churn."""
+        with cls._stats_lock:
+            snapshot = dict(cls._stats)
+        pool = Database.__raw_connection
+        snapshot["idle"] = len(getattr(pool, "_idle_cache", [])) if pool is not None else 0
+        snapshot["avg_wait_seconds"] = round(snapshot["wait_seconds"] / snapshot["checkouts"], 6) if snapshot["checkouts"] else 0.0
+        snapshot["wait_seconds"] = round(snapshot["wait_seconds"], 6)
+        snapshot["max_wait_seconds"] = round(snapshot["max_wait_seconds"], 6)
+        return snapshot
+
+    @staticmethod
+    def _ping(connection):
+        """Run SELECT 1 on a checked-out connection; False if it was dead and had to be reopened.
+
+        The pooled connection's cursor reconnects and retries once when the
+        server has dropped the connection, so a dead connection shows up as a
+        new underlying DB-API connection rather than as an error
+        (dbapi_connection needs DBUtils 3.2 or later).
+        """
+        with Database._stats_lock:
+            Database._stats["pings"] += 1
+        before = connection.dbapi_connection
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return connection.dbapi_connection is before
+
+    def _checkout(self):
+        start = time.perf_counter()
+        pool = Database.get_pool()
+        connection = pool.connection()
+        waited = time.perf_counter() - start
+        if Database._ping_on_checkout:
+            try:
+                alive = Database._ping(connection)
+            except Exception as e:
+                # It could not be reopened in place: close it, give the slot back and take a fresh one.
+                log(f"Pooled connection failed its health check: {e}", level="WARNING")
+                try:
+                    connection.dbapi_connection.close()
+                except Exception:
+                    pass
+                connection.close()
+                connection, alive = pool.connection(), False
+            if not alive:
+                with Database._stats_lock:
+                    Database._stats["ping_failures"] += 1
+        with Database._stats_lock:
+            Database._stats["checkouts"] += 1
+            Database._stats["active"] += 1
+            Database._stats["wait_seconds"] += waited
+            Database._stats["max_wait_seconds"] = max(Database._stats["max_wait_seconds"], waited)
+        return connection
+
+    def _checkin(self, connection):
+        connection.close()  # returns it to the pool
+        with Database._stats_lock:
+            Database._stats["active"] -= 1
+
     # Execute a query (returns all results)
     def execute(self, query, args=None):
         connection = None
         try:
-            connection = Database.__raw_connection.connection()
+            connection = self._checkout()
             with connection.cursor(as_dict=True) as cursor:  # Use as_dict=True to return results as dicts
                 cursor.execute(query, args)
                 result = cursor.fetchall()
             return result
         except Exception as e:
+            with Database._stats_lock:
+                Database._stats["query_errors"] += 1
             log(f"Exception occurred in execute(): {e}")
             return []
         finally:
             if connection:
-                connection.close()
+                self._checkin(connection)
 
     # Get multiple records
     def getall(self, query, args=None):
@@ -1,7 +1,6 @@
 import os
 from flask import  jsonify, make_response
-import pandas as pd
-import google.generativeai as genai
+from common.llm_clients import get_phrasing_model
 import json
 import math
 from common.logs import log
@@ -9,34 +8,92 @@ from dotenv import load_dotenv
 from decimal import Decimal
 load_dotenv()
 
+# Large PIVOT results are returned a page at a time.
+MIS_PAGE_SIZE = int(os.getenv("MIS_PAGE_SIZE", "500"))
+
+
+def sanitize_value(value):
+    """Make a single value JSON-safe: Decimal -> float, NaN/Inf -> None."""
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    return value
+
+
 def sanitize_data_for_json(data):
+    """
+    Recursively sanitize data to make it JSON serializable
+    Converts NaN, None, and Decimal values to appropriate JSON-safe values
+    """
     try:
-        """
-        Recursively sanitize data to make it JSON serializable
-        Converts NaN, None, and Decimal values to appropriate JSON-safe values
-        """
         if isinstance(data, dict):
-            log("Data is Dict")
             return {key: sanitize_data_for_json(value) for key, value in data.items()}
         elif isinstance(data, list):
-            log("Data is list")
             return [sanitize_data_for_json(item) for item in data]
-        elif data is None:
-            log("Data is None")
-            return None  # Keep None as null in JSON
-        elif isinstance(data, float):
-            log("Data is float")
-            if math.isnan(data) or math.isinf(data):
-                return None  # Convert NaN and Inf to null
-            return data
-        elif isinstance(data, Decimal):
-            log("Data is decimal")
-            return float(data)  # Convert Decimal to float
-        else:
-            log(f"Row Data:{data}")
-            return data
+        return sanitize_value(data)
     except Exception as e:
-        log(f"Exception occurred in sanitize_data_for_json():{e} ")    
+        log(f"Exception occurred in sanitize_data_for_json():{e} ")
+
+
+def result_columns(rows):
+    """Column names of a query result (rows from one cursor share their keys)."""
+    return list(rows[0].keys()) if rows and isinstance(rows[0], dict) else []
+
+
+def sanitize_rows(rows, columns):
+    """Sanitize query rows column by column.
+
+    The type of each column is taken from its first non-null value, and only
+    Decimal/float columns are converted, so text and integer columns cost
+    nothing and rows without such columns are returned as they are.
+    """
+    converters = []
+    for column in columns:
+        for row in rows:
+            value = row.get(column)
+            if value is not None:
+                if isinstance(value, (Decimal, float)):
+                    converters.append(column)
+                break
+    if not converters:
+        return rows
+    sanitized = []
+    for row in rows:
+        row = dict(row)
+        for column in converters:
+            row[column] = sanitize_value(row.get(column))
+        sanitized.append(row)
+    return sanitized
+
+
+def paginate(rows, page=1, page_size=None):
+    """Return (rows of the page, pagination info or None when everything fits on one page)."""
+    page_size = page_size or MIS_PAGE_SIZE
+    total_rows = len(rows)
+    if total_rows <= page_size and page <= 1:
+        return rows, None
+    total_pages = max(1, math.ceil(total_rows / page_size))
+    page = min(max(1, page), total_pages)
+    start = (page - 1) * page_size
+    return rows[start:start + page_size], {
+        "page": page,
+        "page_size": page_size,
+        "total_rows": total_rows,
+        "total_pages": total_pages
+    }
+
+
+def chart_data(rows, columns):
+    """Labels/values for the chart: first two columns for two-column results, else the first row."""
+    if len(columns) == 2:
+        labels = [row.get(columns[0]) for row in rows]
+        values = [row.get(columns[1]) for row in rows]
+    else:
+        labels = list(columns)
+        values = [rows[0].get(column) for column in columns] if rows else []
+    return labels, values
+
 
 def generate_natural_response(model,data, message):
     try:
@@ -74,62 +131,57 @@ def generate_natural_response(model,data, message):
         log(f"Exception occurred in generate_natural_response():{e}")
 
 
-def database_query(response,chart,chart_type,user_message):
-    try:    
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEYS"))
-        config = {
-            "temperature": 0,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-        }
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config=config)
-
-        if isinstance(response, list):        
-            df = pd.DataFrame(response)
-            columns_str = ','.join(df.columns.tolist())
-            if len(df.columns) > 1:
-                if chart:                 
-                    labels=df.columns.tolist()
-                    values=df.iloc[0, :].tolist()
-                    if len(labels)==2:                      
-                        labels=df.iloc[:,0].tolist()
-                        values=df.iloc[:,1].tolist()                
-                    response_data1 = {
-                        'response': response,
-                        'chartData': {
-                            'labels':  labels, # First column as Labels
-                            'values': values,  # Second column as Values
-                            'title': 'Generated Chart',
-                            'chart_type': chart_type
-                        },
-                        'suggestions':""
-                    }
-                    response_data = sanitize_data_for_json(response_data1)
-                    
-                else:
-                    response_data = {'response': response,'suggestions':""}
-               
-                resp = make_response(jsonify(response_data))
-            
-                resp.set_cookie('columns', columns_str, max_age=60*60*24, domain="127.0.0.1")
-                return resp
-
-            else:
-                natural_response =generate_natural_response(model,response, user_message)
-                return jsonify({'response': natural_response,'suggestions':""})
-        elif response=="No Data Found":
-         
-            natural_response = generate_natural_response(model,response, user_message)
-            return jsonify({'response': natural_response,'suggestions':""})
+def build_database_answer(response,chart,chart_type,user_message,page=1,page_size=None):
+    """Turn the rows of an MIS query into the response payload.
+
+    Returns (response_data, columns) where columns is the comma-separated
+    column list for multi-column results and None otherwise. Kept free of
+    Flask so the async app can build the same payload. Results longer than
+    a page (MIS_PAGE_SIZE rows) are cut to the requested page and carry a
+    'pagination' entry.
+    """
+    model = get_phrasing_model()
+
+    if isinstance(response, list):
+        columns = result_columns(response)
+        columns_str = ','.join(columns)
+        if len(columns) > 1:
+            rows, pagination = paginate(response, page, page_size)
+            rows = sanitize_rows(rows, columns)
+            response_data = {'response': rows,'suggestions':""}
+            if chart:
+                labels, values = chart_data(rows, columns)
+                response_data['chartData'] = {
+                    'labels':  labels, # First column as Labels
+                    'values': values,  # Second column as Values
+                    'title': 'Generated Chart',
+                    'chart_type': chart_type
+                }
+            if pagination:
+                response_data['pagination'] = pagination
+            return response_data, columns_str
 
         else:
-        
-            structured_response = format_structured_response(response)
-            return jsonify({'response': structured_response,'suggestions':""})
+            natural_response =generate_natural_response(model,response, user_message)
+            return {'response': natural_response,'suggestions':""}, None
+    elif response=="No Data Found":
+     
+        natural_response = generate_natural_response(model,response, user_message)
+        return {'response': natural_response,'suggestions':""}, None
+
+    else:
+    
+        structured_response = format_structured_response(response)
+        return {'response': structured_response,'suggestions':""}, None
+
+
+def database_query(response,chart,chart_type,user_message,page=1):
+    try:    
+        response_data, columns_str = build_database_answer(response, chart, chart_type, user_message, page=page)
+        resp = make_response(jsonify(response_data))
+        if columns_str is not None:
+            resp.set_cookie('columns', columns_str, max_age=60*60*24, domain="127.0.0.1")
+        return resp
     except Exception as e:
         log(f"Exception occurred in database query():{e}")    
 
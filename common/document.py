@@ -2,7 +2,7 @@ import os
 import datetime
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader,UnstructuredPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.vectorstores import Chroma
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
@@ -12,6 +12,7 @@ from langchain.chains import RetrievalQA
 from common.database import Database
 from langchain.chains import LLMChain
 from common.logs import log
+from common.embeddings import get_embedding
 from dotenv import load_dotenv
 import glob
 import re
@@ -21,7 +22,7 @@ load_dotenv()
 # Configuration
 # =============================
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEYS")  # Replace with your real key
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+embedding = get_embedding()
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1)
 
 # =============================
@@ -2,72 +2,61 @@ import os
 import datetime
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader,UnstructuredPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_community.vectorstores import Chroma
 from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain.memory import ConversationBufferMemory
 from langchain.schema.messages import AIMessage, HumanMessage
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
 from common.database import Database
 from langchain.chains import LLMChain
-from common.logs import log
+from common.logs import log, debug
+from common.embeddings import get_embedding, get_model_name
+from common.llm_clients import get_chat_model
+from common.categories import get_document_categories, get_source_folder, get_vectordb_path, get_folder_structure, ALL_CATEGORIES
+from common.vectorstore_registry import VectorStoreRegistry
+from common.lexical_index import get_lexical_index
+from common.hybrid_retriever import HybridRetriever, MultiCategoryRetriever, retrieval_stats
+from common.context_packing import PackedRetriever, packing_stats
+from common.policy_catalog import get_policy_catalog
+from common.conversation_memory import buffer_memory
+from common.ingestion import sync_category, get_index_version, embedding_model_matches
+from common.sql_cache import get_sql_cache
+from common.result_cache import get_result_cache
+from common.mis_parser import get_mis_parser, ENTITY_SQL
 from dotenv import load_dotenv
 import glob
 import re
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 load_dotenv()
 
 # =============================
 # Configuration
 # =============================
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEYS")  # Replace with your real key
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1)
+embedding = get_embedding()
+
+
+# Shared by the memory summarizer and the condense step; see common/llm_clients.py.
+llm = get_chat_model("answer")
 
 # =============================
 # Document Processing Functions
 # =============================
 
-def get_folder_structure():
-    """Returns a user-friendly representation of the folder structure."""
-    return {
-        "IT Policy": "IT Policy",
-        "HR Policy": "HR Policy",
-        "SOPP_Operation": "SOPP_Operation",
-        "SOPP_Procurement": "SOPP_Procurement",
-        "SOPP_Revenue": "SOPP_Revenue",
-        "SOPP_Sales": "SOPP_Sales",
-        "MIS": "MIS"
-    }
-
 def get_policy_count(policy_type):
     """Get the number of policies in a specific category."""
     try:
-        folder_map = {
-            "IT Policy": "IT Policy",
-            "HR Policy": "HR Policy",
-            "SOPP_Operation": "SOP/Operation",
-            "SOPP_Procurement": "SOP/Procurement",
-            "SOPP_Revenue": "SOP/Revenue",
-            "SOPP_Sales": "SOP/Sales"
-        }
-        
-        folder_name = folder_map.get(policy_type)
-        if not folder_name:
-            return f"Invalid policy type: {policy_type}"
-        
-        base_folder = f"files/{folder_name}"
-        
-        if not os.path.exists(base_folder):
-            return f"Folder not found: {base_folder}"
-        
-        # Count PDF files in the directory
-        pdf_files = glob.glob(os.path.join(base_folder, "*.pdf"))
-        count = len(pdf_files)
-        
-        log(f"Policy count for {policy_type}: {count}")
-        return f"There are {count} policies in the {policy_type} category."
-        
+        if policy_type == ALL_CATEGORIES:
+            return get_policy_catalog().format_summary()
+        response = get_policy_catalog().format_count(policy_type)
+        log(f"Policy count for {policy_type}: {response}")
+        return response
     except Exception as e:
         log(f"Error in get_policy_count: {e}")
         return f"Error counting policies: {str(e)}"
@@ -75,52 +64,9 @@ def get_policy_count(policy_type):
 def get_policy_names(policy_type):
     """Get the names of all policies in a specific category."""
     try:
-        folder_map = {
-            "IT Policy": "IT Policy",
-            "HR Policy": "HR Policy",
-            "SOPP_Operation": "SOP/Operation",
-            "SOPP_Procurement": "SOP/Procurement",
-            "SOPP_Revenue": "SOP/Revenue",
-            "SOPP_Sales": "SOP/Sales"
-        }
-        
-        folder_name = folder_map.get(policy_type)
-        if not folder_name:
-            return f"Invalid policy type: {policy_type}"
-        
-        base_folder = f"files/{folder_name}"
-        
-        if not os.path.exists(base_folder):
-            return f"Folder not found: {base_folder}"
-        
-        # Get all PDF files in the directory
-        pdf_files = glob.glob(os.path.join(base_folder, "*.pdf"))
-        
-        if not pdf_files:
-            return f"No policies found in the {policy_type} category."
-        
-        # Extract file names without extension and path
-        policy_names = []
-        for file_path in pdf_files:
-            file_name = os.path.basename(file_path)
-            # Remove .pdf extension
-            policy_name = os.path.splitext(file_name)[0]
-            # Clean up the name (replace underscores with spaces, etc.)
-            policy_name = policy_name.replace('_', ' ').replace('-', ' ')
-            policy_names.append(policy_name)
-        
-        # Sort the names for better presentation
-        policy_names.sort()
-        
-        log(f"Policy names for {policy_type}: {policy_names}")
-        
-        # Format the response
-        response = f"Here are the {len(policy_names)} policies in the {policy_type} category:\n\n"
-        for i, name in enumerate(policy_names, 1):
-            response += f"{i}. {name}\n"
-        
-        return response.strip()
-        
+        if policy_type == ALL_CATEGORIES:
+            return get_policy_catalog().format_all_names()
+        return get_policy_catalog().format_names(policy_type)
     except Exception as e:
         log(f"Error in get_policy_names: {e}")
         return f"Error retrieving policy names: {str(e)}"
@@ -130,56 +76,169 @@ def get_policy_names(policy_type):
 def load_vectorstore(policy_type):
     try:
         """Load or create vectorstore for the given policy type."""
-        # Map policy_type to actual folder path
-        folder_map = {
-            "IT Policy": "IT Policy",
-            "HR Policy": "HR Policy",
-            "SOPP_Operation": "SOP/Operation",
-            "SOPP_Procurement": "SOP/Procurement",
-            "SOPP_Revenue": "SOP/Revenue",
-            "SOPP_Sales": "SOP/Sales"
-        }
-
-        folder_name = folder_map.get(policy_type)
-        if not folder_name:
+        base_folder = get_source_folder(policy_type)
+        if not base_folder:
             raise ValueError(f"Invalid policy type: {policy_type}")
 
-        base_folder = f"files/{folder_name}"
-        vectordb_path = f"chroma/{policy_type.lower().replace(' ', '_').replace('-', '_')}"
+        vectordb_path = get_vectordb_path(policy_type)
 
-        if os.path.exists(vectordb_path):
-            vectorstore = Chroma(persist_directory=vectordb_path, embedding_function=embedding)
-        else:
-           
-            loader = DirectoryLoader(path=base_folder, glob="*.pdf", loader_cls=PyPDFLoader)
-            docs = loader.load()
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            documents = splitter.split_documents(docs)
-            vectorstore = Chroma.from_documents(documents, embedding, persist_directory=vectordb_path)
-            vectorstore.persist()
+        if not os.path.exists(vectordb_path):
+            # First build goes through the incremental sync so the store gets a manifest.
+            sync_category(policy_type, embedding)
+        elif not embedding_model_matches(policy_type, embedding):
+            # Vectors from another model can't be searched with this one; the sync re-embeds them.
+            log(f"{policy_type} was indexed with another embedding model, re-indexing with {get_model_name(embedding)}",
+                level="WARNING")
+            sync_category(policy_type, embedding)
 
+        vectorstore = Chroma(persist_directory=vectordb_path, embedding_function=embedding)
         return vectorstore
     except Exception as e:
         log(f"Error in load_vectorstore:{e}")
 
-def build_qa_chain(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, chat_history=None):
-    """Build QA chain for the given policy type with enhanced policy query handling."""
-    try:
-        
-        if policy_type == "MIS":
-            log(f"User selected data base for Q&A:{policy_type}")
-            current_datetime = datetime.datetime.now()
-            
-            # Build chat history context for MIS queries
-            chat_context = ""
-            if chat_history:
-                recent_history = chat_history[-3:]  # Last 3 exchanges for context
-                for exchange in recent_history:
-                    if exchange.get("message") and exchange.get("response"):
-                        chat_context += f"Previous Question: {exchange['message']}\n"
-                        chat_context += f"Previous Response: {exchange['response']}\n\n"
-            
-            prompt_template = """
+
+# RETRIEVAL_MODE=hybrid (default) fuses the BM25 index with vector search, vector uses Chroma alone.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+
+
+def build_retriever(policy_type, vectorstore, **search_kwargs):
+    """Retriever for a category: hybrid BM25 + vector search, or plain vector search."""
+    if RETRIEVAL_MODE != "hybrid":
+        return vectorstore.as_retriever(search_kwargs=search_kwargs) if search_kwargs else vectorstore.as_retriever()
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        index=get_lexical_index(policy_type, vectorstore, get_index_version(policy_type)),
+        k=search_kwargs.get("k", int(os.getenv("RETRIEVAL_K", "4"))),
+        fetch_k=int(os.getenv("HYBRID_FETCH_K", "20")),
+        lexical_weight=float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.4")),
+        fast_path=os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+    )
+
+
+# Opened stores are shared by every request instead of being reopened per turn.
+vectorstore_registry = VectorStoreRegistry(load_vectorstore, version_fn=get_index_version,
+                                           retriever_factory=build_retriever)
+
+# Merge overlapping chunks and cap the retrieved context at this many (estimated) tokens per answer.
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# "All Policies" questions search every category's store on these threads, so they take as long as the slowest store.
+multi_category_retriever = MultiCategoryRetriever(
+    categories=get_document_categories(),
+    get_retriever=vectorstore_registry.get_retriever,
+    embedding=embedding,
+    executor=ThreadPoolExecutor(max_workers=int(os.getenv("MULTI_RETRIEVAL_WORKERS", str(len(get_document_categories())))),
+                                thread_name_prefix="multi-retrieval"),
+    k=int(os.getenv("MULTI_RETRIEVAL_K", "6")),
+    fetch_k=int(os.getenv("HYBRID_FETCH_K", "20")),
+    lexical_weight=float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.4"))
+)
+
+
+def get_policy_prompt(policy_type, POLICY_COUNT=None, POLICY_NAMES=None):
+    """Answer prompt for policy questions, with the category's policy info filled in."""
+    custom_prompt = PromptTemplate(
+        input_variables=["context", "question", "policy_type", "policy_count", "policy_names"],
+        template="""
+        You are a helpful assistant for answering {policy_type}-related questions.
+        The company has {policy_count} policies: {policy_names}
+        Use the following logic:
+        - If the user's question asks about how many policies exist or what their names are, use the above policy info directly.
+        - For any other detailed question about the policies, use only the information provided in the context below.
+        - If the answer is not present in either the policy info or the context, respond with: "I'm sorry, but I don't have an answer to that."
+        Context:
+        {context}
+        Question:
+        {question}
+        Answer:
+        """.strip()
+    )
+    return custom_prompt.partial(
+        policy_type=policy_type,
+        policy_count=POLICY_COUNT,
+        policy_names=POLICY_NAMES
+    )
+
+
+class CategoryContext:
+    """Per-category state shared by every request and worker thread.
+
+    Holds what used to be recomputed (or kept in module globals) on each
+    /set-category: the policy count and names and the answer prompt with
+    them filled in. The retriever comes from the shared vectorstore
+    registry, which reopens it when the category is re-indexed; "All
+    Policies" searches every category through the multi-category retriever.
+    Retrieved chunks are packed (merged, deduplicated, cut to
+    CONTEXT_TOKEN_BUDGET) before they reach the prompt.
+    """
+
+    def __init__(self, policy_type, catalog_version=None):
+        self.policy_type = policy_type
+        self.catalog_version = catalog_version
+        self.policy_count = get_policy_count(policy_type)
+        self.policy_names = get_policy_names(policy_type)
+        self.prompt = None if policy_type == "MIS" else get_policy_prompt(policy_type, self.policy_count, self.policy_names)
+        self._packed = None
+
+    @property
+    def retriever(self):
+        if self.policy_type == ALL_CATEGORIES:
+            retriever = multi_category_retriever
+        else:
+            retriever = vectorstore_registry.get_retriever(self.policy_type)
+        if not CONTEXT_PACKING:
+            return retriever
+        # The registry hands out a new retriever after a re-index; wrap each one once.
+        packed = self._packed
+        if packed is None or packed.retriever is not retriever:
+            packed = self._packed = PackedRetriever(retriever=retriever, token_budget=CONTEXT_TOKEN_BUDGET)
+        return packed
+
+    @property
+    def index_version(self):
+        if self.policy_type == ALL_CATEGORIES:
+            # Changes whenever any category is re-indexed.
+            return "/".join(str(vectorstore_registry.get_index_version(c)) for c in get_document_categories())
+        return vectorstore_registry.get_index_version(self.policy_type)
+
+
+_category_contexts = {}
+_category_contexts_lock = threading.Lock()
+
+
+def get_category_context(policy_type):
+    """Return the context for a category, rebuilding it after the policy catalog changed."""
+    catalog_version = get_policy_catalog().version
+    context = _category_contexts.get(policy_type)
+    if context is None or context.catalog_version != catalog_version:
+        with _category_contexts_lock:
+            context = _category_contexts.get(policy_type)
+            if context is None or context.catalog_version != catalog_version:
+                context = CategoryContext(policy_type, catalog_version)
+                _category_contexts[policy_type] = context
+    return context
+
+
+def answer_prompt(policy_type, POLICY_COUNT=None, POLICY_NAMES=None):
+    """The category's precomputed prompt, unless the caller passes its own policy info."""
+    if POLICY_COUNT is None and POLICY_NAMES is None:
+        return get_category_context(policy_type).prompt
+    return get_policy_prompt(policy_type, POLICY_COUNT, POLICY_NAMES)
+
+
+def preload_vectorstores():
+    """Open every category's vectorstore up front so the first request is warm."""
+    vectorstore_registry.preload(get_document_categories())
+    for policy_type in get_folder_structure():
+        get_category_context(policy_type)
+
+
+# =============================
+# MIS (SQL) Question Answering
+# =============================
+
+SQL_PROMPT_TEMPLATE = """
                 You are a helpful assistant that generates SQL queries based on user questions.
                 Use only this SQL view: [MIS].[PERIODIC_REPORT]
                 The view contains the following columns:
@@ -237,51 +296,129 @@ def build_qa_chain(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, cha
                 {user_input}
                 SQL Query:
                 """
-            prompt = PromptTemplate(input_variables=["user_input", "current_datetime", "chat_context"], template=prompt_template)
-            llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
-            chain = LLMChain(llm=llm, prompt=prompt)
-            result = chain.run(user_input=query, current_datetime=current_datetime, chat_context=chat_context)
-            clean_sql = result.strip("`").split("sql\n")[-1].rsplit("```", 1)[0].strip()
+
+
+def sql_chain_inputs(query, chat_history=None):
+    """Inputs for the SQL prompt, with the last 3 exchanges as context."""
+    # Build chat history context for MIS queries
+    chat_context = ""
+    if chat_history:
+        recent_history = chat_history[-3:]  # Last 3 exchanges for context
+        for exchange in recent_history:
+            if exchange.get("message") and exchange.get("response"):
+                chat_context += f"Previous Question: {exchange['message']}\n"
+                chat_context += f"Previous Response: {exchange['response']}\n\n"
+    return {
+        "user_input": query,
+        "current_datetime": datetime.datetime.now(),
+        "chat_context": chat_context
+    }
+
+
+# Generated SQL for repeated MIS questions (None when SQL_CACHE=false).
+sql_cache = get_sql_cache()
+
+
+def get_sql_chain():
+    prompt = PromptTemplate(input_variables=["user_input", "current_datetime", "chat_context"], template=SQL_PROMPT_TEMPLATE)
+    return LLMChain(llm=get_chat_model("sql"), prompt=prompt)
+
+
+def clean_sql_text(result):
+    """Strip markdown fences the model may wrap around the SQL."""
+    return result.strip("`").split("sql\n")[-1].rsplit("```", 1)[0].strip()
+
+
+def execute_mis_query(sql, args=None):
+    return Database().execute(sql, args)
+
+
+# Rows of repeated MIS queries (None when RESULT_CACHE=false).
+mis_result_cache = get_result_cache(execute_mis_query)
+
+
+def run_mis_query(sql, args=None):
+    """Run MIS SQL through the result cache."""
+    if mis_result_cache is None:
+        return execute_mis_query(sql, args)
+    return mis_result_cache.get_or_execute(sql, args)
+
+
+# Common KPI questions become SQL without an LLM call (None when MIS_FAST_PATH=false).
+mis_parser = get_mis_parser(lambda: execute_mis_query(ENTITY_SQL))
+
+
+def parse_mis_question(query, chat_history=None):
+    """Return (sql, params) for a standalone question the rule-based parser understands, else None."""
+    if mis_parser is None or chat_history:
+        return None
+    parsed = mis_parser.parse(query)
+    if parsed:
+        log(f"MIS question parsed without the LLM: {parsed[0]} {parsed[1]}")
+    return parsed
+
+
+def sql_cache_namespace(llm):
+    """Identifies the prompt and model, so changing either never replays stale SQL."""
+    model = getattr(llm, "model", None) or type(llm).__name__
+    return hashlib.sha256(f"{model}\0{SQL_PROMPT_TEMPLATE}".encode("utf-8")).hexdigest()[:16]
+
+
+def generate_sql(query, chat_history=None):
+    """Generate SQL for an MIS question, reusing cached SQL for repeated standalone questions."""
+    chain = get_sql_chain()
+    # Follow-ups depend on the chat context, so only standalone questions are cached.
+    cacheable = sql_cache is not None and not chat_history
+    if cacheable:
+        namespace = sql_cache_namespace(chain.llm)
+        cached = sql_cache.get(namespace, query)
+        if cached:
+            debug(f"SQL cache hit for: {query}")
+            return cached
+    clean_sql = clean_sql_text(chain.run(**sql_chain_inputs(query, chat_history)))
+    if cacheable:
+        sql_cache.put(namespace, query, clean_sql)
+    return clean_sql
+
+
+async def agenerate_sql(query, chat_history=None):
+    chain = get_sql_chain()
+    cacheable = sql_cache is not None and not chat_history
+    if cacheable:
+        namespace = sql_cache_namespace(chain.llm)
+        cached = await asyncio.to_thread(sql_cache.get, namespace, query)
+        if cached:
+            debug(f"SQL cache hit for: {query}")
+            return cached
+    clean_sql = clean_sql_text(await chain.arun(**sql_chain_inputs(query, chat_history)))
+    if cacheable:
+        await asyncio.to_thread(sql_cache.put, namespace, query, clean_sql)
+    return clean_sql
+
+
+def build_qa_chain(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, chat_history=None, memory=None):
+    """Build QA chain for the given policy type with enhanced policy query handling."""
+    try:
+        
+        if policy_type == "MIS":
+            debug(f"User selected data base for Q&A:{policy_type}")
+            parsed = parse_mis_question(query, chat_history)
+            if parsed:
+                return run_mis_query(*parsed)
+            clean_sql = generate_sql(query, chat_history)
             log(f"Sql query generated by Gemini:{clean_sql}")
-            db = Database()
-            data = db.execute(clean_sql)
+            data = run_mis_query(clean_sql)
             return data
         else:
             
-            log(f"User selected Policy:{policy_type}")
-            retriever = load_vectorstore(policy_type).as_retriever()
-
-            custom_prompt = PromptTemplate(
-                input_variables=["context", "question", "policy_type", "policy_count", "policy_names"],
-                template="""
-                You are a helpful assistant for answering {policy_type}-related questions.
-                The company has {policy_count} policies: {policy_names}
-                Use the following logic:
-                - If the user's question asks about how many policies exist or what their names are, use the above policy info directly.
-                - For any other detailed question about the policies, use only the information provided in the context below.
-                - If the answer is not present in either the policy info or the context, respond with: "I'm sorry, but I don't have an answer to that."
-                Context:
-                {context}
-                Question:
-                {question}
-                Answer:
-                """.strip()
-            )
-
-            llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1)
+            debug(f"User selected Policy:{policy_type}")
+            retriever = get_category_context(policy_type).retriever
 
-            memory = ConversationBufferMemory(
-                memory_key="chat_history", 
-                return_messages=True,
-                output_key="answer"  # This is the fix - specify which output key to store in memory
-            )
+            llm = get_chat_model("answer")
 
-            # Populate memory from previous chat history
-            if chat_history:
-                for exchange in chat_history:
-                    if exchange.get("message") and exchange.get("response"):
-                        memory.chat_memory.add_user_message(exchange["message"])
-                        memory.chat_memory.add_ai_message(exchange["response"])
+            # Callers pass a bounded memory; otherwise replay the raw chat history.
+            if memory is None:
+                memory = buffer_memory(chat_history)
 
             # Use proper method and inject the prompt via combine_docs_chain_kwargs
             return ConversationalRetrievalChain.from_llm(
@@ -290,12 +427,56 @@ def build_qa_chain(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, cha
                 memory=memory,
                 return_source_documents=True,
                 combine_docs_chain_kwargs={
-                    "prompt": custom_prompt.partial(
-                        policy_type=policy_type,
-                        policy_count=POLICY_COUNT,
-                        policy_names=POLICY_NAMES
-                    )
+                    "prompt": answer_prompt(policy_type, POLICY_COUNT, POLICY_NAMES)
                 }
             )
     except Exception as e:
-        log(f"Exception occurred in build qa chain:{e}")
\ No newline at end of file
+        log(f"Exception occurred in build qa chain:{e}")
+
+
+def stream_answer(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, memory=None):
+    """Answer a policy question step by step for streaming.
+
+    Yields ("sources", documents) as soon as retrieval is done, then
+    ("token", text) for each generated chunk. Mirrors build_qa_chain: the
+    question is condensed against the memory only when the memory has history.
+    """
+    llm = get_chat_model("answer")
+    question = query
+    if memory is not None and memory.chat_memory.messages:
+        chat_history = _get_chat_history(memory.chat_memory.messages)
+        condensed = llm.invoke(CONDENSE_QUESTION_PROMPT.format(chat_history=chat_history, question=query))
+        question = getattr(condensed, "content", condensed).strip() or query
+
+    retriever = get_category_context(policy_type).retriever
+    docs = retriever.invoke(question)
+    yield "sources", docs
+
+    context = "\n\n".join(doc.page_content for doc in docs)
+    prompt = answer_prompt(policy_type, POLICY_COUNT, POLICY_NAMES).format(context=context, question=question)
+    for chunk in llm.stream(prompt):
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield "token", text
+
+
+async def astream_answer(policy_type, query, POLICY_NAMES=None, POLICY_COUNT=None, memory=None):
+    """Async version of stream_answer for the ASGI app; the LLM calls never block the event loop."""
+    llm = get_chat_model("answer")
+    question = query
+    if memory is not None and memory.chat_memory.messages:
+        chat_history = _get_chat_history(memory.chat_memory.messages)
+        condensed = await llm.ainvoke(CONDENSE_QUESTION_PROMPT.format(chat_history=chat_history, question=query))
+        question = getattr(condensed, "content", condensed).strip() or query
+
+    # Resolving the retriever may open Chroma, load the BM25 index or even sync a cold category.
+    retriever = await asyncio.to_thread(lambda: get_category_context(policy_type).retriever)
+    docs = await retriever.ainvoke(question)
+    yield "sources", docs
+
+    context = "\n\n".join(doc.page_content for doc in docs)
+    prompt = answer_prompt(policy_type, POLICY_COUNT, POLICY_NAMES).format(context=context, question=question)
+    async for chunk in llm.astream(prompt):
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield "token", text
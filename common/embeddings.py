@@ -0,0 +1,206 @@
+import os
+import re
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain.embeddings.base import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic, offline embedding stand-in.
+
+    Tokens are hashed into a fixed number of signed buckets and the vector is
+    L2-normalised, so texts sharing words get similar vectors. Used to build
+    and query stores without network access (tests, benchmarks, dry runs).
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self.model = f"hash-{size}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+# =============================
+# On-disk embedding cache
+# =============================
+
+def normalize_text(text, lower=False):
+    """Collapse whitespace (and optionally case) so trivially different texts share a cache entry."""
+    text = " ".join(text.split())
+    return text.lower() if lower else text
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded embedding cache in SQLite.
+
+    Entries are keyed by (model, kind, normalized text), where kind is
+    "query" or "document" because providers embed the two differently.
+    When the cache grows past `max_entries` the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, kind, text):
+        # Questions are also case-folded; document chunks keep their case.
+        raw = f"{model}\0{kind}\0{normalize_text(text, lower=(kind == 'query'))}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+            self._stats["hits"] += sum(1 for key in keys if key in found)
+            self._stats["misses"] += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Store [(key, vector), ...] and evict old entries if over the size bound."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                # Evict down to 90% so we don't evict on every insert.
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._stats["evictions"] += excess
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return snapshot
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding provider with the on-disk EmbeddingCache."""
+
+    def __init__(self, base, cache):
+        self.base = base
+        self.cache = cache
+        self.model = get_model_name(base)
+
+    def _embed(self, texts, kind, embed_fn):
+        keys = [EmbeddingCache.make_key(self.model, kind, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "document", self.base.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda batch: [self.base.embed_query(batch[0])])[0]
+
+
+# =============================
+# Provider selection
+# =============================
+
+def get_model_name(embedding):
+    """Best-effort identifier of the model behind an embedding provider."""
+    return getattr(embedding, "model", None) or getattr(embedding, "model_name", None) or type(embedding).__name__
+
+
+def create_embedding_provider(provider=None, model=None):
+    """Create the configured embedding provider without caching.
+
+    `EMBEDDING_PROVIDER` selects "google" (default), "local"
+    (sentence-transformers, runs in-process) or "hash" (offline stand-in);
+    `EMBEDDING_MODEL` overrides the provider's default model.
+    """
+    provider = (provider or os.getenv("EMBEDDING_PROVIDER", "google")).lower()
+    model = model or os.getenv("EMBEDDING_MODEL")
+    if provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model or "models/embedding-001")
+    if provider == "local":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model or "sentence-transformers/all-MiniLM-L6-v2")
+    if provider == "hash":
+        return HashEmbeddings()
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+def get_embedding(provider=None, model=None):
+    """Return the configured embedding provider, wrapped with the on-disk cache.
+
+    Set `EMBEDDING_CACHE=false` to disable the cache; `EMBEDDING_CACHE_PATH`
+    and `EMBEDDING_CACHE_MAX_ENTRIES` configure it. A store indexed with
+    another model is re-embedded when it is next opened.
+    """
+    base = create_embedding_provider(provider, model)
+    if os.getenv("EMBEDDING_CACHE", "true").lower() != "true":
+        return base
+    cache = EmbeddingCache(
+        os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3"),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+    )
+    return CachedEmbeddings(base, cache)
@@ -0,0 +1,211 @@
+import time
+import threading
+from typing import Any, Callable, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from common.logs import log, debug
+
+# =============================
+# Hybrid lexical + vector retrieval
+# =============================
+# Chunks are ranked by a weighted sum of their BM25 score (common/lexical_index.py)
+# and their vector similarity, each min-max normalized over its own candidate
+# list. A question that names a document title or section heading ("Section 11
+# Gratuity", "POSH") takes the lexical fast path: the named chunks ranked by
+# BM25, with no embedding call and no Chroma query.
+#
+# MultiCategoryRetriever searches every category at once for questions that
+# don't fit one: the question is embedded once, each category's store and
+# BM25 index are searched concurrently, and the candidates of all categories
+# are fused together into a global top-k, each chunk tagged with its category.
+
+_stats = {"fast_path": 0, "hybrid": 0, "vector_only": 0, "multi_category": 0, "multi_category_fast_path": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(kind):
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def retrieval_stats():
+    """How many retrievals took each path (lexical fast path, hybrid, vector only, multi-category)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _doc_key(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content
+
+
+def _normalize(scores):
+    """Min-max scale {key: score} to 0..1 (all 1.0 when the scores are equal)."""
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (score - low) / (high - low) for key, score in scores.items()}
+
+
+def lexical_document(index, i):
+    """The i-th chunk of a lexical index as a Document."""
+    doc = index.docs[i]
+    return Document(page_content=doc["text"], metadata=dict(doc["metadata"]))
+
+
+def collect_candidates(vectorstore, index, query, fetch_k=20, query_vector=None):
+    """Vector and BM25 candidates for a query from one category.
+
+    Returns ({key: Document}, {key: vector score}, {key: BM25 score}) with
+    raw scores (higher is better). Pass `query_vector` to search with an
+    embedding computed once for several stores.
+    """
+    if query_vector is not None:
+        vector_hits = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=fetch_k)
+    else:
+        vector_hits = vectorstore.similarity_search_with_score(query, k=fetch_k)
+    documents, vector_scores, lexical_scores = {}, {}, {}
+    for doc, distance in vector_hits:
+        key = _doc_key(doc)
+        documents[key] = doc
+        vector_scores[key] = -distance  # Chroma returns distances; closer is better
+    if index is not None:
+        for i, score in index.search(query, k=fetch_k):
+            doc = lexical_document(index, i)
+            key = _doc_key(doc)
+            documents.setdefault(key, doc)
+            lexical_scores[key] = score
+    return documents, vector_scores, lexical_scores
+
+
+def fuse(documents, vector_scores, lexical_scores, lexical_weight=0.4, k=4):
+    """The k best documents by weighted, min-max normalized vector and BM25 scores."""
+    if not lexical_scores:
+        ranked = sorted(vector_scores, key=vector_scores.get, reverse=True)[:k]
+        return [documents[key] for key in ranked]
+    vector_scores = _normalize(vector_scores)
+    lexical_scores = _normalize(lexical_scores)
+    combined = {
+        key: (1 - lexical_weight) * vector_scores.get(key, 0.0) + lexical_weight * lexical_scores.get(key, 0.0)
+        for key in documents
+    }
+    ranked = sorted(combined, key=combined.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever fusing a category's BM25 index with its Chroma store."""
+
+    vectorstore: Any
+    index: Any
+    k: int = 4
+    fetch_k: int = 20
+    lexical_weight: float = 0.4
+    fast_path: bool = True
+    fast_path_coverage: float = 1.0
+
+    def fast_path_documents(self, query):
+        """Chunks of the titles/headings the query names, best BM25 match first, or None.
+
+        A named document shorter than k chunks is topped up with the best
+        BM25 matches elsewhere.
+        """
+        if not self.fast_path or self.index is None:
+            return None
+        named = self.index.match_phrases(query, coverage=self.fast_path_coverage)
+        if not named:
+            return None
+        scores = self.index.scores(query)
+        ranked = sorted(named, key=lambda i: (-scores.get(i, 0.0), i))[:self.k]
+        for i, _ in self.index.search(query, k=self.k + len(ranked)):
+            if len(ranked) >= self.k:
+                break
+            if i not in ranked:
+                ranked.append(i)
+        return [lexical_document(self.index, i) for i in ranked]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        docs = self.fast_path_documents(query)
+        if docs:
+            _count("fast_path")
+            return docs
+        index = self.index if self.index is not None and len(self.index) else None
+        _count("hybrid" if index is not None else "vector_only")
+        candidates = collect_candidates(self.vectorstore, index, query, self.fetch_k)
+        return fuse(*candidates, lexical_weight=self.lexical_weight, k=self.k)
+
+
+class MultiCategoryRetriever(BaseRetriever):
+    """Retriever searching several categories concurrently and merging them into one ranking.
+
+    `get_retriever(category)` returns the category's shared retriever: a
+    HybridRetriever, or in vector mode a plain store retriever. Latency is
+    that of the slowest category, not the sum. A category that fails is
+    logged and left out rather than failing the whole question.
+    """
+
+    categories: List[str]
+    get_retriever: Callable
+    embedding: Any
+    executor: Any
+    k: int = 6
+    fetch_k: int = 20
+    lexical_weight: float = 0.4
+
+    def _retrievers(self):
+        retrievers = {}
+        for category, future in [(c, self.executor.submit(self.get_retriever, c)) for c in self.categories]:
+            try:
+                retrievers[category] = future.result()
+            except Exception as e:
+                log(f"Error opening {category} for multi-category retrieval: {e}")
+        return retrievers
+
+    def _fast_path(self, retrievers, query):
+        """Chunks of the titles/headings the query names in any category, or None."""
+        docs = []
+        for category, retriever in retrievers.items():
+            named = getattr(retriever, "fast_path_documents", None)
+            for doc in (named(query) if named else None) or []:
+                doc.metadata["category"] = category
+                docs.append(doc)
+        return docs[:self.k] or None
+
+    def _search(self, category, retriever, query, query_vector):
+        start = time.perf_counter()
+        index = getattr(retriever, "index", None)
+        candidates = collect_candidates(retriever.vectorstore, index if index is not None and len(index) else None,
+                                        query, self.fetch_k, query_vector)
+        return candidates, time.perf_counter() - start
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        retrievers = self._retrievers()
+        docs = self._fast_path(retrievers, query)
+        if docs:
+            _count("multi_category_fast_path")
+            return docs
+        _count("multi_category")
+
+        # One embedding for every store instead of one per category.
+        query_vector = self.embedding.embed_query(query)
+        futures = {category: self.executor.submit(self._search, category, retriever, query, query_vector)
+                   for category, retriever in retrievers.items()}
+        documents, vector_scores, lexical_scores = {}, {}, {}
+        timings = {}
+        for category, future in futures.items():
+            try:
+                (category_documents, category_vector, category_lexical), timings[category] = future.result()
+            except Exception as e:
+                log(f"Error searching {category} for multi-category retrieval: {e}")
+                continue
+            for key, doc in category_documents.items():
+                doc.metadata["category"] = category
+                documents.setdefault(key, doc)
+            vector_scores.update(category_vector)
+            lexical_scores.update(category_lexical)
+        if timings:
+            slowest = max(timings, key=timings.get)
+            debug(f"Multi-category retrieval over {len(timings)} categories, slowest {slowest} "
+                  f"{timings[slowest] * 1000:.1f} ms")
+        return fuse(documents, vector_scores, lexical_scores, lexical_weight=self.lexical_weight, k=self.k)
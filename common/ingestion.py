@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import shutil
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.vectorstores import Chroma
+from common.categories import get_document_categories, get_source_folder, get_vectordb_path
+from common.embeddings import get_model_name
+from common.ingestion_pipeline import IngestionPipeline, IngestionStats
+from common.lexical_index import build_lexical_index, load_lexical_index
+from common.logs import log
+
+# =============================
+# Ingestion manifest
+# =============================
+# Each store keeps a manifest next to its Chroma files recording, per PDF,
+# the content hash, mtime/size and the IDs of the chunks it produced. A sync
+# only parses and embeds new or changed PDFs and deletes chunks of removed ones.
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+# Stores built before manifests existed were all embedded with the original
+# Google model; their manifest records the model as unknown (None).
+LEGACY_EMBEDDING_MODEL = "models/embedding-001"
+
+
+def get_manifest_path(policy_type):
+    """Return the manifest file for a category's store."""
+    return os.path.join(get_vectordb_path(policy_type), MANIFEST_FILENAME)
+
+
+def load_manifest(policy_type):
+    """Load the ingestion manifest for a category, or None if there is none."""
+    manifest_path = get_manifest_path(policy_type)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(policy_type, manifest):
+    """Write the manifest atomically so readers never see a partial file."""
+    manifest_path = get_manifest_path(policy_type)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def get_index_version(policy_type):
+    """Return the index version of a category; it changes whenever a sync changes the store."""
+    try:
+        manifest = load_manifest(policy_type)
+    except Exception as e:
+        log(f"Error reading manifest for {policy_type}: {e}")
+        return None
+    if manifest is None:
+        return 0
+    return manifest.get("version", 0)
+
+
+def embedding_model_matches(policy_type, embedding):
+    """Whether a category's stored vectors came from `embedding`'s model.
+
+    A store without a manifest, or whose manifest records the model as
+    unknown, predates manifests and counts as LEGACY_EMBEDDING_MODEL.
+    """
+    manifest = load_manifest(policy_type)
+    stored = (manifest or {}).get("embedding_model") or LEGACY_EMBEDDING_MODEL
+    return stored == get_model_name(embedding)
+
+
+def hash_file(file_path):
+    """Return the SHA-256 of a file's contents."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _bootstrap_manifest(vectorstore, pdf_files):
+    """Build a manifest for a store that was created before manifests existed.
+
+    Existing chunks are grouped by their `source` metadata and assumed to
+    match the PDF currently on disk; sources without a file are left for the
+    sync to remove.
+    """
+    existing = vectorstore.get(include=["metadatas"])
+    ids_by_source = {}
+    for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        source = os.path.normpath((metadata or {}).get("source", ""))
+        ids_by_source.setdefault(source, []).append(chunk_id)
+
+    files = {}
+    on_disk = {os.path.normpath(p) for p in pdf_files}
+    for source, chunk_ids in ids_by_source.items():
+        entry = {"chunk_ids": chunk_ids}
+        if source in on_disk:
+            stat = os.stat(source)
+            entry.update({"sha256": hash_file(source), "mtime": stat.st_mtime, "size": stat.st_size})
+        files[source] = entry
+    return files
+
+
+def sync_category(policy_type, embedding, pipeline=None, rebuild=False, stats=None):
+    """Bring a category's store in line with its PDF folder.
+
+    With `rebuild` the store is dropped and every PDF is re-embedded. Returns a
+    summary dict with the added, updated, removed and unchanged files.
+    """
+    base_folder = get_source_folder(policy_type)
+    if not base_folder:
+        raise ValueError(f"Invalid policy type: {policy_type}")
+
+    vectordb_path = get_vectordb_path(policy_type)
+    if rebuild and os.path.exists(vectordb_path):
+        log(f"Rebuilding vectorstore for {policy_type} from scratch")
+        shutil.rmtree(vectordb_path)
+    store_exists = os.path.exists(vectordb_path)
+    vectorstore = Chroma(persist_directory=vectordb_path, embedding_function=embedding)
+    pdf_files = sorted(os.path.normpath(p) for p in glob.glob(os.path.join(base_folder, "*.pdf")))
+    model_name = get_model_name(embedding)
+
+    manifest = load_manifest(policy_type)
+    if manifest is None:
+        files = _bootstrap_manifest(vectorstore, pdf_files) if store_exists else {}
+        manifest = {"version": 0, "embedding_model": None if store_exists else model_name, "files": files}
+    if manifest.get("embedding_model") is None and model_name == LEGACY_EMBEDDING_MODEL:
+        manifest["embedding_model"] = model_name
+    elif manifest.get("embedding_model") != model_name:
+        # Vectors from another model are not comparable; re-embed everything.
+        log(f"Embedding model changed for {policy_type}, re-indexing all files")
+        stale_ids = [cid for entry in manifest["files"].values() for cid in entry.get("chunk_ids", [])]
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        manifest = {"version": manifest.get("version", 0), "embedding_model": model_name, "files": {}}
+
+    files = manifest["files"]
+    summary = {"added": [], "updated": [], "removed": [], "unchanged": []}
+    to_ingest = []
+
+    for file_path in pdf_files:
+        stat = os.stat(file_path)
+        entry = files.get(file_path)
+        if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            summary["unchanged"].append(file_path)
+            continue
+
+        file_hash = hash_file(file_path)
+        if entry and entry.get("sha256") == file_hash:
+            # Touched but not modified: just refresh the stat fields.
+            entry.update({"mtime": stat.st_mtime, "size": stat.st_size})
+            summary["unchanged"].append(file_path)
+            continue
+
+        if entry and entry.get("chunk_ids"):
+            vectorstore.delete(ids=entry["chunk_ids"])
+        summary["updated" if entry else "added"].append(file_path)
+        to_ingest.append((file_path, file_hash, stat))
+
+    if to_ingest:
+        own_pipeline = pipeline is None
+        pipeline = pipeline or IngestionPipeline(embedding)
+        try:
+            chunk_ids_by_file = pipeline.ingest(
+                vectorstore, [(path, file_hash) for path, file_hash, _ in to_ingest], stats=stats)
+        finally:
+            if own_pipeline:
+                pipeline.close()
+        for file_path, file_hash, stat in to_ingest:
+            files[file_path] = {
+                "sha256": file_hash,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "chunk_ids": chunk_ids_by_file.get(file_path, [])
+            }
+            log(f"Indexed {file_path}: {len(files[file_path]['chunk_ids'])} chunks")
+
+    for file_path in [p for p in files if p not in pdf_files]:
+        chunk_ids = files.pop(file_path).get("chunk_ids", [])
+        if chunk_ids:
+            vectorstore.delete(ids=chunk_ids)
+        summary["removed"].append(file_path)
+        log(f"Removed {file_path}: {len(chunk_ids)} chunks")
+
+    changed = summary["added"] or summary["updated"] or summary["removed"]
+    if changed:
+        manifest["version"] = manifest.get("version", 0) + 1
+        manifest["updated_at"] = datetime.now().isoformat()
+    save_manifest(policy_type, manifest)
+    # The keyword index covers the same chunks; rebuilding it from the store is cheap next to embedding.
+    if changed or load_lexical_index(policy_type, manifest["version"]) is None:
+        build_lexical_index(policy_type, vectorstore, manifest["version"])
+
+    log(f"Sync for {policy_type}: {len(summary['added'])} added, {len(summary['updated'])} updated, "
+        f"{len(summary['removed'])} removed, {len(summary['unchanged'])} unchanged")
+    return summary
+
+
+def sync_all(categories, embedding, rebuild=False, parse_workers=None, embed_workers=4,
+             batch_size=64, max_workers=None):
+    """Sync several categories in parallel, sharing one ingestion pipeline.
+
+    Returns ({category: summary or exception}, per-stage stats report).
+    """
+    stats = IngestionStats()
+    results = {}
+    with IngestionPipeline(embedding, parse_workers=parse_workers, embed_workers=embed_workers,
+                           batch_size=batch_size) as pipeline:
+        with ThreadPoolExecutor(max_workers=max_workers or len(categories) or 1) as executor:
+            futures = {
+                executor.submit(sync_category, policy_type, embedding, pipeline, rebuild, stats): policy_type
+                for policy_type in categories
+            }
+            for future, policy_type in futures.items():
+                try:
+                    results[policy_type] = future.result()
+                except Exception as e:
+                    log(f"Error syncing {policy_type}: {e}")
+                    results[policy_type] = e
+    return results, stats.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally sync the files/ tree into the Chroma stores.")
+    parser.add_argument("categories", nargs="*", help="Categories to sync (default: all)")
+    parser.add_argument("--rebuild", action="store_true", help="Drop the stores and re-embed every PDF")
+    parser.add_argument("--parse-workers", type=int, default=None, help="PDF parsing processes")
+    parser.add_argument("--embed-workers", type=int, default=4, help="Concurrent embedding batches")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding call")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the deterministic local HashEmbeddings instead of the configured model")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        from common.embeddings import HashEmbeddings
+        embedding = HashEmbeddings()
+    else:
+        from common.document1 import embedding
+
+    categories = args.categories or get_document_categories()
+    results, report = sync_all(categories, embedding, rebuild=args.rebuild, parse_workers=args.parse_workers,
+                               embed_workers=args.embed_workers, batch_size=args.batch_size)
+    failed = False
+    for policy_type, summary in results.items():
+        if isinstance(summary, Exception):
+            failed = True
+            print(f"{policy_type}: FAILED ({summary})")
+        else:
+            print(f"{policy_type}: " + ", ".join(f"{len(v)} {k}" for k, v in summary.items()))
+    print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
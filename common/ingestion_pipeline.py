@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from common.logs import log
+
+# =============================
+# Staged ingestion pipeline
+# =============================
+# parse (process pool) -> split (streaming, as each PDF finishes)
+# -> embed (bounded number of concurrent batches, with retry) -> upsert
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def extract_pdf_pages(file_path):
+    """Parse one PDF into page Documents; runs in a worker process.
+
+    Returns (pages, seconds spent parsing).
+    """
+    start = time.perf_counter()
+    pages = PyPDFLoader(file_path).load()
+    return pages, time.perf_counter() - start
+
+
+def make_chunk_ids(file_path, file_hash, count):
+    """Chunk IDs derived from path and content hash, so re-ingesting a file is idempotent."""
+    path_key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:8]
+    return [f"{file_hash[:16]}-{path_key}-{i}" for i in range(count)]
+
+
+class IngestionStats:
+    """Thread-safe per-stage counters and timings for one or more ingestion runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.counts = {"files": 0, "pages": 0, "chunks": 0, "embeddings": 0, "retries": 0}
+        self.seconds = {"parse": 0.0, "split": 0.0, "embed": 0.0}
+
+    def add(self, stage_seconds=None, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self.counts[key] += value
+            for stage, value in (stage_seconds or {}).items():
+                self.seconds[stage] += value
+
+    def report(self):
+        """Return counts plus pages/s, chunks/s and embeddings/s over wall-clock time."""
+        with self._lock:
+            wall = max(time.perf_counter() - self.started, 1e-9)
+            report = dict(self.counts)
+            report["wall_seconds"] = round(wall, 3)
+            report["stage_seconds"] = {k: round(v, 3) for k, v in self.seconds.items()}
+            report["pages_per_second"] = round(self.counts["pages"] / wall, 2)
+            report["chunks_per_second"] = round(self.counts["chunks"] / wall, 2)
+            report["embeddings_per_second"] = round(self.counts["embeddings"] / wall, 2)
+        return report
+
+
+class IngestionPipeline:
+    """Parses PDFs in a process pool and embeds chunks in bounded concurrent batches.
+
+    One pipeline can be shared by several categories syncing in parallel; the
+    embedding concurrency bound then applies across all of them, which keeps
+    us within the embedding API's rate limits.
+    """
+
+    def __init__(self, embedding, parse_workers=None, embed_workers=4, batch_size=64,
+                 max_retries=3, retry_backoff=1.0):
+        self.embedding = embedding
+        self.parse_workers = parse_workers or int(os.getenv("INGEST_PARSE_WORKERS", os.cpu_count() or 1))
+        self.embed_workers = embed_workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._parse_pool = None
+        self._embed_pool = None
+        self._in_flight = threading.BoundedSemaphore(embed_workers * 2)
+        self._lock = threading.Lock()
+
+    def _pools(self):
+        with self._lock:
+            if self._parse_pool is None:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+                self._embed_pool = ThreadPoolExecutor(max_workers=self.embed_workers)
+            return self._parse_pool, self._embed_pool
+
+    def close(self):
+        with self._lock:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._embed_pool.shutdown()
+                self._parse_pool = self._embed_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _embed_with_retry(self, texts, stats):
+        attempt = 0
+        while True:
+            try:
+                return self.embedding.embed_documents(texts)
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                stats.add(retries=1)
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                log(f"Embedding batch failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _embed_and_upsert(self, vectorstore, batch, stats):
+        try:
+            ids = [chunk_id for chunk_id, _ in batch]
+            texts = [doc.page_content for _, doc in batch]
+            # Chroma only accepts scalar metadata values.
+            metadatas = [{k: v for k, v in doc.metadata.items() if isinstance(v, (str, int, float, bool))}
+                         for _, doc in batch]
+            start = time.perf_counter()
+            vectors = self._embed_with_retry(texts, stats)
+            stats.add({"embed": time.perf_counter() - start}, embeddings=len(vectors))
+            vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        finally:
+            self._in_flight.release()
+
+    def ingest(self, vectorstore, files, stats=None):
+        """Ingest `files` ([(file_path, file_hash), ...]) into `vectorstore`.
+
+        Returns {file_path: [chunk_id, ...]}. Raises if any file or batch fails.
+        """
+        stats = stats or IngestionStats()
+        if not files:
+            return {}
+
+        parse_pool, embed_pool = self._pools()
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        parse_futures = {parse_pool.submit(extract_pdf_pages, path): (path, file_hash) for path, file_hash in files}
+
+        chunk_ids_by_file = {}
+        embed_futures = []
+        batch = []
+
+        def flush():
+            # Blocks while too many batches are in flight, which also bounds memory.
+            self._in_flight.acquire()
+            embed_futures.append(embed_pool.submit(self._embed_and_upsert, vectorstore, list(batch), stats))
+            batch.clear()
+
+        try:
+            for future in as_completed(parse_futures):
+                file_path, file_hash = parse_futures[future]
+                pages, parse_seconds = future.result()
+                stats.add({"parse": parse_seconds}, files=1, pages=len(pages))
+
+                start = time.perf_counter()
+                chunks = splitter.split_documents(pages)
+                chunk_ids = make_chunk_ids(file_path, file_hash, len(chunks))
+                stats.add({"split": time.perf_counter() - start}, chunks=len(chunks))
+                chunk_ids_by_file[file_path] = chunk_ids
+
+                for chunk_id, chunk in zip(chunk_ids, chunks):
+                    batch.append((chunk_id, chunk))
+                    if len(batch) >= self.batch_size:
+                        flush()
+            if batch:
+                flush()
+        finally:
+            for future in embed_futures:
+                future.result()
+
+        return chunk_ids_by_file
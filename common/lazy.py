@@ -0,0 +1,41 @@
+import sys
+import importlib
+
+# =============================
+# Deferred imports
+# =============================
+# common.document1 pulls in LangChain, Chroma and the model SDKs and creates
+# the embedding and LLM clients when it is imported. The apps reach it
+# through these proxies, so a worker starts serving (and answers routes such
+# as /get-categories) without paying for any of that until a request needs it.
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    importlib.import_module holds the module's import lock, so concurrent
+    first uses from several threads import it exactly once.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    @property
+    def loaded(self):
+        return self._name in sys.modules
+
+    def load(self):
+        return importlib.import_module(self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+class LazyObject:
+    """Stands in for an object created by `factory` on first attribute access."""
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, attr):
+        return getattr(self._factory(), attr)
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from common.categories import get_vectordb_path
+from common.logs import log
+
+# =============================
+# Lexical (BM25) index
+# =============================
+# A keyword index over the same chunks as a category's Chroma store, kept in
+# lexical_index.json next to the Chroma files. It is rebuilt by every sync
+# that changes the store and carries the manifest version it was built from,
+# so a stale index is never served. Besides BM25 scores it knows each
+# document's title (the PDF name, e.g. "Section 11 - Gratuity") and the
+# numbered section headings found in its chunks, which lets questions such
+# as "Section 11 Gratuity" or "POSH" be answered without an embedding call.
+
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its me my of on or our please
+should tell that the their there this to us was we what when where which who why will with you your
+about any give show explain
+""".split())
+
+# Section words every document has; they never name a particular one.
+GENERIC_HEADING_TERMS = frozenset("""
+summary introduction purpose scope overview general definitions definition objective objectives
+responsibilities responsibility references annexure appendix applicability contents
+""".split())
+
+# "5.3.2 Conditions for the purpose of Section 10(5):", "Section 4 - LTA", "GENERAL GUIDELINES"
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:(?i:section|clause|chapter)\s+\d+[\w.()]*|\d+(?:\.\d+)*\.?)\s*[-:\u2013]?\s+[A-Z][^\n]{2,80}$"
+    r"|^\s*[A-Z][A-Z &/\-]{4,60}$"
+)
+
+
+def tokenize(text):
+    """Lower-case word and number tokens without stopwords."""
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def document_title(source):
+    """Title of a source PDF: its file name without folder and extension."""
+    return os.path.splitext(os.path.basename(source or ""))[0]
+
+
+def find_headings(text):
+    """Return the section headings in a chunk's text; numbered sentences are not headings."""
+    headings = []
+    for line in text.splitlines():
+        line = line.strip().rstrip(":").strip()
+        if len(line.split()) <= 8 and not line.endswith(".") and HEADING_PATTERN.match(line):
+            headings.append(line)
+    return headings
+
+
+def get_lexical_index_path(policy_type):
+    """Return the lexical index file for a category's store."""
+    return os.path.join(get_vectordb_path(policy_type), LEXICAL_INDEX_FILENAME)
+
+
+class LexicalIndex:
+    """BM25 over a category's chunks, plus title and section-heading lookup."""
+
+    def __init__(self, docs, version=None, k1=1.5, b=0.75):
+        """`docs` is a list of {"id", "text", "metadata"} dicts."""
+        self.docs = docs
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(doc["text"])) for doc in docs]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(docs)) if docs else 0.0
+        self._postings = {}
+        for i, tf in enumerate(self._term_freqs):
+            for term, count in tf.items():
+                self._postings.setdefault(term, []).append((i, count))
+        n = len(docs)
+        self._idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self._postings.items()}
+
+        # Phrases a question can name directly: document titles and section headings.
+        phrases = {}
+        for i, doc in enumerate(docs):
+            source = doc["metadata"].get("source", "")
+            named = [("title", document_title(source))] + [("heading", heading) for heading in find_headings(doc["text"])]
+            for kind, text in named:
+                phrase = phrases.setdefault((kind, source, text), {"source": source, "tokens": set(tokenize(text)), "docs": []})
+                phrase["docs"].append(i)
+        self._phrases = [phrase for phrase in phrases.values() if phrase["tokens"]]
+        # For each term, the documents whose title or headings contain it.
+        self._term_sources = {}
+        for phrase in self._phrases:
+            for term in phrase["tokens"]:
+                self._term_sources.setdefault(term, set()).add(phrase["source"])
+
+    def __len__(self):
+        return len(self.docs)
+
+    def scores(self, query):
+        """Return {doc_index: BM25 score} for the chunks sharing a term with the query."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, count in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_length or 1.0))
+                scores[i] = scores.get(i, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return scores
+
+    def search(self, query, k=4):
+        """Return [(doc_index, score)] of the k best BM25 matches."""
+        return sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def match_phrases(self, query, coverage=1.0, max_sources=3):
+        """Return the chunk indices of titles/headings the query names, or [] if it names none clearly.
+
+        Section words ("summary", "scope") and terms found in the
+        titles/headings of more than `max_sources` documents ("section",
+        "policy") are too generic to name anything and are ignored. A title or heading matches when it contains at least
+        `coverage` of the remaining terms, and the query only counts as
+        naming something when the matches come from at most `max_sources`
+        documents.
+        """
+        terms = {term for term in tokenize(query)
+                 if term not in GENERIC_HEADING_TERMS and len(self._term_sources.get(term, ())) <= max_sources}
+        if not terms:
+            return []
+        matched = [phrase for phrase in self._phrases if len(terms & phrase["tokens"]) / len(terms) >= coverage]
+        if not matched or len({phrase["source"] for phrase in matched}) > max_sources:
+            return []
+        return sorted({i for phrase in matched for i in phrase["docs"]})
+
+    def to_dict(self):
+        return {"version": self.version, "docs": self.docs}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, version=None):
+        """Build the index from every chunk currently in a Chroma store."""
+        stored = vectorstore.get(include=["documents", "metadatas"])
+        docs = []
+        for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            docs.append({"id": chunk_id, "text": text or "", "metadata": metadata or {}})
+        # Store order is arbitrary; keep chunks in document and page order so ties read naturally.
+        docs.sort(key=lambda d: (d["metadata"].get("source", ""), d["metadata"].get("page", 0), d["id"]))
+        return cls(docs, version=version)
+
+
+def save_lexical_index(policy_type, index):
+    """Write the index atomically so readers never see a partial file."""
+    path = get_lexical_index_path(policy_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        json.dump(index.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def load_lexical_index(policy_type, version=None):
+    """Load a category's index, or None if it is missing or was built from another index version."""
+    path = get_lexical_index_path(policy_type)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        log(f"Error reading lexical index for {policy_type}: {e}")
+        return None
+    if version is not None and data.get("version") != version:
+        return None
+    return LexicalIndex(data.get("docs", []), version=data.get("version"))
+
+
+def build_lexical_index(policy_type, vectorstore, version=None):
+    """(Re)build and persist a category's index from its Chroma store."""
+    index = LexicalIndex.from_vectorstore(vectorstore, version=version)
+    save_lexical_index(policy_type, index)
+    log(f"Lexical index for {policy_type}: {len(index)} chunks")
+    return index
+
+
+def get_lexical_index(policy_type, vectorstore, version=None):
+    """Load a category's index, building it first for stores indexed before it existed."""
+    index = load_lexical_index(policy_type, version)
+    if index is None:
+        index = build_lexical_index(policy_type, vectorstore, version)
+    return index
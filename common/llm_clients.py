@@ -0,0 +1,132 @@
+import os
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+# =============================
+# Shared LLM clients
+# =============================
+# Building a ChatGoogleGenerativeAI opens a new connection to the Gemini API,
+# and genai.configure() drops the clients google.generativeai has already
+# connected. Each model configuration is therefore created once per process
+# and shared by every request and thread, so a chat turn reuses an open
+# (TLS) connection instead of setting one up.
+#
+#   LLM_PROVIDER      google (default) | fake (offline canned answers)
+#   LLM_MODEL         Gemini model name (default gemini-2.0-flash)
+#   LLM_TRANSPORT     grpc | rest (default: the library's choice)
+#   LLM_API_ENDPOINT  override the API host, e.g. for a proxy or a local stub
+
+# Temperature per use; None keeps the model default.
+PURPOSES = {
+    "sql": None,
+    "answer": 0.1,
+}
+PHRASING_CONFIG = {
+    "temperature": 0,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+
+_clients = {}
+_lock = threading.Lock()
+_genai_configured = False
+_stats = {"created": 0, "reused": 0}
+
+
+def _model_name():
+    return os.getenv("LLM_MODEL", "gemini-2.0-flash")
+
+
+def _api_key():
+    return os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEY")
+
+
+def _client_options():
+    endpoint = os.getenv("LLM_API_ENDPOINT")
+    return {"api_endpoint": endpoint} if endpoint else None
+
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+    if client is not None:
+        with _lock:
+            _stats["reused"] += 1
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory()
+            _stats["created"] += 1
+        else:
+            _stats["reused"] += 1
+        return client
+
+
+def _create_chat_model(model, temperature):
+    if os.getenv("LLM_PROVIDER", "google").lower() == "fake":
+        from common.fake_llm import FakeChatModel
+        return FakeChatModel(
+            responses=[os.getenv("FAKE_LLM_RESPONSE", "This is a canned answer from the offline test model.")],
+            sleep=float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.01")),
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0"))
+        )
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    kwargs = {"model": model, "google_api_key": _api_key()}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if os.getenv("LLM_TRANSPORT"):
+        kwargs["transport"] = os.getenv("LLM_TRANSPORT")
+    if _client_options():
+        kwargs["client_options"] = _client_options()
+    return ChatGoogleGenerativeAI(**kwargs)
+
+
+def get_chat_model(purpose="answer", temperature=None):
+    """Return the process-wide LangChain chat model for a purpose ("sql", "answer") or an explicit temperature.
+
+    LangChain chat models keep no per-call state, so one instance serves all threads.
+    """
+    if temperature is None:
+        temperature = PURPOSES.get(purpose)
+    model = _model_name()
+    return _get_or_create(("chat", os.getenv("LLM_PROVIDER", "google").lower(), model, temperature),
+                          lambda: _create_chat_model(model, temperature))
+
+
+def configure_genai():
+    """Configure google.generativeai once; configuring again would discard its connected clients."""
+    global _genai_configured
+    if _genai_configured:
+        return
+    with _lock:
+        if not _genai_configured:
+            import google.generativeai as genai
+            kwargs = {"api_key": _api_key()}
+            if os.getenv("LLM_TRANSPORT"):
+                kwargs["transport"] = os.getenv("LLM_TRANSPORT")
+            if _client_options():
+                kwargs["client_options"] = _client_options()
+            genai.configure(**kwargs)
+            _genai_configured = True
+
+
+def get_phrasing_model():
+    """Return the shared google.generativeai model that phrases MIS results as sentences."""
+    configure_genai()
+    model = _model_name()
+
+    def create():
+        import google.generativeai as genai
+        return genai.GenerativeModel(model_name=model, generation_config=PHRASING_CONFIG)
+
+    return _get_or_create(("phrasing", model), create)
+
+
+def client_stats():
+    with _lock:
+        snapshot = dict(_stats)
+    snapshot["clients"] = len(_clients)
+    return snapshot
@@ -1,21 +1,168 @@
 import os
+import sys
+import json
+import queue
+import atexit
 import datetime
+import threading
 
-def log(message):
-    # Create "logs" directory if it does not exist
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
+# =============================
+# Buffered logging
+# =============================
+# log() only formats the record and puts it on a queue; a background thread
+# writes queued records in batches to logs/logs_<date>.log, keeping the file
+# open until the date changes. Records below LOG_LEVEL are dropped before
+# anything is formatted.
+#
+#   LOG_LEVEL    DEBUG | INFO (default) | WARNING | ERROR
+#   LOG_FORMAT   text (default, "[timestamp] message key=value") | json
+#   LOG_CONSOLE  also print records to stdout (default true)
+#   LOG_ASYNC    write from the background thread (default true); false
+#                writes synchronously, e.g. for short scripts
+#   LOG_DIR      directory of the daily files (default "logs")
 
-    # Generate log filename based on the current date
-    log_filename = f"logs_{datetime.date.today()}.log"
-    log_path = os.path.join(log_dir, log_filename)
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
 
-    # Prepare log entry with timestamp
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {message}\n"
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = LEVELS.get(os.getenv("LOG_LEVEL", "INFO").upper(), 20)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
 
-    # ✅ Ensure log file uses UTF-8 encoding
-    with open(log_path, "a", encoding="utf-8") as log_file:
-        log_file.write(log_entry)
 
-    print(f"Log written: {log_entry.strip()}")  # Optional: Print log entry to console
+class LogWriter:
+    """Writes formatted records to the daily log file from a single background thread."""
+
+    def __init__(self, log_dir=LOG_DIR, console=LOG_CONSOLE, batch_size=LOG_BATCH_SIZE):
+        self.log_dir = log_dir
+        self.console = console
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._file = None
+        self._file_date = None
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked worker where the parent's thread doesn't exist.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._file = None
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, date, line):
+        self._ensure_thread()
+        self._queue.put((date, line))
+
+    def _open(self, date):
+        """Return the file for a date, rotating when the date changes."""
+        if self._file_date != date or self._file is None:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._file = open(os.path.join(self.log_dir, f"logs_{date}.log"), "a", encoding="utf-8")
+            self._file_date = date
+        return self._file
+
+    def _write(self, records):
+        try:
+            log_file = None
+            for date, line in records:
+                log_file = self._open(date)
+                log_file.write(line + "\n")
+                if self.console:
+                    print(line)
+            if log_file is not None:
+                log_file.flush()
+        except Exception as e:
+            self.dropped += len(records)
+            print(f"Error writing log records: {e}", file=sys.stderr)
+
+    def _drain(self, records):
+        while len(records) < self.batch_size:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            # Everything queued meanwhile goes out in the same batch, with one flush.
+            with self._write_lock:
+                records = self._drain([first])
+                self._write(records)
+            for _ in records:
+                self._queue.task_done()
+
+    def write(self, records):
+        """Write records synchronously."""
+        with self._write_lock:
+            self._write(records)
+
+    def flush(self):
+        """Return once everything queued so far is written, including a batch the thread is writing."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        if self._thread.is_alive():
+            self._queue.join()
+            return
+        with self._write_lock:
+            while True:
+                records = self._drain([])
+                if not records:
+                    break
+                self._write(records)
+
+
+_writer = LogWriter()
+atexit.register(_writer.flush)
+
+
+def _format(now, level, message, fields):
+    if LOG_FORMAT == "json":
+        record = {"timestamp": now.isoformat(timespec="milliseconds"), "level": level, "message": str(message)}
+        record.update(fields)
+        return json.dumps(record, default=str, ensure_ascii=False)
+    prefix = f"[{now.strftime('%Y-%m-%d %H:%M:%S')}]"
+    if level != "INFO":
+        prefix += f" {level}"
+    line = f"{prefix} {message}"
+    if fields:
+        line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+    return line
+
+
+def log(message, level="INFO", **fields):
+    """Log a message; extra keyword arguments become structured fields (conversation_id, latency_ms, ...)."""
+    level = level.upper()
+    if LEVELS.get(level, 20) < LOG_LEVEL:
+        return
+    try:
+        now = datetime.datetime.now()
+        line = _format(now, level, message, fields)
+        if LOG_ASYNC:
+            _writer.submit(now.date().isoformat(), line)
+        else:
+            _writer.write([(now.date().isoformat(), line)])
+    except Exception as e:
+        print(f"Error logging message: {e}", file=sys.stderr)
+
+
+def debug(message, **fields):
+    log(message, level="DEBUG", **fields)
+
+
+def flush_logs():
+    """Block until queued records are written."""
+    _writer.flush()
@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import datetime
+import threading
+from common.logs import log
+
+# =============================
+# Rule-based MIS question parser
+# =============================
+# Most MIS questions are an OKR x an optional entity x a period ("EBITDA for
+# HICT this quarter", "volume trend last 6 months"). Those are turned into
+# parameterized SQL over [MIS].[PERIODIC_REPORT] directly, following the same
+# mappings the SQL prompt gives Gemini. The parser only answers when every
+# word of the question is accounted for; anything else returns None and goes
+# to the LLM.
+
+VIEW = "[MIS].[PERIODIC_REPORT]"
+ENTITY_SQL = f"SELECT DISTINCT ENTITY_CODE, ENTITY_NAME, GROUP_ENTITY FROM {VIEW}"
+
+OKRS = [
+    "VOLUME_TEU", "VOLUME_TON", "EBITDA", "EBIT", "IMPORT_TEU", "EXPORT_TEU",
+    "COS_DOM_DSCH_TEU", "COS_DOM_LOAD_TEU", "TP_DSCH_TEU", "TP_LOAD_TEU",
+    "STEEL_DISCHARGE", "FERTILISER_DISCHARGE", "ALUMINIUM_DISCHARGE",
+    "OTHER_DISCHARGE", "STEEL_LOAD", "ALUMINIUM_LOAD", "OTHER_LOAD",
+    "RESTOW_VY_TEU", "RESTOW_B2B_TEU"
+]
+OKR_SYNONYMS = {
+    "volume in tons": "VOLUME_TON", "volume in tonnes": "VOLUME_TON", "tonnage": "VOLUME_TON",
+    "volume": "VOLUME_TEU", "throughput": "VOLUME_TEU",
+    "ebitda": "EBITDA", "profit": "EBITDA", "ebit": "EBIT",
+    "imports": "IMPORT_TEU", "import": "IMPORT_TEU", "exports": "EXPORT_TEU", "export": "EXPORT_TEU",
+    "fertilizer discharge": "FERTILISER_DISCHARGE",
+}
+# Every OKR can also be named by its code, with or without underscores.
+for _okr in OKRS:
+    OKR_SYNONYMS.setdefault(_okr.lower(), _okr)
+    OKR_SYNONYMS.setdefault(_okr.lower().replace("_", " "), _okr)
+
+# Period-to-date phrases -> column prefix, for the current month's row.
+TO_DATE_PERIODS = {
+    "this week": "WTD", "week to date": "WTD", "wtd": "WTD",
+    "this fortnight": "FTD", "fortnight to date": "FTD", "ftd": "FTD",
+    "this month": "MTD", "month to date": "MTD", "current month": "MTD", "mtd": "MTD",
+    "this quarter": "QTD", "quarter to date": "QTD", "current quarter": "QTD", "qtd": "QTD",
+    "this half year": "HTD", "half year to date": "HTD", "current half year": "HTD", "htd": "HTD",
+    "this year": "YTD", "year to date": "YTD", "current year": "YTD", "ytd": "YTD",
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+_MONTH = "(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + ")"
+RANGE_PATTERN = re.compile(rf"\b(?:from |between )?{_MONTH}(?:[ -](\d{{4}}))? (?:to|till|until|through|and|-) {_MONTH}[ -](\d{{4}})\b")
+MONTH_PATTERN = re.compile(rf"\b(?:in |for |of )?{_MONTH}[ -](\d{{4}})\b")
+LAST_N_PATTERN = re.compile(r"\b(?:last|past|previous) (\d{1,2}) months?\b")
+LAST_MONTH_PATTERN = re.compile(r"\b(?:last|previous) month\b")
+
+BUDGET_VS_PATTERN = re.compile(r"\b(?:actuals? )?(?:vs\.?|versus|against|compared to|compared with) (?:the )?budget(?:ed)?\b")
+BUDGET_PATTERN = re.compile(r"\b(?:budget(?:ed)?|target)\b")
+BY_ENTITY_PATTERN = re.compile(r"\b(?:by|per|for each|each|across) (?:entity|entities|terminal|terminals|port|ports)\b|\bentity[ -]?wise\b|\bterminal[ -]?wise\b")
+
+# Words that may appear around the recognized parts without changing the query.
+FILLER_WORDS = {
+    "what", "whats", "what's", "is", "are", "was", "were", "the", "a", "an", "of", "for", "in", "at", "on",
+    "to", "and", "our", "we", "us", "me", "my", "show", "give", "get", "tell", "display", "list", "please",
+    "can", "you", "could", "would", "total", "overall", "sum", "how", "much", "many", "value", "values",
+    "number", "figure", "figures", "data", "report", "kpi", "okr", "actual", "actuals", "achieved",
+    "handled", "did", "do", "have", "has", "till", "date", "so", "far", "with", "chart", "graph", "plot",
+    "pie", "bar", "line", "donut", "histogram", "trend", "trends", "monthly", "month", "months", "wise",
+    "teu", "teus", "ton", "tons", "tonnes", "during", "all", "by", "from", "as", "i", "need", "want",
+    "see", "view", "generate", "create", "draw", "make", "summary", "numbers", "now", "current",
+}
+
+
+def _normalize(question):
+    text = " ".join(question.lower().replace("?", " ").replace(",", " ").split())
+    return re.sub(r"[.!]+$", "", text).strip()
+
+
+def _month_end(year, month):
+    return datetime.date(year, month, 1).isoformat()
+
+
+class MISQuestionParser:
+    """Turns common MIS KPI questions into parameterized SQL.
+
+    `load_entities` returns rows with ENTITY_CODE, ENTITY_NAME and
+    GROUP_ENTITY; they are loaded on first use and refreshed every
+    `refresh_seconds`. parse() returns (sql, params) or None.
+    """
+
+    def __init__(self, load_entities, refresh_seconds=3600):
+        self.load_entities = load_entities
+        self.refresh_seconds = refresh_seconds
+        self._entities = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"parsed": 0, "fallbacks": 0}
+
+    def _entity_names(self):
+        """Return {lower-case name: name as stored} for every entity code, name and group."""
+        if self._entities is not None and time.time() - self._loaded_at < self.refresh_seconds:
+            return self._entities
+        with self._lock:
+            if self._entities is None or time.time() - self._loaded_at >= self.refresh_seconds:
+                names = {}
+                try:
+                    for row in self.load_entities() or []:
+                        for column in ("ENTITY_CODE", "ENTITY_NAME", "GROUP_ENTITY"):
+                            value = row.get(column)
+                            if isinstance(value, str) and value.strip():
+                                names.setdefault(" ".join(value.lower().split()), value.strip())
+                except Exception as e:
+                    log(f"Error loading MIS entities: {e}")
+                # An empty list is kept too; questions naming an entity then fall back to the LLM.
+                self._entities = names
+                self._loaded_at = time.time()
+            return self._entities
+
+    @staticmethod
+    def _take(text, phrases):
+        """Find the phrases (longest first) in text. Returns ([matched values], remaining text)."""
+        found = []
+        for phrase in sorted(phrases, key=len, reverse=True):
+            pattern = re.compile(rf"(?<![\w-]){re.escape(phrase)}(?![\w-])")
+            if pattern.search(text):
+                found.append(phrases[phrase])
+                text = pattern.sub(" ", text)
+        return found, text
+
+    def parse(self, question):
+        result = self._parse(question)
+        with self._lock:
+            self._stats["parsed" if result else "fallbacks"] += 1
+        return result
+
+    def _parse(self, question):
+        text = _normalize(question)
+        if not text:
+            return None
+
+        okrs, text = self._take(text, OKR_SYNONYMS)
+        if len(set(okrs)) != 1:
+            return None
+        okr = okrs[0]
+
+        entities, text = self._take(text, self._entity_names())
+        if len(set(entities)) > 1:
+            return None
+        entity = entities[0] if entities else None
+
+        by_entity = bool(BY_ENTITY_PATTERN.search(text))
+        text = BY_ENTITY_PATTERN.sub(" ", text)
+        if by_entity and entity:
+            return None
+
+        if BUDGET_VS_PATTERN.search(text):
+            measures = ["ACTUALS", "BUDGET"]
+            text = BUDGET_VS_PATTERN.sub(" ", text)
+        elif BUDGET_PATTERN.search(text):
+            measures = ["BUDGET"]
+            text = BUDGET_PATTERN.sub(" ", text)
+        else:
+            measures = ["ACTUALS"]
+
+        # Period: a range or the last N months give a monthly series, the rest a single value.
+        params = [okr]
+        series = False
+        match = RANGE_PATTERN.search(text)
+        if match:
+            start_month, start_year, end_month, end_year = match.groups()
+            start = _month_end(int(start_year or end_year), MONTHS[start_month])
+            end = _month_end(int(end_year), MONTHS[end_month])
+            if start > end:
+                return None
+            period_sql, prefix, series = "MONTHS BETWEEN EOMONTH(%s) AND EOMONTH(%s)", "MTD", True
+            params += [start, end]
+            text = RANGE_PATTERN.sub(" ", text)
+        elif LAST_N_PATTERN.search(text):
+            months = int(LAST_N_PATTERN.search(text).group(1))
+            if not 1 <= months <= 36:
+                return None
+            period_sql, prefix, series = "MONTHS >= EOMONTH(DATEADD(MONTH, %s, GETDATE()))", "MTD", True
+            params.append(-(months - 1))
+            text = LAST_N_PATTERN.sub(" ", text)
+        elif LAST_MONTH_PATTERN.search(text):
+            period_sql, prefix = "MONTHS = EOMONTH(GETDATE(), -1)", "MTD"
+            text = LAST_MONTH_PATTERN.sub(" ", text)
+        elif MONTH_PATTERN.search(text):
+            month, year = MONTH_PATTERN.search(text).groups()
+            period_sql, prefix = "MONTHS = EOMONTH(%s)", "MTD"
+            params.append(_month_end(int(year), MONTHS[month]))
+            text = MONTH_PATTERN.sub(" ", text)
+        else:
+            periods, text = self._take(text, TO_DATE_PERIODS)
+            if len(set(periods)) != 1:
+                return None
+            period_sql, prefix = "MONTHS = EOMONTH(GETDATE())", periods[0]
+
+        if series and by_entity:
+            return None
+
+        # Every remaining word must be filler, otherwise the question says something we don't model.
+        leftover = [word for word in re.findall(r"[\w'&]+", text) if word not in FILLER_WORDS]
+        if leftover:
+            return None
+
+        where = ["OKR = %s", period_sql]
+        if entity:
+            where.append("(ENTITY_NAME = %s OR ENTITY_CODE = %s OR GROUP_ENTITY = %s)")
+            params += [entity, entity, entity]
+        columns = [f"SUM({prefix}_{measure}) AS total_{prefix.lower()}" + ("" if len(measures) == 1 else f"_{measure.lower()}")
+                   for measure in measures]
+
+        if series:
+            sql = (f"SELECT FORMAT(MONTHS, 'MMM-yyyy') AS MonthFormatted, {', '.join(columns)} FROM {VIEW} "
+                   f"WHERE {' AND '.join(where)} GROUP BY MONTHS ORDER BY MONTHS")
+        elif by_entity:
+            sql = (f"SELECT ENTITY_NAME, {', '.join(columns)} FROM {VIEW} "
+                   f"WHERE {' AND '.join(where)} GROUP BY ENTITY_NAME ORDER BY ENTITY_NAME")
+        else:
+            sql = f"SELECT {', '.join(columns)} FROM {VIEW} WHERE {' AND '.join(where)}"
+        return sql, tuple(params)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        total = snapshot["parsed"] + snapshot["fallbacks"]
+        snapshot["parse_rate"] = round(snapshot["parsed"] / total, 4) if total else 0.0
+        snapshot["entities"] = len(self._entities or {})
+        return snapshot
+
+
+def get_mis_parser(load_entities):
+    """Return the MIS parser, or None when MIS_FAST_PATH=false."""
+    if os.getenv("MIS_FAST_PATH", "true").lower() != "true":
+        return None
+    return MISQuestionParser(load_entities, refresh_seconds=int(os.getenv("MIS_ENTITY_REFRESH", "3600")))
@@ -0,0 +1,251 @@
+import os
+import re
+import glob
+import threading
+from common.categories import FOLDER_MAP, ALL_CATEGORIES, get_source_folder
+from common.logs import log
+
+
+def clean_policy_name(file_path):
+    """Turn a PDF path into the display name used in answers."""
+    policy_name = os.path.splitext(os.path.basename(file_path))[0]
+    return policy_name.replace('_', ' ').replace('-', ' ')
+
+
+def _tokens(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class PolicyCatalog:
+    """In-memory catalog of the policy PDFs per category.
+
+    Built once from the files/ tree and refreshed by a polling watcher when a
+    category folder changes, so count/name questions never touch the disk.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._policies = {}
+        self._folder_mtimes = {}
+        # Bumped on every refresh so derived state can tell it is stale.
+        self.version = 0
+        self._watcher = None
+        self._stop = threading.Event()
+        self.refresh()
+
+    def _folder_state(self):
+        state = {}
+        for policy_type in FOLDER_MAP:
+            folder = get_source_folder(policy_type)
+            state[policy_type] = os.stat(folder).st_mtime if os.path.exists(folder) else None
+        return state
+
+    def refresh(self):
+        """Rebuild the catalog from the files/ tree."""
+        policies = {}
+        for policy_type in FOLDER_MAP:
+            folder = get_source_folder(policy_type)
+            pdf_files = glob.glob(os.path.join(folder, "*.pdf")) if os.path.exists(folder) else []
+            policies[policy_type] = sorted(
+                ({"name": clean_policy_name(p), "file": os.path.basename(p)} for p in pdf_files),
+                key=lambda policy: policy["name"]
+            )
+        state = self._folder_state()
+        with self._lock:
+            self._policies = policies
+            self._folder_mtimes = state
+            self.version += 1
+        log(f"Policy catalog refreshed: {', '.join(f'{k}={len(v)}' for k, v in policies.items())}")
+
+    def refresh_if_changed(self):
+        """Rebuild the catalog if any category folder was modified. Returns True if it was."""
+        if self._folder_state() != self._folder_mtimes:
+            self.refresh()
+            return True
+        return False
+
+    def start_watcher(self, interval=30):
+        """Poll the category folders every `interval` seconds in a daemon thread."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh_if_changed()
+                except Exception as e:
+                    log(f"Error refreshing policy catalog: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="policy-catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def get_policies(self, policy_type):
+        """Return [{"name", "file"}, ...] for a category, or None if it is unknown."""
+        with self._lock:
+            policies = self._policies.get(policy_type)
+        return list(policies) if policies is not None else None
+
+    def get_counts(self):
+        with self._lock:
+            return {policy_type: len(policies) for policy_type, policies in self._policies.items()}
+
+    def format_count(self, policy_type):
+        policies = self.get_policies(policy_type)
+        if policies is None:
+            return f"Invalid policy type: {policy_type}"
+        return f"There are {len(policies)} policies in the {policy_type} category."
+
+    def format_names(self, policy_type):
+        policies = self.get_policies(policy_type)
+        if policies is None:
+            return f"Invalid policy type: {policy_type}"
+        if not policies:
+            return f"No policies found in the {policy_type} category."
+        response = f"Here are the {len(policies)} policies in the {policy_type} category:\n\n"
+        for i, policy in enumerate(policies, 1):
+            response += f"{i}. {policy['name']}\n"
+        return response.strip()
+
+    def format_all_names(self):
+        with self._lock:
+            items = [(policy_type, list(policies)) for policy_type, policies in self._policies.items()]
+        response = f"Here are the {sum(len(p) for _, p in items)} policies across all categories:\n"
+        for policy_type, policies in items:
+            response += f"\n{policy_type}:\n"
+            for i, policy in enumerate(policies, 1):
+                response += f"{i}. {policy['name']}\n"
+        return response.strip()
+
+    def format_summary(self):
+        counts = self.get_counts()
+        response = "Policy Summary:\n\n"
+        for policy_type, count in counts.items():
+            response += f"• {policy_type}: {count} policies\n"
+        response += f"\nTotal policies across all categories: {sum(counts.values())}"
+        return response
+
+    def find_policy(self, text, min_score=0.5):
+        """Return [(policy_type, policy), ...] whose names best match `text`.
+
+        A name's score is the share of the words of `text` it contains;
+        nothing is returned when the best score is below `min_score`.
+        """
+        wanted = _tokens(text) - STOP_WORDS
+        if not wanted:
+            return []
+        best_score, matches = 0.0, []
+        with self._lock:
+            items = [(k, p) for k, policies in self._policies.items() for p in policies]
+        for policy_type, policy in items:
+            score = len(wanted & _tokens(policy["name"])) / len(wanted)
+            if score > best_score:
+                best_score, matches = score, [(policy_type, policy)]
+            elif score == best_score and score > 0:
+                matches.append((policy_type, policy))
+        return matches if best_score >= min_score else []
+
+
+# =============================
+# Catalog intent router
+# =============================
+
+STOP_WORDS = {"the", "a", "an", "of", "for", "in", "on", "to", "is", "are", "policy", "policies",
+              "sop", "sops", "document", "documents", "category", "which", "what", "where", "can",
+              "i", "find", "has", "have", "contains", "contain", "include", "includes", "about"}
+
+_DOCS = r"(?:polic(?:y|ies)|sops?|documents?|files?)"
+_ALL = r"\b(?:all|total|overall|every|each)\b"
+
+# The counted noun must be the documents themselves ("how many HR policies"), not
+# something a policy governs ("how many days of leave under the leave policy").
+COUNT_PATTERN = re.compile(
+    rf"^\s*(?:how many|number of|count of|count the|total number of)\s+(?:(?P<qualifier>\w+)\s+)?{_DOCS}\b"
+)
+# Qualifiers of a count that name a category ("how many IT policies"), and ones
+# that name none and count the current category ("how many available policies").
+# Any other qualifier ("sop" spans four categories, "leave" is a topic) goes to the chain.
+COUNT_QUALIFIER_CATEGORIES = {
+    "it": "IT Policy",
+    "hr": "HR Policy",
+    "operation": "SOPP_Operation",
+    "operations": "SOPP_Operation",
+    "procurement": "SOPP_Procurement",
+    "revenue": "SOPP_Revenue",
+    "sales": "SOPP_Sales",
+}
+GENERIC_COUNT_QUALIFIERS = {"the", "total", "available", "different", "our", "existing", "current", "active",
+                            "policy", "document"}
+LIST_PATTERNS = [
+    re.compile(rf"^\s*(?:please\s+)?(?:list|show|give|tell)(?: me)?(?: all)?(?: the)?(?: names of)?(?: the)?(?: available)? {_DOCS}\s*$"),
+    re.compile(rf"^\s*(?:what|which) (?:are|is) (?:the )?(?:names of (?:the |all )?)?(?:all )?(?:the )?(?:available )?{_DOCS}(?: names)?(?: (?:are )?(?:there|available|we have))?\s*$"),
+    re.compile(rf"^\s*(?:what|which) {_DOCS} (?:are there|do we have|exist|are available)\s*$"),
+    re.compile(rf"^\s*(?:policy|sop|document) names\s*$"),
+    re.compile(rf"^\s*names? of (?:all )?(?:the )?{_DOCS}\s*$"),
+]
+WHICH_CATEGORY_PATTERN = re.compile(
+    r"^\s*(?:which|what) category (?:has|contains|includes|is)(?: the)? (?P<name>.+?)(?: in)?\s*$"
+    r"|^\s*where (?:can i find|is)(?: the)? (?P<name2>.+?)\s*$"
+)
+# "Where is X" is only answered with a location when every word of X is in one
+# document name ("where is the POSH policy"), and X names at most a few documents.
+# Anything looser ("where can I find the gratuity rules") is a content question.
+WHICH_CATEGORY_MIN_SCORE = 1.0
+WHICH_CATEGORY_MAX_MATCHES = 3
+
+
+def _normalize(question):
+    return re.sub(r"[?.!]+\s*$", "", " ".join(question.lower().split()))
+
+
+def answer_catalog_question(policy_type, question, catalog=None):
+    """Answer count / list / "which category has X" questions from the catalog.
+
+    Returns the answer text, or None when the question is not a catalog
+    question and should go to the retrieval chain.
+    """
+    catalog = catalog or get_policy_catalog()
+    text = _normalize(question)
+
+    match = COUNT_PATTERN.search(text)
+    if match:
+        qualifier = match.group("qualifier")
+        if qualifier and qualifier not in GENERIC_COUNT_QUALIFIERS:
+            named = COUNT_QUALIFIER_CATEGORIES.get(qualifier)
+            return catalog.format_count(named) if named else None
+        across_categories = re.search(_ALL, text) and re.search(r"\bcategor(?:y|ies)\b", text)
+        if across_categories or policy_type not in FOLDER_MAP:
+            return catalog.format_summary()
+        return catalog.format_count(policy_type)
+
+    if policy_type in FOLDER_MAP and any(pattern.search(text) for pattern in LIST_PATTERNS):
+        return catalog.format_names(policy_type)
+    if policy_type == ALL_CATEGORIES and any(pattern.search(text) for pattern in LIST_PATTERNS):
+        return catalog.format_all_names()
+
+    match = WHICH_CATEGORY_PATTERN.search(text)
+    if match:
+        name = match.group("name") or match.group("name2")
+        found = catalog.find_policy(name, min_score=WHICH_CATEGORY_MIN_SCORE)
+        if not found or len(found) > WHICH_CATEGORY_MAX_MATCHES:
+            return None
+        lines = [f"• {policy['name']} is in the {category} category." for category, policy in found]
+        return "\n".join(lines)
+
+    return None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_policy_catalog():
+    """Return the process-wide policy catalog, building it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = PolicyCatalog()
+    return _catalog
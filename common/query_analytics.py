@@ -0,0 +1,308 @@
+import sys
+import json
+import math
+import time
+import argparse
+import datetime
+import threading
+from collections import Counter
+from common.answer_cache import normalize_question, cosine_similarity
+from common.query_audit import get_query_audit
+from common.logs import log
+
+# =============================
+# Query analytics and cache prewarming
+# =============================
+# Groups the questions in the query audit into intents per category (same
+# normalized text first, then embedding similarity between the distinct
+# texts), reports the most frequent ones with their latency and how often
+# they needed the LLM, and replays them through the caches so the first
+# users after a deploy or re-index don't pay cold-cache latency.
+#
+#   python -m common.query_analytics report --top 20
+#   python -m common.query_analytics prewarm --top 20
+#
+# From the command line prewarming fills the persistent caches (generated
+# SQL and embeddings). The answer and MIS result caches live in the server
+# process; main1 warms those at startup with PREWARM_TOP_N.
+
+LLM_SOURCES = ("llm", "mis")
+# Bucket for questions recorded without a category, e.g. queries.txt lines
+# whose question is not in any chat history. Reported, never prewarmed.
+UNCATEGORIZED = "Uncategorized"
+
+
+def load_questions(audit=None, categories=None, days=None):
+    """Audited questions, optionally only from the last `days` days.
+
+    Questions without a category get UNCATEGORIZED as their category.
+    """
+    audit = audit or get_query_audit()
+    cutoff = None
+    if days:
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for row in audit.iter_all():
+        if not row["category"]:
+            row = dict(row, category=UNCATEGORIZED)
+        if categories and row["category"] not in categories:
+            continue
+        if cutoff and row["created"] < cutoff:
+            continue
+        rows.append(row)
+    return rows
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(math.ceil(fraction * len(values))) - 1)]
+
+
+def cluster_questions(rows, embedding=None, threshold=0.9, max_groups=2000):
+    """Group the rows of one category into intents, most frequent first.
+
+    Rows with the same normalized text always share an intent; when an
+    embedding is given, distinct texts whose embeddings are at least
+    `threshold` cosine-similar to an intent's most frequent text join it.
+    Only the `max_groups` most frequent texts are embedded; rarer ones are
+    left as their own intents.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(normalize_question(row["query"]), []).append(row)
+    ordered = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+
+    vectors = [None] * len(ordered)
+    if embedding is not None and len(ordered) > 1:
+        texts = [text for text, _ in ordered[:max_groups]]
+        try:
+            vectors[:len(texts)] = embedding.embed_documents(texts)
+        except Exception as e:
+            log(f"Error embedding questions for analytics, clustering by text only: {e}")
+
+    clusters = []
+    for (text, members), vector in zip(ordered, vectors):
+        _add_to_cluster(clusters, vector, members, threshold)
+    intents = [_summarize(cluster["rows"]) for cluster in clusters]
+    intents.sort(key=lambda intent: intent["count"], reverse=True)
+    return intents
+
+
+def _add_to_cluster(clusters, vector, members, threshold):
+    """Add the rows of one question text to the first cluster it is `threshold`-similar to, or a new one."""
+    if vector is not None:
+        for cluster in clusters:
+            if cluster["vector"] is not None and cosine_similarity(vector, cluster["vector"]) >= threshold:
+                cluster["rows"].extend(members)
+                return cluster
+    cluster = {"vector": vector, "rows": list(members)}
+    clusters.append(cluster)
+    return cluster
+
+
+def _summarize(members):
+    """The intent entry for a cluster's rows: most common phrasing, frequency, latency and LLM share."""
+    phrasings = Counter(row["query"].strip() for row in members)
+    latencies = [row["latency_ms"] for row in members if row.get("latency_ms") is not None]
+    answered = [row for row in members if row.get("source")]
+    llm_calls = sum(1 for row in answered if row["source"] in LLM_SOURCES)
+    return {
+        "question": phrasings.most_common(1)[0][0],
+        "count": len(members),
+        "variants": [text for text, _ in phrasings.most_common()],
+        "avg_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+        "p95_latency_ms": _percentile(latencies, 0.95),
+        "llm_share": round(llm_calls / len(answered), 3) if answered else None,
+        "last_asked": max(row["created"] for row in members)
+    }
+
+
+class IntentIndex:
+    """Intents per category, kept up to date from the query audit a batch at a time.
+
+    Remembers the last audit id it has read and the clusters built so far,
+    so update() only reads the questions recorded since, and only embeds
+    question texts it has not seen before (at most `max_groups` per
+    category). Rows are read as they are recorded, so latency and source
+    may be missing for questions still being answered at the time.
+    """
+
+    def __init__(self, audit=None, embedding=None, threshold=0.9, max_groups=2000):
+        self.audit = audit or get_query_audit()
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_groups = max_groups
+        self.last_id = 0
+        self._clusters = {}     # category -> [{"vector", "rows"}]
+        self._text_cluster = {}  # (category, normalized text) -> its cluster
+        self._embedded = Counter()
+
+    def update(self, batch_size=1000):
+        """Add the questions recorded since the last update; returns how many were read."""
+        by_category = {}
+        read = 0
+        while True:
+            rows = self.audit.since(self.last_id, batch_size)
+            if not rows:
+                break
+            for row in rows:
+                category = row["category"] or UNCATEGORIZED
+                by_category.setdefault(category, {}).setdefault(normalize_question(row["query"]), []).append(row)
+            read += len(rows)
+            self.last_id = rows[-1]["id"]
+
+        for category, groups in by_category.items():
+            clusters = self._clusters.setdefault(category, [])
+            new_texts = []
+            for text, members in sorted(groups.items(), key=lambda item: len(item[1]), reverse=True):
+                cluster = self._text_cluster.get((category, text))
+                if cluster is not None:
+                    cluster["rows"].extend(members)
+                else:
+                    new_texts.append((text, members))
+
+            vectors = [None] * len(new_texts)
+            budget = self.max_groups - self._embedded[category]
+            if self.embedding is not None and budget > 0 and new_texts:
+                texts = [text for text, _ in new_texts[:budget]]
+                try:
+                    vectors[:len(texts)] = self.embedding.embed_documents(texts)
+                    self._embedded[category] += len(texts)
+                except Exception as e:
+                    log(f"Error embedding questions for analytics, clustering by text only: {e}")
+            for (text, members), vector in zip(new_texts, vectors):
+                self._text_cluster[(category, text)] = _add_to_cluster(clusters, vector, members, self.threshold)
+        return read
+
+    def top_intents(self, top_n=20):
+        """Return {category: [top_n intents]} as of the last update()."""
+        return {
+            category: sorted((_summarize(cluster["rows"]) for cluster in clusters),
+                             key=lambda intent: intent["count"], reverse=True)[:top_n]
+            for category, clusters in sorted(self._clusters.items())
+        }
+
+
+def top_intents(audit=None, embedding=None, top_n=20, threshold=0.9, categories=None, days=None):
+    """Return {category: [top_n intents]} from the query audit."""
+    by_category = {}
+    for row in load_questions(audit, categories, days):
+        by_category.setdefault(row["category"], []).append(row)
+    return {
+        category: cluster_questions(rows, embedding, threshold)[:top_n]
+        for category, rows in sorted(by_category.items())
+    }
+
+
+def prewarm(intents, embedding=None, answer_policy=None, execute_mis=True):
+    """Replay popular questions through the caches.
+
+    For every intent the embeddings of its phrasings are computed (filling
+    the embedding cache). Policy intents are passed to `answer_policy`
+    (category, question), which answers them into the answer cache; MIS
+    intents get their SQL generated (SQL cache) and, with `execute_mis`,
+    run (result cache). UNCATEGORIZED intents have no category to answer
+    from and are skipped. Returns a count per category.
+    """
+    from common.document1 import parse_mis_question, generate_sql, run_mis_query
+
+    summary = {}
+    for category, category_intents in intents.items():
+        if category == UNCATEGORIZED:
+            continue
+        warmed = 0
+        for intent in category_intents:
+            question = intent["question"]
+            try:
+                if embedding is not None:
+                    # Retrieval and the answer cache embed the question as a query.
+                    for variant in intent["variants"][:10]:
+                        embedding.embed_query(variant)
+                if category == "MIS":
+                    parsed = parse_mis_question(question)
+                    if parsed is None:
+                        parsed = (generate_sql(question), None)
+                    if execute_mis:
+                        run_mis_query(*parsed)
+                elif answer_policy is not None:
+                    answer_policy(category, question)
+                warmed += 1
+            except Exception as e:
+                log(f"Error prewarming '{question}' in {category}: {e}")
+        summary[category] = warmed
+        log(f"Prewarmed {warmed} popular questions for {category}")
+    return summary
+
+
+def start_prewarmer(answer_policy, embedding=None, top_n=20, interval=300, threshold=0.9):
+    """Prewarm the top intents in a daemon thread, then again for every category that gets re-indexed."""
+    from common.ingestion import get_index_version
+
+    def run():
+        warmed_versions = {}
+        # Only the questions recorded since the previous round are read and embedded.
+        index = IntentIndex(embedding=embedding, threshold=threshold)
+        while True:
+            try:
+                index.update()
+                intents = index.top_intents(top_n)
+                versions = {category: get_index_version(category) for category in intents
+                            if category not in ("MIS", UNCATEGORIZED)}
+                due = {
+                    category: category_intents for category, category_intents in intents.items()
+                    if category not in warmed_versions
+                    or (category in versions and versions[category] != warmed_versions[category])
+                }
+                if due:
+                    prewarm(due, embedding, answer_policy)
+                    for category in due:
+                        warmed_versions[category] = versions.get(category)
+            except Exception as e:
+                log(f"Error prewarming caches: {e}")
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="cache-prewarmer", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report popular questions from the query audit and prewarm caches with them.")
+    parser.add_argument("command", choices=["report", "prewarm"])
+    parser.add_argument("--top", type=int, default=20, help="Intents per category")
+    parser.add_argument("--category", action="append", help="Only these categories (repeatable)")
+    parser.add_argument("--days", type=int, default=None, help="Only questions from the last N days")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Embedding similarity that merges two questions")
+    parser.add_argument("--no-embeddings", action="store_true", help="Cluster by normalized text only")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    embedding = None
+    if not args.no_embeddings:
+        from common.embeddings import get_embedding
+        embedding = get_embedding()
+
+    intents = top_intents(embedding=embedding, top_n=args.top, threshold=args.threshold,
+                          categories=args.category, days=args.days)
+    if args.command == "prewarm":
+        print(json.dumps(prewarm(intents, embedding, execute_mis=False), indent=2))
+        return 0
+
+    if args.json:
+        print(json.dumps(intents, indent=2))
+        return 0
+    for category, category_intents in intents.items():
+        print(f"\n{category}")
+        for rank, intent in enumerate(category_intents, 1):
+            latency = f"{intent['avg_latency_ms']:.0f} ms avg" if intent["avg_latency_ms"] is not None else "latency n/a"
+            llm = f", LLM {intent['llm_share']:.0%}" if intent["llm_share"] is not None else ""
+            print(f"{rank:>3}. {intent['count']:>5}x  {intent['question']}  ({len(intent['variants'])} phrasings, {latency}{llm})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import sqlite3
+import datetime
+import threading
+from common.chat_history_manager import JsonChatHistoryStore
+from common.logs import log
+
+# =============================
+# Query audit log
+# =============================
+# Every question is stored in SQLite with an autoincrement id, so recording
+# one costs the same however many came before it and concurrent requests
+# never share a number. queries.txt keeps receiving the familiar
+# "N. [timestamp]: question" lines, numbered with that id.
+
+LEGACY_LINE_PATTERN = re.compile(r"^(\d+)\.\s+(?:\[([^\]]+)\]:\s?)?(.*)$")
+
+
+class QueryAudit:
+    """Append-only audit of user questions.
+
+    `text_path` (None to disable) mirrors each question as a numbered line and
+    is renamed to `<text_path>.<date>` once it grows past `text_max_bytes`.
+    Rows older than `retention_days` (0 keeps everything) are pruned at most
+    once an hour. On first use an existing queries.txt is imported so ids
+    continue from its last number; queries.txt has no categories, so they are
+    taken from the matching questions in the JSON chat histories under
+    `history_dir`.
+    """
+
+    def __init__(self, path, text_path="queries.txt", text_max_bytes=10 * 1024 * 1024, retention_days=0,
+                 history_dir="./chat_histories"):
+        self.path = path
+        self.text_path = text_path
+        self.history_dir = history_dir
+        self.text_max_bytes = text_max_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created TEXT NOT NULL, query TEXT NOT NULL, "
+            "category TEXT, conversation_id TEXT, latency_ms REAL, source TEXT)"
+        )
+        # Audits created before latency/source were recorded.
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(queries)")}
+        for column, kind in (("latency_ms", "REAL"), ("source", "TEXT")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE queries ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_queries_created ON queries(created)")
+        self._conn.commit()
+        self._import_legacy()
+
+    def _import_legacy(self):
+        """Load an existing queries.txt into an empty audit table, keeping its numbers."""
+        if not self.text_path or not os.path.exists(self.text_path):
+            return
+        with self._lock:
+            if self._conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]:
+                return
+            rows = []
+            try:
+                with open(self.text_path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        match = LEGACY_LINE_PATTERN.match(line.rstrip("\n"))
+                        if match:
+                            number, created, query = match.groups()
+                            rows.append((int(number), created or "", query))
+                categories = self._history_categories()
+                rows = [(number, created, query, categories.get(query.strip())) for number, created, query in rows]
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO queries (id, created, query, category) VALUES (?, ?, ?, ?)", rows)
+                self._conn.commit()
+                if rows:
+                    categorised = sum(1 for row in rows if row[3])
+                    log(f"Imported {len(rows)} queries from {self.text_path} into the query audit "
+                        f"({categorised} with a category from the chat histories)")
+            except Exception as e:
+                log(f"Error importing {self.text_path} into the query audit: {e}")
+
+    def _history_categories(self):
+        """{question text: category} from the JSON chat histories; the last category asked in wins."""
+        categories = {}
+        if not self.history_dir or not os.path.isdir(self.history_dir):
+            return categories
+        store = JsonChatHistoryStore(self.history_dir)
+        for conversation_id in store.list():
+            try:
+                chat_history = store.load(conversation_id)
+            except Exception as e:
+                log(f"Error reading chat history {conversation_id} for the query audit: {e}")
+                continue
+            for entry in chat_history:
+                message, category = (entry.get("message") or "").strip(), entry.get("category")
+                # "multiple" marks questions asked over several categories.
+                if message and category and category != "multiple":
+                    categories[message] = category
+        return categories
+
+    def record(self, query, category=None, conversation_id=None):
+        """Store a question and return its id."""
+        created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO queries (created, query, category, conversation_id) VALUES (?, ?, ?, ?)",
+                (created, query, category, conversation_id)
+            )
+            self._conn.commit()
+            query_id = cursor.lastrowid
+            if self.text_path:
+                self._append_text(f"{query_id}. [{created}]: {query}\n")
+        self._prune()
+        return query_id
+
+    def complete(self, query_id, latency_ms, source=None):
+        """Attach the answer latency and how it was produced (llm, answer_cache, catalog, ...) to a question."""
+        if query_id is None:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE queries SET latency_ms = ?, source = ? WHERE id = ?", (latency_ms, source, query_id))
+            self._conn.commit()
+
+    def _append_text(self, line):
+        try:
+            if self.text_max_bytes and os.path.exists(self.text_path) \
+                    and os.path.getsize(self.text_path) >= self.text_max_bytes:
+                rotated = f"{self.text_path}.{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+                os.replace(self.text_path, rotated)
+                log(f"Rotated {self.text_path} to {rotated}")
+            with open(self.text_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except Exception as e:
+            log(f"Error appending to {self.text_path}: {e}")
+
+    def _prune(self):
+        if not self.retention_days or time.time() - self._pruned_at < 3600:
+            return
+        self._pruned_at = time.time()
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM queries WHERE created < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        if deleted:
+            log(f"Pruned {deleted} queries older than {self.retention_days} days from the query audit")
+
+    # ---- reader API ----
+
+    def _select(self, sql, args):
+        with self._lock:
+            cursor = self._conn.execute(sql, args)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def recent(self, limit=100, category=None):
+        """The latest questions, newest first."""
+        if category:
+            return self._select("SELECT * FROM queries WHERE category = ? ORDER BY id DESC LIMIT ?", (category, limit))
+        return self._select("SELECT * FROM queries ORDER BY id DESC LIMIT ?", (limit,))
+
+    def since(self, after_id=0, limit=1000, category=None):
+        """Questions with an id greater than `after_id`, oldest first, for incremental readers."""
+        if category:
+            return self._select(
+                "SELECT * FROM queries WHERE id > ? AND category = ? ORDER BY id LIMIT ?", (after_id, category, limit))
+        return self._select("SELECT * FROM queries WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+
+    def iter_all(self, category=None, batch_size=1000):
+        """Every stored question, oldest first, read in batches."""
+        after_id = 0
+        while True:
+            rows = self.since(after_id, batch_size, category)
+            if not rows:
+                return
+            yield from rows
+            after_id = rows[-1]["id"]
+
+    def stats(self):
+        with self._lock:
+            count, last_id = self._conn.execute("SELECT COUNT(*), MAX(id) FROM queries").fetchone()
+        return {"queries": count, "last_id": last_id or 0}
+
+
+_audit = None
+_audit_lock = threading.Lock()
+
+
+def get_query_audit():
+    """Return the process-wide query audit.
+
+    QUERY_AUDIT_PATH, QUERY_AUDIT_TEXT ("" disables queries.txt),
+    QUERY_AUDIT_TEXT_MAX_BYTES, QUERY_AUDIT_RETENTION_DAYS and
+    QUERY_AUDIT_HISTORY_DIR (chat histories the queries.txt import takes
+    categories from) configure it.
+    """
+    global _audit
+    if _audit is None:
+        with _audit_lock:
+            if _audit is None:
+                _audit = QueryAudit(
+                    os.getenv("QUERY_AUDIT_PATH", "cache/queries.sqlite3"),
+                    text_path=os.getenv("QUERY_AUDIT_TEXT", "queries.txt") or None,
+                    text_max_bytes=int(os.getenv("QUERY_AUDIT_TEXT_MAX_BYTES", str(10 * 1024 * 1024))),
+                    retention_days=int(os.getenv("QUERY_AUDIT_RETENTION_DAYS", "0")),
+                    history_dir=os.getenv("QUERY_AUDIT_HISTORY_DIR", "./chat_histories")
+                )
+    return _audit
@@ -0,0 +1,83 @@
+import re
+import threading
+
+# =============================
+# Condense-question gate
+# =============================
+# ConversationalRetrievalChain rephrases every question against the chat
+# history with an extra LLM call whenever memory is non-empty. Most questions
+# are self-contained ("can you give me leave policy summary"), so a cheap
+# local check decides whether that call is needed at all.
+
+REFERENCE_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs",
+    "he", "she", "him", "her", "his", "ones", "above", "previous", "same",
+    "mentioned", "earlier", "former", "latter"
+}
+# "IT" the department ("IT policy", "it policy") is not the pronoun "it".
+IT_DEPARTMENT_PATTERN = re.compile(r"\bIT\b|(?i:\bit(?=\s+polic(?:y|ies)\b))")
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(?:and|also|but|so|then|or|what about|how about|what else|why|why not|more|elaborate|"
+    r"explain (?:more|further|again)|tell me more|go on|continue|same for|ok|okay)\b"
+)
+# Words that carry no subject of their own.
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "can", "could", "would",
+    "should", "will", "you", "me", "my", "i", "we", "our", "us", "please", "give", "tell", "show",
+    "explain", "what", "which", "who", "when", "where", "how", "why", "about", "of", "for", "in",
+    "on", "to", "with", "and", "or", "any", "some", "more", "detail", "details", "summary",
+    "summarize", "brief", "again", "there", "here"
+}
+
+_stats = {"decisions": 0, "condense_needed": 0, "condense_skipped": 0}
+_stats_lock = threading.Lock()
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def _record(needed):
+    with _stats_lock:
+        _stats["decisions"] += 1
+        _stats["condense_needed" if needed else "condense_skipped"] += 1
+    return needed
+
+
+def needs_condense(question, previous_exchanges):
+    """Return True if `question` probably depends on the previous exchanges.
+
+    A question needs condensing when there is history and it refers back to
+    it (pronouns, "what about ...", "tell me more"), has no subject of its
+    own, or is a short fragment sharing terms with the previous question.
+    """
+    if not previous_exchanges:
+        # A first question has nothing to condense against; not a skipped call.
+        return False
+
+    text = " ".join(IT_DEPARTMENT_PATTERN.sub("information technology", question).lower().split())
+    words = _words(text)
+    if not words:
+        return _record(False)
+
+    if FOLLOW_UP_PATTERN.match(text) or REFERENCE_WORDS.intersection(words):
+        return _record(True)
+
+    content_words = [w for w in words if w not in FILLER_WORDS]
+    if not content_words:
+        # e.g. "explain in more detail", "give me a summary"
+        return _record(True)
+
+    previous_question = previous_exchanges[-1].get("message") or ""
+    previous_words = set(_words(previous_question)) - FILLER_WORDS
+    if len(words) <= 3 and previous_words.intersection(content_words):
+        # Fragments like "sick leave?" after a question about leave.
+        return _record(True)
+
+    return _record(False)
+
+
+def condense_stats():
+    """Return how many condense calls were needed and how many were avoided."""
+    with _stats_lock:
+        return dict(_stats)
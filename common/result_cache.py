@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from common.logs import log
+
+# =============================
+# MIS query-result cache
+# =============================
+# [MIS].[PERIODIC_REPORT] only changes when the periodic load runs, so the
+# rows of a query can be served again until either a TTL passes ("ttl"
+# policy) or a cheap probe of the view shows that a load happened ("probe"
+# policy). Concurrent identical queries share one execution.
+
+DEFAULT_PROBE_SQL = "SELECT MAX(MONTHS) AS max_months, COUNT(*) AS row_count FROM [MIS].[PERIODIC_REPORT]"
+
+
+class _Flight:
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QueryResultCache:
+    """In-process cache of SQL results keyed by the exact SQL text and arguments.
+
+    `execute` runs a query and returns its rows. With policy="probe",
+    `probe_sql` is run at most every `probe_interval` seconds and all entries
+    are dropped when its result changes; `ttl_seconds` (None for no limit)
+    bounds the age of an entry under either policy. Empty results are not
+    cached because Database.execute also returns [] on errors.
+    """
+
+    def __init__(self, execute, policy="ttl", ttl_seconds=900, probe_sql=DEFAULT_PROBE_SQL,
+                 probe_interval=60, max_entries=500):
+        if policy not in ("ttl", "probe"):
+            raise ValueError(f"Unknown result cache policy: {policy}")
+        self.execute = execute
+        self.policy = policy
+        self.ttl_seconds = ttl_seconds
+        self.probe_sql = probe_sql
+        self.probe_interval = probe_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        # Bumped on invalidation so a query started before it doesn't store stale rows.
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._probe_value = None
+        self._probed_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "expirations": 0, "evictions": 0,
+                       "probes": 0, "probe_failures": 0, "invalidations": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(sql, args=None):
+        return (sql, repr(args))
+
+    def _check_probe(self):
+        """Run the freshness probe if it is due and drop every entry if the view was reloaded."""
+        if self.policy != "probe" or time.time() - self._probed_at < self.probe_interval:
+            return
+        # One caller probes; the others keep using the current entries meanwhile.
+        if not self._probe_lock.acquire(blocking=False):
+            return
+        try:
+            if time.time() - self._probed_at < self.probe_interval:
+                return
+            self._probed_at = time.time()
+            rows = self.execute(self.probe_sql)
+            with self._lock:
+                self._stats["probes"] += 1
+                if not rows:
+                    # Database.execute returns [] on errors; a failed probe says nothing about the data.
+                    self._stats["probe_failures"] += 1
+                    return
+                value = repr(rows)
+                if self._probe_value is not None and value != self._probe_value:
+                    self._stats["invalidations"] += 1
+                    self._entries.clear()
+                    self._generation += 1
+                    log(f"MIS result cache invalidated: {self.probe_sql} changed")
+                self._probe_value = value
+        except Exception as e:
+            with self._lock:
+                self._stats["probe_failures"] += 1
+            log(f"Error probing MIS data freshness: {e}")
+        finally:
+            self._probe_lock.release()
+
+    def get_or_execute(self, sql, args=None):
+        """Return the rows for a query from the cache, or execute it (once for concurrent callers)."""
+        self._check_probe()
+        key = self.make_key(sql, args)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.ttl_seconds is None or now - entry["created"] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return [dict(row) for row in entry["rows"]]
+                del self._entries[key]
+                self._stats["expirations"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(self._generation)
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return [dict(row) for row in flight.result]
+
+        try:
+            rows = self.execute(sql, args)
+            flight.result = rows
+            if rows:
+                with self._lock:
+                    if flight.generation != self._generation:
+                        return [dict(row) for row in rows]
+                    self._entries[key] = {"rows": rows, "created": time.time()}
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evictions"] += 1
+            return [dict(row) for row in rows]
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["policy"] = self.policy
+        lookups = snapshot["hits"] + snapshot["misses"] + snapshot["coalesced"]
+        snapshot["hit_rate"] = round((snapshot["hits"] + snapshot["coalesced"]) / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+def get_result_cache(execute):
+    """Return the configured result cache around `execute`, or None when RESULT_CACHE=false.
+
+    RESULT_CACHE_POLICY is "ttl" (default) or "probe". RESULT_CACHE_TTL bounds
+    the age of an entry (default 900s with "ttl", 86400s with "probe"; 0 for
+    no limit). RESULT_CACHE_PROBE_SQL and RESULT_CACHE_PROBE_INTERVAL
+    configure the probe, RESULT_CACHE_MAX_ENTRIES the size.
+    """
+    if os.getenv("RESULT_CACHE", "true").lower() != "true":
+        return None
+    policy = os.getenv("RESULT_CACHE_POLICY", "ttl").lower()
+    ttl = int(os.getenv("RESULT_CACHE_TTL", "900" if policy == "ttl" else "86400"))
+    return QueryResultCache(
+        execute,
+        policy=policy,
+        ttl_seconds=ttl or None,
+        probe_sql=os.getenv("RESULT_CACHE_PROBE_SQL", DEFAULT_PROBE_SQL),
+        probe_interval=int(os.getenv("RESULT_CACHE_PROBE_INTERVAL", "60")),
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "500"))
+    )
@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import datetime
+import threading
+from common.answer_cache import normalize_question
+from common.logs import log
+
+# =============================
+# Generated-SQL cache for MIS questions
+# =============================
+# The SQL prompt includes the current datetime and questions like "this
+# month" are resolved against it, so entries are keyed by the normalized
+# question *and* a date bucket: relative questions get one entry per day,
+# questions that only name absolute periods ("EBITDA in Jan 2025") are
+# shared across days.
+
+RELATIVE_TIME_PATTERN = re.compile(
+    r"\b(?:today|yesterday|tomorrow|now|current|currently|latest|recent|recently|so far|to date|"
+    r"this|last|previous|past|next|ytd|mtd|qtd|htd|wtd|ftd)\b"
+)
+ABSOLUTE_PERIOD_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+
+FORBIDDEN_SQL_PATTERN = re.compile(
+    r"\b(?:insert|update|delete|merge|drop|alter|create|truncate|exec|execute|grant|revoke|deny|"
+    r"backup|restore|shutdown|openrowset|opendatasource|xp_\w+|sp_\w+)\b",
+    re.IGNORECASE
+)
+
+
+def date_bucket(question, now=None):
+    """Return the period a generated query stays valid for: a day, or "fixed"."""
+    now = now or datetime.datetime.now()
+    text = normalize_question(question)
+    if ABSOLUTE_PERIOD_PATTERN.search(text) and not RELATIVE_TIME_PATTERN.search(text):
+        return "fixed"
+    return now.strftime("%Y-%m-%d")
+
+
+def is_valid_sql(sql):
+    """Only single read-only SELECT statements are cached (and so replayed)."""
+    if not sql:
+        return False
+    statement = sql.strip().rstrip(";").strip()
+    if ";" in statement or "--" in statement or "/*" in statement:
+        return False
+    if not re.match(r"^(?:select|with)\b", statement, re.IGNORECASE):
+        return False
+    return not FORBIDDEN_SQL_PATTERN.search(statement)
+
+
+class SQLCache:
+    """Persistent, size-bounded cache of generated SQL in SQLite.
+
+    Entries are keyed by (namespace, normalized question, date bucket); the
+    namespace identifies the prompt and model so changing either starts a
+    fresh set of entries. When the cache grows past `max_entries` the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "rejected": 0, "evictions": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sql_cache ("
+            "key TEXT PRIMARY KEY, question TEXT NOT NULL, bucket TEXT NOT NULL, "
+            "sql TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_last_used ON sql_cache(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace, question, bucket):
+        raw = f"{namespace}\0{normalize_question(question)}\0{bucket}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, namespace, question, now=None):
+        """Return the cached SQL for a question, or None."""
+        key = self.make_key(namespace, question, date_bucket(question, now))
+        with self._lock:
+            row = self._conn.execute("SELECT sql FROM sql_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._stats["hits"] += 1
+        return row[0]
+
+    def put(self, namespace, question, sql, now=None):
+        """Cache validated SQL for a question. Returns False if the SQL was rejected."""
+        if not is_valid_sql(sql):
+            with self._lock:
+                self._stats["rejected"] += 1
+            log(f"Generated SQL not cached (failed validation): {sql}")
+            return False
+        bucket = date_bucket(question, now)
+        key = self.make_key(namespace, question, bucket)
+        timestamp = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sql_cache (key, question, bucket, sql, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, normalize_question(question), bucket, sql, timestamp, timestamp)
+            )
+            # Day buckets that have passed can never be hit again.
+            today = (now or datetime.datetime.now()).strftime("%Y-%m-%d")
+            self._conn.execute("DELETE FROM sql_cache WHERE bucket != 'fixed' AND bucket < ?", (today,))
+            count = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+            if count > self.max_entries:
+                # Evict down to 90% so we don't evict on every insert.
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM sql_cache WHERE key IN "
+                    "(SELECT key FROM sql_cache ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._stats["evictions"] += excess
+            self._conn.commit()
+            self._stats["stores"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = self._conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+def get_sql_cache():
+    """Return the configured SQL cache, or None when SQL_CACHE=false.
+
+    `SQL_CACHE_PATH` and `SQL_CACHE_MAX_ENTRIES` configure it.
+    """
+    if os.getenv("SQL_CACHE", "true").lower() != "true":
+        return None
+    return SQLCache(
+        os.getenv("SQL_CACHE_PATH", "cache/sql_cache.sqlite3"),
+        max_entries=int(os.getenv("SQL_CACHE_MAX_ENTRIES", "5000"))
+    )
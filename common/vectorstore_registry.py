@@ -0,0 +1,155 @@
+import threading
+import time
+from common.logs import log
+
+
+class VectorStoreRegistry:
+    """Process-wide cache of opened vectorstores, keyed by category.
+
+    Each Chroma store is opened once and shared by every request; retrievers
+    are cached per (category, search kwargs) on top of it. When a `version_fn`
+    is given, a category whose index version changed (e.g. after a re-index
+    sync) is reopened, checked at most every `check_interval` seconds.
+    """
+
+    def __init__(self, loader, version_fn=None, check_interval=5.0, retriever_factory=None):
+        """`loader(policy_type)` opens (or builds) the store for a category.
+
+        `retriever_factory(policy_type, store, **search_kwargs)` builds the
+        retrievers; by default they are the store's own `as_retriever()`.
+        """
+        self._loader = loader
+        self._version_fn = version_fn
+        self._retriever_factory = retriever_factory
+        self._check_interval = check_interval
+        self._versions = {}
+        self._checked_at = {}
+        self._stores = {}
+        self._retrievers = {}
+        self._lock = threading.Lock()
+        self._category_locks = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            # Retriever cache hits; a retriever miss shows up as a store hit or miss.
+            "retriever_hits": 0,
+            "opens": 0,
+            "open_errors": 0,
+            "open_seconds_total": 0.0,
+            "open_seconds_by_category": {}
+        }
+
+    def _category_lock(self, policy_type):
+        with self._lock:
+            lock = self._category_locks.get(policy_type)
+            if lock is None:
+                lock = self._category_locks[policy_type] = threading.Lock()
+            return lock
+
+    def _refresh_if_stale(self, policy_type):
+        """Drop a cached store whose on-disk index version has changed."""
+        if self._version_fn is None or policy_type not in self._stores:
+            return
+        now = time.monotonic()
+        if now - self._checked_at.get(policy_type, 0.0) < self._check_interval:
+            return
+        self._checked_at[policy_type] = now
+        version = self._version_fn(policy_type)
+        if version != self._versions.get(policy_type):
+            log(f"Index version for {policy_type} changed to {version}, reopening vectorstore")
+            self.invalidate(policy_type)
+
+    def get_index_version(self, policy_type):
+        """Return the index version of the store currently served for a category."""
+        if policy_type not in self._versions and self._version_fn is not None:
+            return self._version_fn(policy_type)
+        return self._versions.get(policy_type)
+
+    def get_vectorstore(self, policy_type):
+        """Return the shared vectorstore for a category, opening it on first use."""
+        self._refresh_if_stale(policy_type)
+        store = self._stores.get(policy_type)
+        if store is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return store
+
+        # Only one thread opens a given category; the others wait for it.
+        with self._category_lock(policy_type):
+            store = self._stores.get(policy_type)
+            if store is not None:
+                with self._lock:
+                    self._stats["hits"] += 1
+                return store
+
+            start = time.perf_counter()
+            store = self._loader(policy_type)
+            elapsed = time.perf_counter() - start
+            version = self._version_fn(policy_type) if self._version_fn else None
+
+            with self._lock:
+                self._stats["misses"] += 1
+                if store is None:
+                    self._stats["open_errors"] += 1
+                    return None
+                self._stats["opens"] += 1
+                self._stats["open_seconds_total"] += elapsed
+                self._stats["open_seconds_by_category"][policy_type] = elapsed
+                self._stores[policy_type] = store
+                self._versions[policy_type] = version
+                self._checked_at[policy_type] = time.monotonic()
+            log(f"Vectorstore for {policy_type} opened in {elapsed * 1000:.1f} ms")
+            return store
+
+    def get_retriever(self, policy_type, **search_kwargs):
+        """Return a shared retriever for a category."""
+        self._refresh_if_stale(policy_type)
+        key = (policy_type, tuple(sorted(search_kwargs.items())))
+        retriever = self._retrievers.get(key)
+        if retriever is not None:
+            with self._lock:
+                self._stats["retriever_hits"] += 1
+            return retriever
+
+        store = self.get_vectorstore(policy_type)
+        if store is None:
+            raise ValueError(f"Vectorstore not available for: {policy_type}")
+        if self._retriever_factory is not None:
+            retriever = self._retriever_factory(policy_type, store, **search_kwargs)
+        elif search_kwargs:
+            retriever = store.as_retriever(search_kwargs=dict(search_kwargs))
+        else:
+            retriever = store.as_retriever()
+        with self._lock:
+            retriever = self._retrievers.setdefault(key, retriever)
+        return retriever
+
+    def preload(self, categories):
+        """Open the stores for the given categories ahead of the first request."""
+        for policy_type in categories:
+            try:
+                self.get_vectorstore(policy_type)
+            except Exception as e:
+                log(f"Error preloading vectorstore for {policy_type}: {e}")
+
+    def invalidate(self, policy_type=None):
+        """Drop cached stores so the next request reopens them from disk."""
+        with self._lock:
+            if policy_type is None:
+                self._stores.clear()
+                self._retrievers.clear()
+            else:
+                self._stores.pop(policy_type, None)
+                for key in [k for k in self._retrievers if k[0] == policy_type]:
+                    del self._retrievers[key]
+
+    def loaded_categories(self):
+        """Return the categories whose store is currently open."""
+        return list(self._stores.keys())
+
+    def stats(self):
+        """Return a snapshot of store hit/miss, retriever hit and open-latency counters."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["open_seconds_by_category"] = dict(self._stats["open_seconds_by_category"])
+        return snapshot
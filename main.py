@@ -5,6 +5,7 @@ from common.chat_history_manager import ChatHistoryManager
 from common.document import get_folder_structure, build_qa_chain
 from common.charts import charts
 from common.database_query import database_query
+from common.query_audit import get_query_audit
 # =============================
 # Configuration & Global Setup
 # =============================
@@ -56,17 +57,9 @@ def get_response():
     
     query = request.form.get('message', '').strip()
     
-    # Log query to file
+    # Log query to the audit (numbered lines in queries.txt)
     if query:
-        with open('queries.txt', 'a') as f:
-            # Count existing lines to determine the next number
-            try:
-                with open('queries.txt', 'r') as fr:
-                    count = sum(1 for _ in fr)
-            except FileNotFoundError:
-                count = 0
-
-            f.write(f"{count + 1}. {query}\n")
+        get_query_audit().record(query, POLICY_TYPE, conversation_id)
     
     if not query:
         return jsonify({"error": "Missing 'question' in request."}), 400
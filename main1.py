@@ -1,26 +1,113 @@
 import os
 import uuid
-from flask import Flask, request, jsonify, session, render_template, send_file, abort
+import json
+from flask import Flask, request, jsonify, session, render_template, send_file, abort, Response, stream_with_context, g
 from common.chat_history_manager import ChatHistoryManager
-from common.document1 import get_folder_structure, build_qa_chain,get_policy_names,get_policy_count
+from common.categories import get_folder_structure, ALL_CATEGORIES
+from common.lazy import LazyModule, LazyObject
 from common.charts import charts
+from common.answer_cache import AnswerCache
+from common.conversation_memory import build_memory, new_memory
+from common.query_rewrite import needs_condense, condense_stats
+from common.policy_catalog import answer_catalog_question, get_policy_catalog
 from common.database_query import database_query
+from common.database import Database
+from common.llm_clients import client_stats
+from common.query_audit import get_query_audit
+from common.query_analytics import start_prewarmer
 import mimetypes
+import time
+import threading
 from common.logs import log
 from pathlib import Path
-from datetime import datetime
 # =============================
 # Configuration & Global Setup
 # =============================
+# LangChain, Chroma and the model clients load on the first request that needs them (see warm_up()).
+document1 = LazyModule("common.document1")
+
 CHAT_HISTORY_DIR = './chat_histories'
 chat_history_manager = ChatHistoryManager(CHAT_HISTORY_DIR)
 
+
+def session_secret_key():
+    """FLASK_SECRET_KEY, or a random key that only this process knows (logged as a warning)."""
+    key = os.getenv("FLASK_SECRET_KEY")
+    if key:
+        return key
+    log("FLASK_SECRET_KEY is not set; using a random per-process session key. Other workers and restarted "
+        "processes cannot read the session, so users lose their selected category.", level="WARNING")
+    return os.urandom(24)
+
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
-POLICY_TYPE = None  # Global policy type (to be set via API)
-POLICY_COUNT=None
-POLICY_NAMES=None
+# The category lives in the session, so every worker needs the same key to read it.
+SECRET_KEY = session_secret_key()
+app.secret_key = SECRET_KEY
+
+# Answers to repeated (or near-identical) policy questions, invalidated on re-index.
+answer_cache = AnswerCache(
+    LazyObject(lambda: document1.embedding),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+    ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+)
+
+# Numbered audit of every question asked (SQLite, mirrored to queries.txt).
+query_audit = get_query_audit()
+
+# Keep the in-memory policy catalog in sync with the files/ tree.
+get_policy_catalog().start_watcher(int(os.getenv("CATALOG_WATCH_INTERVAL", "30")))
+
+
+
+def warm_up():
+    """Load what the first chat turn would otherwise pay for.
 
+    Imports LangChain/Chroma with the embedding and LLM clients, logs in to
+    SQL Server (DB_WARM_UP) and opens every category's Chroma store
+    (PRELOAD_VECTORSTORES). Safe to call more than once, e.g. from a
+    gunicorn post_fork hook.
+    """
+    started = time.perf_counter()
+    try:
+        document1.load()
+        if os.getenv("DB_WARM_UP", "true").lower() == "true":
+            Database.warm_up()
+        if os.getenv("PRELOAD_VECTORSTORES", "false").lower() == "true":
+            document1.preload_vectorstores()
+        log("Warm-up finished", latency_ms=round((time.perf_counter() - started) * 1000, 1))
+    except Exception as e:
+        log(f"Error during warm-up: {e}")
+
+
+# WARM_UP=background (default) warms up in a daemon thread while the worker already serves requests,
+# eager blocks the import until it is done (use it with gunicorn --preload), lazy leaves it to the first request.
+WARM_UP = os.getenv("WARM_UP", "background").lower()
+if WARM_UP == "eager":
+    warm_up()
+elif WARM_UP == "background":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def log_request(response):
+    """One structured record per answered question (streams log theirs when they finish)."""
+    if request.path == "/get-response" and hasattr(g, "request_started"):
+        latency_ms = round((time.perf_counter() - g.request_started) * 1000, 1)
+        log("Request completed",
+            path=request.path,
+            status=response.status_code,
+            conversation_id=session.get('conversation_id'),
+            category=session.get('current_category'),
+            source=g.get('answer_source'),
+            latency_ms=latency_ms)
+        complete_query(g.get('query_id'), latency_ms, g.get('answer_source'))
+    return response
 
 
 @app.route('/')
@@ -36,97 +123,167 @@ def home():
 def set_category():
     try:
         """Set the policy category for the session."""
-        global POLICY_TYPE,POLICY_COUNT,POLICY_NAMES
         category = request.form.get('category')
         valid_categories = get_folder_structure().keys()
 
         if category not in valid_categories:
             return jsonify({"error": "Invalid category."}), 400
 
-        POLICY_TYPE = category
-        POLICY_COUNT=get_policy_count(POLICY_TYPE)
-        POLICY_NAMES=get_policy_names(POLICY_TYPE)
+        # Per-category state is shared and precomputed; only the choice is per session.
+        document1.get_category_context(category)
         session['current_category'] = category
-        log(f"Policy category set to '{POLICY_TYPE}'")
-        return jsonify({"message": f"Policy category set to '{POLICY_TYPE}'"}), 200
+        log(f"Policy category set to '{category}'")
+        return jsonify({"message": f"Policy category set to '{category}'"}), 200
     except Exception as e:
         log(f"Exception occurred in set-category api:{e}")
         return jsonify({"error": f"Error setting category: {str(e)}"}), 500
 
 
+def record_query(query, category=None, conversation_id=None):
+    """Add the question to the query audit (and queries.txt); returns its number."""
+    try:
+        return query_audit.record(query, category, conversation_id)
+    except Exception as e:
+        log(f"Error recording query: {e}")
+
+
+def complete_query(query_id, latency_ms, source=None):
+    """Store the latency and answer source of a recorded question, for query analytics."""
+    try:
+        query_audit.complete(query_id, latency_ms, source)
+    except Exception as e:
+        log(f"Error completing query audit: {e}")
+
+
+def warm_policy_answer(policy_type, question):
+    """Answer a popular question into the answer cache unless it is already answered from cache or catalog."""
+    index_version = document1.get_category_context(policy_type).index_version
+    if answer_catalog_question(policy_type, question) or answer_cache.contains(policy_type, question, index_version):
+        return False
+    result = document1.build_qa_chain(policy_type, question, memory=new_memory()).invoke({"question": question})
+    answer = result.get("answer", result.get("result", "I'm sorry, no answer was generated."))
+    answer_cache.store(policy_type, question, index_version, answer,
+                       extract_sources(result.get("source_documents", []), policy_type))
+    return True
+
+
+def history_category(policy_type):
+    """Category recorded in the chat history; questions over every category are tagged "multiple"."""
+    return policy_type if policy_type and policy_type != ALL_CATEGORIES else "multiple"
+
+
+def extract_sources(sources, category):
+    """Turn retrieved documents into unique {document, category, page} entries.
+
+    Documents from the multi-category retriever carry their own category.
+    """
+    # Extract source files with more detailed information
+    source_files = []
+    for doc in sources:
+        source_path = doc.metadata.get("source", "Unknown")
+        filename = os.path.basename(source_path)
+        page_num = doc.metadata.get("page", None)            
+        source_info = {
+            "document": filename,
+            "category": doc.metadata.get("category", category),
+            "page": page_num
+        }
+        source_files.append(source_info)        
+    # Remove duplicates while preserving structure
+    seen = set()
+    unique_sources = []
+    for source in source_files:
+        key = (source["document"], source["category"])
+        if key not in seen:
+            seen.add(key)
+            unique_sources.append(source)
+    return unique_sources
+
+
+# Answer the most frequent questions of each category ahead of the first user, and again after a re-index.
+if int(os.getenv("PREWARM_TOP_N", "0")) > 0:
+    start_prewarmer(warm_policy_answer, LazyObject(lambda: document1.embedding),
+                    top_n=int(os.getenv("PREWARM_TOP_N")),
+                    interval=int(os.getenv("PREWARM_INTERVAL", "300")))
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.route("/get-response", methods=["POST"])
 def get_response():
     """Process user query and return response."""
     try:
-        global POLICY_TYPE,POLICY_NAMES,POLICY_COUNT
-        if not POLICY_TYPE:
+        policy_type = session.get('current_category', None)
+        if not policy_type:
             return jsonify({"response": "Policy type not set. Use /set-category first."})
         
         conversation_id = session.get('conversation_id', f"chat-{uuid.uuid4()}")
         session['conversation_id'] = conversation_id
-        current_category = session.get('current_category', None)       
+        current_category = policy_type
         query = request.form.get('message', '').strip()
         log(f"User Query:{query}")       
         
         if query:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            try:
-                with open('queries.txt', 'r') as fr:
-                    count = sum(1 for _ in fr)
-            except FileNotFoundError:
-                count = 0
-            with open('queries.txt', 'a') as f:
-                f.write(f"{count + 1}. [{timestamp}]: {query}\n")
+            g.query_id = record_query(query, policy_type, conversation_id)
         
         if not query:
             return jsonify({"error": "Missing 'question' in request."}), 400
         
-        if POLICY_TYPE == "MIS":
+        if policy_type == "MIS":
+            g.answer_source = "mis"
             chart, chart_type = charts(query)     
-            qa_chain = build_qa_chain(POLICY_TYPE, query)      
-            timestamp = chat_history_manager.add_to_history(
-                conversation_id,
-                query,
-                qa_chain,
-                None,
-                current_category if current_category else "multiple"
-            )
-            result = database_query(qa_chain, chart, chart_type, query)        
+            page = request.form.get('page', 1, type=int)
+            qa_chain = document1.build_qa_chain(policy_type, query)      
+            # Later pages of a long result re-run the (cached) question; it is already in the history.
+            if page <= 1:
+                timestamp = chat_history_manager.add_to_history(
+                    conversation_id,
+                    query,
+                    qa_chain,
+                    None,
+                    history_category(current_category)
+                )
+            result = database_query(qa_chain, chart, chart_type, query, page=page)        
             return result
         else:
-            chat_history_raw = chat_history_manager.get_chat_history(conversation_id)
-            qa_chain = build_qa_chain(POLICY_TYPE, query, POLICY_NAMES=POLICY_NAMES, POLICY_COUNT=POLICY_COUNT, chat_history=chat_history_raw)         
-            result = qa_chain.invoke({"question": query})
-            answer = result.get("answer", result.get("result", "I'm sorry, no answer was generated."))
-
-            sources = result.get("source_documents", [])    
-            # Extract source files with more detailed information
-            source_files = []
-            for doc in sources:
-                source_path = doc.metadata.get("source", "Unknown")
-                filename = os.path.basename(source_path)
-                page_num = doc.metadata.get("page", None)            
-                source_info = {
-                    "document": filename,
-                    "category": POLICY_TYPE,
-                    "page": page_num
-                }
-                source_files.append(source_info)        
-            # Remove duplicates while preserving structure
-            seen = set()
-            unique_sources = []
-            for source in source_files:
-                key = (source["document"], source["category"])
-                if key not in seen:
-                    seen.add(key)
-                    unique_sources.append(source)       
+            index_version = document1.get_category_context(policy_type).index_version
+            catalog_answer = answer_catalog_question(policy_type, query)
+            # Follow-ups that refer back to the conversation are neither cached nor answered from cache.
+            standalone = catalog_answer is not None or not needs_condense(
+                query, chat_history_manager.get_chat_history(conversation_id, last_n=1))
+            cached = answer_cache.lookup(policy_type, query, index_version) if standalone and not catalog_answer else None
+            if catalog_answer:
+                # Count / list / "which category has X" questions never reach the LLM.
+                log(f"Answered from policy catalog: {query}")
+                g.answer_source = "catalog"
+                answer = catalog_answer
+                unique_sources = []
+            elif cached:
+                log(f"Answer cache {cached['match']} hit for: {query}")
+                g.answer_source = "answer_cache"
+                answer = cached["answer"]
+                unique_sources = cached["sources"]
+            else:
+                # Self-contained questions get an empty memory, so the chain skips the condense-question call.
+                g.answer_source = "llm"
+                memory = new_memory() if standalone else build_memory(chat_history_manager, conversation_id, document1.llm)
+                qa_chain = document1.build_qa_chain(policy_type, query, memory=memory)         
+                result = qa_chain.invoke({"question": query})
+                answer = result.get("answer", result.get("result", "I'm sorry, no answer was generated."))
+
+                unique_sources = extract_sources(result.get("source_documents", []), policy_type)
+                if standalone:
+                    answer_cache.store(policy_type, query, index_version, answer, unique_sources)
             # Add to chat history
             timestamp = chat_history_manager.add_to_history(
                 conversation_id,
                 query,
                 answer,
                 [s["document"] for s in unique_sources],
-                current_category if current_category else "multiple"
+                history_category(current_category)
             )
             
             return jsonify({
@@ -142,6 +299,83 @@ def get_response():
         }), 500
 
 
+@app.route("/get-response-stream", methods=["POST"])
+def get_response_stream():
+    """Stream the answer as Server-Sent Events: sources, then tokens, then the saved timestamp.
+
+    MIS questions produce tables and charts rather than text, so they are
+    answered with the regular JSON response.
+    """
+    policy_type = session.get('current_category', None)
+    if not policy_type or policy_type == "MIS":
+        return get_response()
+
+    conversation_id = session.get('conversation_id', f"chat-{uuid.uuid4()}")
+    session['conversation_id'] = conversation_id
+    current_category = policy_type
+    query = request.form.get('message', '').strip()
+    if not query:
+        return jsonify({"error": "Missing 'question' in request."}), 400
+    log(f"User Query (stream):{query}")
+    query_id = record_query(query, policy_type, conversation_id)
+    started = time.perf_counter()
+
+    def generate():
+        try:
+            index_version = document1.get_category_context(policy_type).index_version
+            catalog_answer = answer_catalog_question(policy_type, query)
+            standalone = catalog_answer is not None or not needs_condense(
+                query, chat_history_manager.get_chat_history(conversation_id, last_n=1))
+            cached = answer_cache.lookup(policy_type, query, index_version) if standalone and not catalog_answer else None
+
+            if catalog_answer or cached:
+                source = "catalog" if catalog_answer else "answer_cache"
+                answer = catalog_answer or cached["answer"]
+                unique_sources = [] if catalog_answer else cached["sources"]
+                yield sse_event("sources", {"suggestion": unique_sources})
+                yield sse_event("token", {"text": answer})
+            else:
+                source = "llm"
+                memory = new_memory() if standalone else build_memory(chat_history_manager, conversation_id, document1.llm)
+                answer = ""
+                unique_sources = []
+                for kind, payload in document1.stream_answer(policy_type, query, memory=memory):
+                    if kind == "sources":
+                        unique_sources = extract_sources(payload, policy_type)
+                        yield sse_event("sources", {"suggestion": unique_sources})
+                    else:
+                        answer += payload
+                        yield sse_event("token", {"text": payload})
+                if standalone:
+                    answer_cache.store(policy_type, query, index_version, answer, unique_sources)
+
+            timestamp = chat_history_manager.add_to_history(
+                conversation_id,
+                query,
+                answer,
+                [s["document"] for s in unique_sources],
+                history_category(current_category)
+            )
+            yield sse_event("done", {"timestamp": timestamp})
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            log("Stream completed",
+                path="/get-response-stream",
+                conversation_id=conversation_id,
+                category=policy_type,
+                source=source,
+                latency_ms=latency_ms)
+            complete_query(query_id, latency_ms, source)
+        except Exception as e:
+            log(f"Exception occurred in get-response-stream api:{e}")
+            yield sse_event("error", {"error": f"An error occurred while processing your request: {str(e)}"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route('/get-chat-history', methods=['GET'])
 def get_chat_history():
     """Get chat history for the current conversation."""
@@ -161,70 +395,95 @@ def get_categories():
         "categories": categories
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose in-process cache and latency counters."""
+    # Monitoring must not trigger the heavy import; its counters appear once it is loaded.
+    qa = document1.load() if document1.loaded else None
+    return jsonify({
+        "status": "success",
+        "warm": qa is not None,
+        "vectorstores": qa.vectorstore_registry.stats() if qa else None,
+        "embedding_cache": qa.embedding.cache.stats() if qa and hasattr(qa.embedding, "cache") else None,
+        "answer_cache": answer_cache.stats(),
+        "condense": condense_stats(),
+        "database": Database.stats(),
+        "sql_cache": qa.sql_cache.stats() if qa and qa.sql_cache is not None else None,
+        "result_cache": qa.mis_result_cache.stats() if qa and qa.mis_result_cache is not None else None,
+        "mis_parser": qa.mis_parser.stats() if qa and qa.mis_parser is not None else None,
+        "retrieval": qa.retrieval_stats() if qa else None,
+        "context_packing": qa.packing_stats() if qa else None,
+        "llm_clients": client_stats()
+    })
+
 # Add this new route to your main.py file
 
+def resolve_file_path(filename, current_category):
+    """Locate a source document on disk.
+
+    Returns (path, error, status); path is None when the name is invalid or
+    the file is not found in the current or any other category folder.
+    """
+    # Normalize slashes
+    filename = filename.replace('\\', '/')
+    
+    # Base files directory
+    base_path = "/home/jia/JIA-Chatbot/files"
+    if current_category=="SOPP_Procurement":
+        base_path="/home/jia/JIA-Chatbot/files/SOP/Procurement/"
+    elif current_category=="SOPP_Revenue":
+        base_path="/home/jia/JIA-Chatbot/files/SOP/Revenue/"
+    elif current_category=="SOPP_Sales":
+        base_path="/home/jia/JIA-Chatbot/files/SOP/Sales/"    
+
+    # Remove leading 'files/' if included in filename
+    if filename.startswith("files/"):
+        filename = filename[len("files/"):]
+    
+    # Build full path
+    full_path = os.path.normpath(os.path.join(base_path, filename))
+    
+    # Security check: prevent path traversal
+    if not full_path.startswith(os.path.abspath(base_path)):
+        return None, "Invalid path access detected.", 400
+
+    # Try direct path first
+    if os.path.exists(full_path):
+        return full_path, None, 200
+
+    # Try to search within category folders
+    available_categories = get_folder_structure().keys()
+
+    for category in available_categories:
+        alt_path = os.path.normpath(os.path.join(base_path, category, filename))
+        if os.path.exists(alt_path):
+            return alt_path, None, 200
+
+    return None, f"File '{filename}' not found in any category", 404
+
+
 @app.route('/open-file', methods=['POST'])
 def open_file():
     """Serve/open a file by name."""
     try:
-        current_category = session.get('current_category', None) or POLICY_TYPE
+        # Sources of "All Policies" answers name their own category.
+        current_category = request.form.get('category') or session.get('current_category', None)
     
         filename = request.form.get('filename')
         if not filename:
             return jsonify({"error": "Filename is required"}), 400
 
-        # Normalize slashes
-        filename = filename.replace('\\', '/')
-        
-        # Base files directory
-        base_path = "/home/jia/JIA-Chatbot/files"
-        if current_category=="SOPP_Procurement":
-            base_path="/home/jia/JIA-Chatbot/files/SOP/Procurement/"
-        elif current_category=="SOPP_Revenue":
-            base_path="/home/jia/JIA-Chatbot/files/SOP/Revenue/"
-        elif current_category=="SOPP_Sales":
-            base_path="/home/jia/JIA-Chatbot/files/SOP/Sales/"    
-          
-
-        # Remove leading 'files/' if included in filename
-        if filename.startswith("files/"):
-            filename = filename[len("files/"):]
-        
-        # Build full path
-        full_path = os.path.normpath(os.path.join(base_path, filename))
-        
-        # Security check: prevent path traversal
-        if not full_path.startswith(os.path.abspath(base_path)):
-            return jsonify({"error": "Invalid path access detected."}), 400
-
-        # Try direct path first
-        if os.path.exists(full_path):
-            mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
-            return send_file(
-                full_path,
-                mimetype=mimetype,
-                as_attachment=False,
-                download_name=os.path.basename(full_path)
-            )
-
-        # Try to search within category folders
-        available_categories = get_folder_structure().keys()
-        
-
-        for category in available_categories:
-            if category == current_category:
-                continue  # already checked
-            alt_path = os.path.normpath(os.path.join(base_path, category, filename))
-            if os.path.exists(alt_path):
-                mimetype = mimetypes.guess_type(alt_path)[0] or 'application/octet-stream'
-                return send_file(
-                    alt_path,
-                    mimetype=mimetype,
-                    as_attachment=False,
-                    download_name=os.path.basename(alt_path)
-                )
+        path, error, status = resolve_file_path(filename, current_category)
+        if path is None:
+            return jsonify({"error": error}), status
 
-        return jsonify({"error": f"File '{filename}' not found in any category"}), 404
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        return send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=False,
+            download_name=os.path.basename(path)
+        )
 
     except Exception as e:
         return jsonify({"error": f"Error opening file: {str(e)}"}), 500
@@ -0,0 +1,325 @@
+import os
+import time
+import uuid
+import asyncio
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, request, jsonify, session, render_template, send_file, Response, g
+from common.categories import get_folder_structure
+from common.database import Database
+from common.llm_clients import client_stats
+from common.database_query import build_database_answer
+from common.charts import charts
+from common.conversation_memory import build_memory, new_memory
+from common.query_rewrite import needs_condense, condense_stats
+from common.policy_catalog import answer_catalog_question
+from common.logs import log
+from main1 import SECRET_KEY, document1, chat_history_manager, answer_cache, record_query, complete_query, extract_sources, history_category, resolve_file_path, sse_event
+
+# =============================
+# Async (ASGI) serving mode
+# =============================
+# Same routes as main1.py, served by Quart so a single process keeps many
+# chats in flight: LLM calls are awaited on the async Gemini client and
+# blocking work (SQL Server via pymssql, SQLite history, Chroma, embeddings)
+# runs on a worker pool instead of tying up a request thread.
+#
+# Run with:  hypercorn main_async:app --bind 0.0.0.0:5000
+
+ASYNC_WORKER_THREADS = int(os.getenv("ASYNC_WORKER_THREADS", "64"))
+# pymssql has no async driver; cap concurrent queries at the pool size.
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", os.getenv("DB_POOL_MAX", "5")))
+
+app = Quart(__name__)
+app.secret_key = SECRET_KEY  # FLASK_SECRET_KEY, checked (and warned about) once in main1
+db_semaphore = asyncio.Semaphore(DB_CONCURRENCY)
+
+
+@app.before_serving
+async def startup():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_WORKER_THREADS, thread_name_prefix="async-worker")
+    )
+
+
+@app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def log_request(response):
+    """One structured record per answered question (streams log theirs when they finish)."""
+    if request.path == "/get-response" and hasattr(g, "request_started"):
+        latency_ms = round((time.perf_counter() - g.request_started) * 1000, 1)
+        log("Request completed",
+            path=request.path,
+            status=response.status_code,
+            conversation_id=session.get('conversation_id'),
+            category=session.get('current_category'),
+            source=g.get('answer_source'),
+            latency_ms=latency_ms)
+        await asyncio.to_thread(complete_query, g.get('query_id'), latency_ms, g.get('answer_source'))
+    return response
+
+
+_qa = None
+
+
+async def load_qa():
+    """common.document1, imported on a worker thread so the first request doesn't stall the event loop."""
+    global _qa
+    if _qa is None:
+        _qa = await asyncio.to_thread(document1.load)
+    return _qa
+
+
+async def run_sql(sql, args=None):
+    qa = await load_qa()
+    async with db_semaphore:
+        return await asyncio.to_thread(qa.run_mis_query, sql, args)
+
+
+@app.route('/')
+async def home():
+    """Home route to render the main page."""
+    categories = get_folder_structure()
+    if 'conversation_id' not in session:
+        session['conversation_id'] = f"chat-{uuid.uuid4()}"
+    current_category = session.get('current_category', None)
+    return await render_template('index.html', categories=categories, current_category=current_category)
+
+
+@app.route("/set-category", methods=["POST"])
+async def set_category():
+    """Set the policy category for the session."""
+    try:
+        category = (await request.form).get('category')
+        if category not in get_folder_structure().keys():
+            return jsonify({"error": "Invalid category."}), 400
+        (await load_qa()).get_category_context(category)
+        session['current_category'] = category
+        log(f"Policy category set to '{category}'")
+        return jsonify({"message": f"Policy category set to '{category}'"}), 200
+    except Exception as e:
+        log(f"Exception occurred in set-category api:{e}")
+        return jsonify({"error": f"Error setting category: {str(e)}"}), 500
+
+
+async def answer_mis(conversation_id, query, current_category, page=1):
+    chart, chart_type = charts(query)
+    qa = await load_qa()
+    parsed = await asyncio.to_thread(qa.parse_mis_question, query)
+    if parsed:
+        data = await run_sql(*parsed)
+    else:
+        sql = await qa.agenerate_sql(query)
+        log(f"Sql query generated by Gemini:{sql}")
+        data = await run_sql(sql)
+    if page <= 1:
+        await asyncio.to_thread(
+            chat_history_manager.add_to_history,
+            conversation_id, query, data, None, history_category(current_category)
+        )
+    response_data, columns_str = await asyncio.to_thread(build_database_answer, data, chart, chart_type, query, page)
+    resp = jsonify(response_data)
+    if columns_str is not None:
+        resp.set_cookie('columns', columns_str, max_age=60*60*24, domain="127.0.0.1")
+    return resp
+
+
+async def prepare_policy_answer(policy_type, conversation_id, query):
+    """Catalog answer, cached answer or the memory to answer with, plus the cache bookkeeping."""
+    qa = await load_qa()
+    index_version = await asyncio.to_thread(lambda: qa.get_category_context(policy_type).index_version)
+    catalog_answer = answer_catalog_question(policy_type, query)
+    previous = await asyncio.to_thread(chat_history_manager.get_chat_history, conversation_id, 1)
+    standalone = catalog_answer is not None or not needs_condense(query, previous)
+    cached = None
+    if standalone and not catalog_answer:
+        cached = await asyncio.to_thread(answer_cache.lookup, policy_type, query, index_version)
+    memory = None
+    if not catalog_answer and not cached:
+        memory = new_memory() if standalone else await asyncio.to_thread(build_memory, chat_history_manager, conversation_id, qa.llm)
+    return index_version, catalog_answer, standalone, cached, memory
+
+
+@app.route("/get-response", methods=["POST"])
+async def get_response():
+    """Process user query and return response."""
+    try:
+        policy_type = session.get('current_category', None)
+        if not policy_type:
+            return jsonify({"response": "Policy type not set. Use /set-category first."})
+
+        conversation_id = session.get('conversation_id', f"chat-{uuid.uuid4()}")
+        session['conversation_id'] = conversation_id
+        query = (await request.form).get('message', '').strip()
+        log(f"User Query:{query}")
+        if not query:
+            return jsonify({"error": "Missing 'question' in request."}), 400
+        g.query_id = await asyncio.to_thread(record_query, query, policy_type, conversation_id)
+
+        if policy_type == "MIS":
+            g.answer_source = "mis"
+            return await answer_mis(conversation_id, query, policy_type, (await request.form).get('page', 1, type=int))
+
+        index_version, catalog_answer, standalone, cached, memory = await prepare_policy_answer(policy_type, conversation_id, query)
+        if catalog_answer:
+            log(f"Answered from policy catalog: {query}")
+            g.answer_source = "catalog"
+            answer, unique_sources = catalog_answer, []
+        elif cached:
+            log(f"Answer cache {cached['match']} hit for: {query}")
+            g.answer_source = "answer_cache"
+            answer, unique_sources = cached["answer"], cached["sources"]
+        else:
+            g.answer_source = "llm"
+            qa_chain = await asyncio.to_thread((await load_qa()).build_qa_chain, policy_type, query, memory=memory)
+            result = await qa_chain.ainvoke({"question": query})
+            answer = result.get("answer", result.get("result", "I'm sorry, no answer was generated."))
+            unique_sources = extract_sources(result.get("source_documents", []), policy_type)
+            if standalone:
+                await asyncio.to_thread(answer_cache.store, policy_type, query, index_version, answer, unique_sources)
+
+        timestamp = await asyncio.to_thread(
+            chat_history_manager.add_to_history,
+            conversation_id, query, answer, [s["document"] for s in unique_sources], history_category(policy_type)
+        )
+        return jsonify({
+            "response": answer,
+            "suggestion": unique_sources if unique_sources else "No specific sources found for this query.",
+            "timestamp": timestamp
+        })
+    except Exception as e:
+        log(f"Exception occurred in get-response api:{e}")
+        return jsonify({"error": f"An error occurred while processing your request: {str(e)}"}), 500
+
+
+@app.route("/get-response-stream", methods=["POST"])
+async def get_response_stream():
+    """Stream the answer as Server-Sent Events (see main1.get_response_stream)."""
+    policy_type = session.get('current_category', None)
+    if not policy_type or policy_type == "MIS":
+        return await get_response()
+
+    conversation_id = session.get('conversation_id', f"chat-{uuid.uuid4()}")
+    session['conversation_id'] = conversation_id
+    query = (await request.form).get('message', '').strip()
+    if not query:
+        return jsonify({"error": "Missing 'question' in request."}), 400
+    log(f"User Query (stream):{query}")
+    query_id = await asyncio.to_thread(record_query, query, policy_type, conversation_id)
+    started = time.perf_counter()
+
+    async def generate():
+        try:
+            index_version, catalog_answer, standalone, cached, memory = await prepare_policy_answer(policy_type, conversation_id, query)
+            if catalog_answer or cached:
+                source = "catalog" if catalog_answer else "answer_cache"
+                answer = catalog_answer or cached["answer"]
+                unique_sources = [] if catalog_answer else cached["sources"]
+                yield sse_event("sources", {"suggestion": unique_sources})
+                yield sse_event("token", {"text": answer})
+            else:
+                source = "llm"
+                answer = ""
+                unique_sources = []
+                async for kind, payload in (await load_qa()).astream_answer(policy_type, query, memory=memory):
+                    if kind == "sources":
+                        unique_sources = extract_sources(payload, policy_type)
+                        yield sse_event("sources", {"suggestion": unique_sources})
+                    else:
+                        answer += payload
+                        yield sse_event("token", {"text": payload})
+                if standalone:
+                    await asyncio.to_thread(answer_cache.store, policy_type, query, index_version, answer, unique_sources)
+
+            timestamp = await asyncio.to_thread(
+                chat_history_manager.add_to_history,
+                conversation_id, query, answer, [s["document"] for s in unique_sources], history_category(policy_type)
+            )
+            yield sse_event("done", {"timestamp": timestamp})
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            log("Stream completed",
+                path="/get-response-stream",
+                conversation_id=conversation_id,
+                category=policy_type,
+                source=source,
+                latency_ms=latency_ms)
+            await asyncio.to_thread(complete_query, query_id, latency_ms, source)
+        except Exception as e:
+            log(f"Exception occurred in get-response-stream api:{e}")
+            yield sse_event("error", {"error": f"An error occurred while processing your request: {str(e)}"})
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route('/get-chat-history', methods=['GET'])
+async def get_chat_history():
+    """Get chat history for the current conversation."""
+    conversation_id = session.get('conversation_id')
+    if not conversation_id:
+        return jsonify({"status": "error", "message": "No active conversation"})
+
+    chat_history = await asyncio.to_thread(chat_history_manager.get_chat_history, conversation_id)
+    return jsonify({"status": "success", "history": chat_history})
+
+
+@app.route('/get-categories', methods=['GET'])
+async def get_categories():
+    """Get available policy categories."""
+    return jsonify({"status": "success", "categories": get_folder_structure()})
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Expose in-process cache and latency counters."""
+    qa = _qa
+    return jsonify({
+        "status": "success",
+        "warm": qa is not None,
+        "vectorstores": qa.vectorstore_registry.stats() if qa else None,
+        "embedding_cache": qa.embedding.cache.stats() if qa and hasattr(qa.embedding, "cache") else None,
+        "answer_cache": answer_cache.stats(),
+        "condense": condense_stats(),
+        "database": Database.stats(),
+        "sql_cache": qa.sql_cache.stats() if qa and qa.sql_cache is not None else None,
+        "result_cache": qa.mis_result_cache.stats() if qa and qa.mis_result_cache is not None else None,
+        "mis_parser": qa.mis_parser.stats() if qa and qa.mis_parser is not None else None,
+        "retrieval": qa.retrieval_stats() if qa else None,
+        "context_packing": qa.packing_stats() if qa else None,
+        "llm_clients": client_stats()
+    })
+
+
+@app.route('/open-file', methods=['POST'])
+async def open_file():
+    """Serve/open a file by name."""
+    try:
+        form = await request.form
+        # Sources of "All Policies" answers name their own category.
+        current_category = form.get('category') or session.get('current_category', None)
+        filename = form.get('filename')
+        if not filename:
+            return jsonify({"error": "Filename is required"}), 400
+
+        path, error, status = await asyncio.to_thread(resolve_file_path, filename, current_category)
+        if path is None:
+            return jsonify({"error": error}), status
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        return await send_file(path, mimetype=mimetype, as_attachment=False, attachment_filename=os.path.basename(path))
+    except Exception as e:
+        return jsonify({"error": f"Error opening file: {str(e)}"}), 500
+
+
+# =============================
+# Run the Quart App
+# =============================
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
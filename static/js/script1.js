@@ -26,7 +26,8 @@ const categoryOptions = [
             { id: 'SOPP_Sales', name: 'Sales' }
         ]
     },
-    { id: 'MIS', name: 'MIS' }
+    { id: 'MIS', name: 'MIS' },
+    { id: 'All Policies', name: 'All Policies' }
 
 ];
 
@@ -225,6 +226,11 @@ async function processUserMessage(message) {
         // Hide typing indicator
         typingIndicator.classList.remove('active');
 
+        // Streamed answers have already been rendered token by token
+        if (response.streamed) {
+            return null;
+        }
+
         if (Array.isArray(response.response) || (typeof response.response === "object" && response.response !== null)) {
             console.log("Processing array/object response");
 
@@ -392,7 +398,7 @@ function renderMessages() {
                         // Add click handler for file opening
                         sourceItem.addEventListener('click', () => {
                             const filename = source.document || source;
-                            handleFileClick(filename);
+                            handleFileClick(filename, source.category);
                         });
 
                         sourcesContainer.appendChild(sourceItem);
@@ -503,7 +509,7 @@ function getCurrentTimestamp() {
 // Function to fetch AI response from API
 async function fetchAIResponse(userMessage) {
     try {
-        const response = await fetch('/get-response', {
+        const response = await fetch('/get-response-stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/x-www-form-urlencoded',
@@ -517,6 +523,13 @@ async function fetchAIResponse(userMessage) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
+        // Policy answers arrive as Server-Sent Events, MIS answers as plain JSON
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.includes('text/event-stream')) {
+            await readResponseStream(response);
+            return { streamed: true };
+        }
+
         const data = await response.json();
 
 
@@ -535,6 +548,92 @@ async function fetchAIResponse(userMessage) {
     }
 }
 
+// Apply the same formatting renderMessages uses to an assistant message
+function formatMessageText(content) {
+    return (content || '')
+        .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\n/g, '<br>');
+}
+
+// Read the event stream from /get-response-stream, growing the last assistant message as tokens arrive
+async function readResponseStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let assistantMessage = null;
+    let messageText = null;
+
+    const startMessage = () => {
+        if (assistantMessage) {
+            return;
+        }
+        typingIndicator.classList.remove('active');
+        assistantMessage = {
+            content: '',
+            sender: "assistant",
+            timestamp: getCurrentTimestamp(),
+            sources: []
+        };
+        chatHistory.push(assistantMessage);
+        renderMessages();
+        const texts = messagesContainer.querySelectorAll('.message-text');
+        messageText = texts[texts.length - 1];
+    };
+
+    const handleEvent = (rawEvent) => {
+        let event = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        if (!data) {
+            return;
+        }
+        const payload = JSON.parse(data);
+        startMessage();
+
+        if (event === 'sources') {
+            assistantMessage.sources = payload.suggestion;
+        } else if (event === 'token') {
+            assistantMessage.content += payload.text;
+            if (messageText) {
+                messageText.innerHTML = formatMessageText(assistantMessage.content);
+            }
+            scrollToBottom();
+        } else if (event === 'done') {
+            assistantMessage.timestamp = payload.timestamp || assistantMessage.timestamp;
+        } else if (event === 'error') {
+            assistantMessage.content = "Sorry, I couldn't process your request. Please try again later.";
+            console.error("Stream error:", payload.error);
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            handleEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+        }
+    }
+    if (buffer.trim()) {
+        handleEvent(buffer);
+    }
+
+    startMessage();
+    // Final render adds the sources and timestamp
+    renderMessages();
+    scrollToBottom();
+}
+
 // Load chat history on startup if available
 async function loadChatHistory() {
     try {
@@ -1268,7 +1367,7 @@ function initializeDataTable(tableId) {
         }
     });
 }
-async function handleFileClick(filename) {
+async function handleFileClick(filename, category) {
     try {
         // Create a form to submit the POST request
         const form = document.createElement('form');
@@ -1283,6 +1382,15 @@ async function handleFileClick(filename) {
         input.value = filename;
 
         form.appendChild(input);
+
+        // Sources of "All Policies" answers come from different categories
+        if (category) {
+            const categoryInput = document.createElement('input');
+            categoryInput.type = 'hidden';
+            categoryInput.name = 'category';
+            categoryInput.value = category;
+            form.appendChild(categoryInput);
+        }
         document.body.appendChild(form);
 
         // Submit the form to open file in new tab